@@ -0,0 +1,55 @@
+# endpoints/crawl.py
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, sessionmaker
+
+from database import get_db
+from dependencies import get_current_user_from_token
+from models.crawl_job import CrawlJob, CrawlJobStatus
+from models.user import UserRole
+from schemas import CrawlJobCreate
+from services.crawler import get_crawl_job_runner, job_to_dict
+
+router = APIRouter()
+
+
+def _get_job(db: Session, job_id: str, current_user) -> CrawlJob:
+    job = db.get(CrawlJob, job_id)
+    if job is None or (job.owner_id != current_user.id and current_user.role not in {UserRole.MANAGER, UserRole.ADMIN}):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Задача обхода не найдена")
+    return job
+
+
+@router.post("/crawl/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_crawl_job(payload: CrawlJobCreate, db: Session = Depends(get_db), current_user=Depends(get_current_user_from_token)):
+    try:
+        job = await run_in_threadpool(
+            get_crawl_job_runner().submit,
+            db,
+            seed_url=payload.seed_url,
+            max_depth=payload.max_depth,
+            max_pages=payload.max_pages,
+            owner_id=current_user.id,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    return {**job_to_dict(job), "status_url": f"/api/v1/crawl/jobs/{job.id}"}
+
+
+@router.get("/crawl/jobs/{job_id}")
+def get_crawl_job(job_id: str, db: Session = Depends(get_db), current_user=Depends(get_current_user_from_token)):
+    return job_to_dict(_get_job(db, job_id, current_user))
+
+
+@router.post("/crawl/jobs/{job_id}/resume", status_code=status.HTTP_202_ACCEPTED)
+def resume_crawl_job(job_id: str, db: Session = Depends(get_db), current_user=Depends(get_current_user_from_token)):
+    """Повторно ставит в очередь упавшую задачу; frontier продолжается с места остановки"""
+    job = _get_job(db, job_id, current_user)
+    if job.status in CrawlJobStatus.ACTIVE:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Задача обхода уже выполняется")
+    if job.status == CrawlJobStatus.DONE:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Задача обхода уже завершена")
+    job.status = CrawlJobStatus.QUEUED
+    db.commit()
+    get_crawl_job_runner().schedule(sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind()), job.id)
+    return job_to_dict(job)
@@ -9,6 +9,7 @@ from fastapi.responses import Response
 from dependencies import get_current_user_from_token, get_event_service, get_file_service
 from schemas import (
     EventCreate,
+    EventListPage,
     EventListResponse,
     EventQueryParams,
     EventRead,
@@ -32,7 +33,7 @@ def create_event_endpoint(
     return event_service.create_event(event, current_user)
 
 
-@router.get("/events/", response_model=EventListResponse)
+@router.get("/events/", response_model=EventListPage)
 def list_events_endpoint(
     q: Optional[str] = Query(default=None),
     category: Optional[str] = Query(default=None),
@@ -41,10 +42,12 @@ def list_events_endpoint(
     date_to: Optional[date] = Query(default=None),
     favorites_only: bool = False,
     upcoming_only: bool = False,
-    sort_by: str = Query(default="date", pattern="^(date|created_at|title)$"),
+    sort_by: str = Query(default="date", pattern="^(date|created_at|title|relevance)$"),
     sort_order: str = Query(default="asc", pattern="^(asc|desc)$"),
     page: int = Query(default=1, ge=1),
     page_size: int = Query(default=9, ge=1, le=50),
+    cursor: Optional[str] = Query(default=None),
+    view: str = Query(default="full", pattern="^(full|compact)$"),
     scope: str = Query(default="mine", pattern="^(mine|all)$"),
     event_service: EventService = Depends(get_event_service),
     current_user=Depends(get_current_user_from_token),
@@ -61,6 +64,8 @@ def list_events_endpoint(
         sort_order=sort_order,
         page=page,
         page_size=page_size,
+        cursor=cursor,
+        view=view,
         scope=scope,
     )
     return event_service.list_events(params, current_user)
@@ -1,6 +1,9 @@
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
 from datetime import datetime
 
+from services.tracing import METRICS
+
 router = APIRouter()
 
 @router.get("/health")
@@ -9,4 +12,10 @@ async def health_check():
         "status": "healthy", 
         "timestamp": datetime.now().isoformat(),
         "service": "EventFinder"
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage duration histograms in Prometheus text format"""
+    return PlainTextResponse(METRICS.render_prometheus(), media_type="text/plain; version=0.0.4")
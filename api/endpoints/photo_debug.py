@@ -6,6 +6,7 @@ import imagehash
 from database import get_db
 from sqlalchemy.orm import Session
 from models.event import Event
+from services.hash_index import HASH_BITS, search_similar
 
 router = APIRouter()
 
@@ -28,28 +29,26 @@ async def photo_debug(file: UploadFile = File(...), db: Session = Depends(get_db
     q_hex = str(query_hash)
     q_int = int(q_hex, 16)
 
-    # получаем все события с заполненным image_hash
-    events = db.query(Event).filter(Event.image_hash.isnot(None)).all()
+    # все хэши уже лежат в общем индексе — считаем расстояния без загрузки строк
+    found = search_similar(db, q_int, max_distance=HASH_BITS, top_k=top_n)
+    ids = [m.event_id for m in found.matches]
+    events = {ev.id: ev for ev in db.query(Event).filter(Event.id.in_(ids))} if ids else {}
+
     results = []
-    for ev in events:
-        try:
-            s_hex = ev.image_hash
-            s_int = phash_hex_to_int(s_hex)
-            xor = q_int ^ s_int
-            distance = xor.bit_count()  # fast bitcount, Python 3.8+
-            results.append({
-                "id": ev.id,
-                "title": ev.title,
-                "image_url": ev.image_url,
-                "stored_hash": s_hex,
-                "distance": int(distance)
-            })
-        except Exception:
+    for match in found.matches:
+        ev = events.get(match.event_id)
+        if ev is None:
             continue
+        results.append({
+            "id": ev.id,
+            "title": ev.title,
+            "image_url": ev.image_url,
+            "stored_hash": ev.image_hash,
+            "distance": match.distance
+        })
 
-    results.sort(key=lambda r: r["distance"])
     return {
         "query_hash": q_hex,
-        "matches": results[:top_n],
-        "total_checked": len(results)
-    }
+        "matches": results,
+        "total_checked": found.scanned
+    }
\ No newline at end of file
@@ -0,0 +1,66 @@
+# endpoints/photo_jobs.py
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from database import get_db
+from endpoints.photo_lookup import open_upload_image
+from models.lookup_job import LookupJobStatus, PhotoLookupJob
+from services.lookup_jobs import get_lookup_job_runner, job_to_dict
+
+router = APIRouter()
+
+STREAM_POLL_SECONDS = 0.5
+
+
+def _get_job(db: Session, job_id: str) -> PhotoLookupJob:
+    job = db.get(PhotoLookupJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Задача не найдена")
+    return job
+
+
+@router.post("/photo/lookup/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_photo_lookup_job(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    contents = await file.read()
+    open_upload_image(contents)
+    job = await run_in_threadpool(get_lookup_job_runner().submit, db, contents=contents, filename=file.filename)
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/v1/photo/lookup/jobs/{job.id}",
+        "events_url": f"/api/v1/photo/lookup/jobs/{job.id}/events",
+    }
+
+
+@router.get("/photo/lookup/jobs/{job_id}")
+def get_photo_lookup_job(job_id: str, db: Session = Depends(get_db)):
+    return job_to_dict(_get_job(db, job_id))
+
+
+@router.get("/photo/lookup/jobs/{job_id}/events")
+async def stream_photo_lookup_job(job_id: str, db: Session = Depends(get_db)):
+    """Server-Sent Events: новое сообщение на каждую смену стадии или статуса"""
+    await run_in_threadpool(_get_job, db, job_id)
+
+    def snapshot():
+        db.expire_all()
+        return job_to_dict(_get_job(db, job_id))
+
+    async def events():
+        last = None
+        while True:
+            state = await run_in_threadpool(snapshot)
+            marker = (state["status"], state["stage"])
+            if marker != last:
+                last = marker
+                yield f"data: {json.dumps(state, ensure_ascii=False)}\n\n"
+            if state["status"] not in LookupJobStatus.ACTIVE:
+                return
+            await asyncio.sleep(STREAM_POLL_SECONDS)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
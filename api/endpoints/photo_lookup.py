@@ -1,30 +1,43 @@
 # endpoints/photo_lookup.py
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from PIL import Image, ImageFilter, ImageOps, ImageEnhance
 import pytesseract
 import imagehash
 import io
+import contextvars
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 from dateutil import parser as dateparser
-from rapidfuzz import fuzz
 import re
 from typing import Optional, Dict, Any
-import requests
+from urllib.parse import urljoin
 from bs4 import BeautifulSoup
 import time
 import logging
 
 from database import get_db
 from models.event import Event as EventModel
+from repositories.events import EventRepository
+from services.duplicates import DuplicateDetector
+from services.image_match import match_fingerprint
+from services.html_extract import HTML_PARSER
+from services.http_client import get_scrape_client
+from services.lookup_cache import CachedLookup, content_key, get_lookup_cache
+from services.ocr import OCR_LANG, recognize
+from services.phash import ImageFingerprint
+from services.title_index import get_title_index
+from services.tracing import METRICS, Trace, activate, record_span, span
+from settings import get_settings
 
 router = APIRouter()
 logger = logging.getLogger("photo_lookup")
 
-# thresholds
+# thresholds (image distances live in settings, see services.image_match)
 TITLE_FUZZY_THRESHOLD = 78
-IMAGE_HASH_MAX_DIST = 8
 
 # user-agent and basic headers for scraping
 SCRAPE_HEADERS = {
@@ -77,46 +90,22 @@ def preprocess_image(img: Image.Image) -> Image.Image:
     return img
 
 
-def ocr_image(pil_img: Image.Image) -> str:
+def ocr_image(pil_img: Image.Image, strategy: Optional[str] = None) -> str:
     """
-    Enhanced OCR with multiple configuration attempts
+    OCR with multiple PSM configurations run in a process pool (see services.ocr)
     """
     logger.info("Starting OCR recognition...")
     
     try:
-        # Different PSM configurations for different text layouts
-        configs = [
-            ('--oem 3 --psm 6', 'Single uniform block'),
-            ('--oem 3 --psm 11', 'Sparse text'),
-            ('--oem 3 --psm 3', 'Fully automatic'),
-            ('--oem 3 --psm 4', 'Single column of text'),
-        ]
-        
-        best_text = ""
-        best_config_name = ""
-        
-        for config, config_name in configs:
-            try:
-                text = pytesseract.image_to_string(pil_img, lang='rus+eng', config=config)
-                
-                # Clean the text
-                text = re.sub(r'\s+', ' ', text).strip()
-                
-                logger.info(f"Config '{config_name}' - length: {len(text)} chars")
-                
-                # Check if we got reasonable text
-                if len(text) > len(best_text) and len(text) > 10:
-                    best_text = text
-                    best_config_name = config_name
-                    
-            except Exception as e:
-                logger.debug(f"Config '{config_name}' failed: {e}")
-                continue
+        best = recognize(pil_img, strategy=strategy)
         
-        if not best_text:
+        if best:
+            best_text = best.text
+            best_config_name = best.config_name
+        else:
             # Fallback
             logger.warning("All configs failed, using fallback OCR")
-            best_text = pytesseract.image_to_string(pil_img, lang='rus+eng')
+            best_text = pytesseract.image_to_string(pil_img, lang=OCR_LANG)
             best_config_name = "Fallback"
         
         logger.info(f"Best OCR result using '{best_config_name}'")
@@ -388,55 +377,53 @@ def parse_text_to_fields(text: str) -> Dict[str, Optional[Any]]:
 def find_existing_event(db: Session, parsed: Dict[str, Any], phash: str) -> Optional[EventModel]:
     """
     Find existing event by:
-    1. Image perceptual hash
-    2. Fuzzy title matching
-    3. Date matching
+    1. Image perceptual hash (shared Hamming index)
+    2. Fuzzy title matching (cached title index)
+    3. Date matching (indexed date window)
+    Only the matched row is loaded from the database
     """
     logger.info("Searching for existing event in database...")
     
-    events = db.query(EventModel).all()
-    logger.info(f"Total events in DB: {len(events)}")
-    
     # 1) Search by image hash
-    for ev in events:
-        try:
-            if getattr(ev, "image_hash", None):
-                dist = imagehash.hex_to_hash(ev.image_hash) - imagehash.hex_to_hash(phash)
-                if dist <= IMAGE_HASH_MAX_DIST:
-                    logger.info(f"Found match by image hash (distance: {dist}): Event #{ev.id}")
-                    return ev
-        except Exception as e:
-            logger.debug(f"Image hash comparison failed: {e}")
-            continue
-
-    # 2) Search by fuzzy title matching
+    with span("match.hash") as stage:
+        stage.outcome = "miss"
+        # the upload's pHash is taken from the OCR-preprocessed image, so dHash/colorhash
+        # aren't comparable and the matcher applies the strict pHash threshold only
+        query = ImageFingerprint.from_phash(phash)
+        found = match_fingerprint(db, query, top_k=1) if query is not None else None
+        if found and found.matches:
+            best_hash = found.matches[0]
+            ev = db.get(EventModel, best_hash.event_id)
+            if ev is not None:
+                stage.outcome = "hit"
+                logger.info(f"Found match by image hash (distance: {best_hash.phash_distance}): Event #{ev.id}")
+                return ev
+
+    # 2) Search by fuzzy title matching over the cached title index
     title = parsed.get("title")
     if title and title != "Событие без названия":
-        best = None
-        best_score = 0
-        for ev in events:
-            score = fuzz.token_set_ratio(title, ev.title or "")
-            if score > best_score:
-                best = ev
-                best_score = score
-        
-        if best_score >= TITLE_FUZZY_THRESHOLD:
-            logger.info(f"Found match by title fuzzy matching (score: {best_score}): Event #{best.id}")
-            return best
-        else:
-            logger.info(f"Best title match score: {best_score} (threshold: {TITLE_FUZZY_THRESHOLD})")
+        with span("match.title") as stage:
+            stage.outcome = "miss"
+            best = get_title_index(db).best_match(title)
+            if best and best.score >= TITLE_FUZZY_THRESHOLD:
+                ev = db.get(EventModel, best.event_id)
+                if ev is not None:
+                    stage.outcome = "hit"
+                    logger.info(f"Found match by title fuzzy matching (score: {best.score}): Event #{ev.id}")
+                    return ev
+            else:
+                logger.info(f"Best title match score: {best.score if best else 0} (threshold: {TITLE_FUZZY_THRESHOLD})")
 
-    # 3) Search by date
+    # 3) Search by date (indexed day window)
     if parsed.get("date"):
-        parsed_date = parsed["date"].date()
-        for ev in events:
-            try:
-                if getattr(ev, "date", None):
-                    if ev.date.date() == parsed_date:
-                        logger.info(f"Found match by date: Event #{ev.id}")
-                        return ev
-            except Exception:
-                continue
+        with span("match.date") as stage:
+            stage.outcome = "miss"
+            event_id = EventRepository(db).find_first_on_day(parsed["date"].date())
+            ev = db.get(EventModel, event_id) if event_id is not None else None
+            if ev is not None:
+                stage.outcome = "hit"
+                logger.info(f"Found match by date: Event #{ev.id}")
+                return ev
 
     logger.info("No existing event found")
     return None
@@ -445,13 +432,35 @@ def find_existing_event(db: Session, parsed: Dict[str, Any], phash: str) -> Opti
 # ---------------------------
 # Web scraping (fallback)
 # ---------------------------
+class SearchBudget:
+    """Shared deadline and cancel flag of one external search fan-out"""
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        self.cancelled = threading.Event()
+
+    def remaining(self) -> float:
+        return 0.0 if self.cancelled.is_set() else max(0.0, self.deadline - time.monotonic())
+
+
+_search_budget: contextvars.ContextVar[Optional[SearchBudget]] = contextvars.ContextVar("external_search_budget", default=None)
+
+
 def safe_get(url, params=None, headers=None, timeout=8):
-    """Safe HTTP GET with error handling"""
+    """Safe HTTP GET with error handling; respects the current search budget"""
     headers = headers or SCRAPE_HEADERS
+    budget = _search_budget.get()
+    max_wait = None
+    if budget is not None:
+        remaining = budget.remaining()
+        if remaining <= 0:
+            logger.debug(f"safe_get skipped for {url}: search budget exhausted")
+            return None
+        timeout = max_wait = min(timeout, remaining)
     try:
-        r = requests.get(url, params=params, headers=headers, timeout=timeout)
+        # politeness is handled by the shared client's per-host token bucket
+        r = get_scrape_client().get(url, params=params, headers=headers, timeout=timeout, max_wait=max_wait)
         r.raise_for_status()
-        time.sleep(0.3)  # Be polite to server
         return r.text
     except Exception as e:
         logger.debug(f"safe_get failed for {url}: {e}")
@@ -461,25 +470,26 @@ def safe_get(url, params=None, headers=None, timeout=8):
 def search_kudago(query: str) -> Optional[Dict[str, Any]]:
     """Search on KudaGo"""
     logger.info(f"Searching on KudaGo: {query}")
-    url = "https://kudago.com/events/"
+    base_url = get_settings().kudago_base_url
+    url = urljoin(base_url, "/events/")
     html = safe_get(url, params={"q": query})
     if not html:
         return None
     
-    soup = BeautifulSoup(html, "lxml")
+    soup = BeautifulSoup(html, HTML_PARSER)
     card = soup.select_one(".post .title a, .card__title a")
     if not card:
         return None
     
     href = card.get("href")
     if href and href.startswith("/"):
-        href = "https://kudago.com" + href
+        href = urljoin(base_url, href)
     
     page = safe_get(href)
     if not page:
         return None
     
-    psoup = BeautifulSoup(page, "lxml")
+    psoup = BeautifulSoup(page, HTML_PARSER)
     title = psoup.select_one("h1") and psoup.select_one("h1").get_text(strip=True)
     desc = psoup.select_one(".description") and psoup.select_one(".description").get_text(" ", strip=True)
     time_el = psoup.select_one(".date")
@@ -492,12 +502,13 @@ def search_kudago(query: str) -> Optional[Dict[str, Any]]:
 def search_afisha_ru(query: str) -> Optional[Dict[str, Any]]:
     """Search on Afisha.ru"""
     logger.info(f"Searching on Afisha.ru: {query}")
-    url = "https://www.afisha.ru/search/"
+    base_url = get_settings().afisha_ru_base_url
+    url = urljoin(base_url, "/search/")
     html = safe_get(url, params={"q": query})
     if not html:
         return None
     
-    soup = BeautifulSoup(html, "lxml")
+    soup = BeautifulSoup(html, HTML_PARSER)
     card = soup.select_one(".o-teaser")
     if not card:
         return None
@@ -508,13 +519,13 @@ def search_afisha_ru(query: str) -> Optional[Dict[str, Any]]:
     
     href = ahref.get("href")
     if href and href.startswith("/"):
-        href = "https://www.afisha.ru" + href
+        href = urljoin(base_url, href)
     
     page = safe_get(href)
     if not page:
         return None
     
-    psoup = BeautifulSoup(page, "lxml")
+    psoup = BeautifulSoup(page, HTML_PARSER)
     title = psoup.select_one("h1") and psoup.select_one("h1").get_text(strip=True)
     desc = psoup.select_one(".b-event__description") and psoup.select_one(".b-event__description").get_text(" ", strip=True)
     
@@ -525,25 +536,26 @@ def search_afisha_ru(query: str) -> Optional[Dict[str, Any]]:
 def search_yandex_afisha(query: str) -> Optional[Dict[str, Any]]:
     """Search on Яндекс.Афише"""
     logger.info(f"Searching on Yandex.Afisha: {query}")
-    url = "https://afisha.yandex.ru/search"
+    base_url = get_settings().yandex_afisha_base_url
+    url = urljoin(base_url, "/search")
     html = safe_get(url, params={"what": query})
     if not html:
         return None
     
-    soup = BeautifulSoup(html, "lxml")
+    soup = BeautifulSoup(html, HTML_PARSER)
     card = soup.select_one(".search-snippet__title a, .event-card a")
     if not card:
         return None
     
     href = card.get("href")
     if href and href.startswith("/"):
-        href = "https://afisha.yandex.ru" + href
+        href = urljoin(base_url, href)
     
     page = safe_get(href)
     if not page:
         return None
     
-    psoup = BeautifulSoup(page, "lxml")
+    psoup = BeautifulSoup(page, HTML_PARSER)
     title = psoup.select_one("h1") and psoup.select_one("h1").get_text(strip=True)
     desc = psoup.select_one(".event-description") and psoup.select_one(".event-description").get_text(" ", strip=True)
     
@@ -551,45 +563,110 @@ def search_yandex_afisha(query: str) -> Optional[Dict[str, Any]]:
     return {"source": "yandex.afisha", "url": href, "title": title, "description": desc}
 
 
+EXTERNAL_SOURCES = (
+    ("kudago", search_kudago),
+    ("afisha.ru", search_afisha_ru),
+    ("yandex.afisha", search_yandex_afisha),
+)
+
+
+def _query_source(source: str, fn, query: str, budget: SearchBudget) -> Optional[Dict[str, Any]]:
+    _search_budget.set(budget)
+    with span(f"external.{source}") as stage:
+        try:
+            res = fn(query)
+        except Exception as e:
+            stage.outcome = "error"
+            logger.debug(f"Scraper {fn.__name__} failed: {e}")
+            return None
+        if res:
+            stage.outcome = "hit"
+        elif budget.cancelled.is_set():
+            stage.outcome = "cancelled"
+        elif budget.remaining() <= 0:
+            stage.outcome = "timeout"
+        else:
+            stage.outcome = "miss"
+        return res
+
+
 def search_external_sites(query: str):
-    """Search on external event sites"""
+    """
+    Search external event sites concurrently under a shared deadline;
+    the first site that returns a result wins, the rest are cancelled
+    """
     logger.info(f"Searching external sites for: {query}")
     
-    for fn in (search_kudago, search_afisha_ru, search_yandex_afisha):
-        try:
-            res = fn(query)
+    budget = SearchBudget(time.monotonic() + get_settings().external_search_deadline_seconds)
+    executor = ThreadPoolExecutor(max_workers=len(EXTERNAL_SOURCES), thread_name_prefix="external-search")
+    # each scraper runs in a copy of the caller's context so its span lands in the request trace
+    futures = [
+        executor.submit(contextvars.copy_context().run, _query_source, source, fn, query, budget)
+        for source, fn in EXTERNAL_SOURCES
+    ]
+    try:
+        for future in as_completed(futures, timeout=budget.remaining()):
+            res = future.result()
             if res:
+                logger.info(f"External search won by {res.get('source')}")
                 return res
-        except Exception as e:
-            logger.debug(f"Scraper {fn.__name__} failed: {e}")
-            continue
+    except TimeoutError:
+        logger.warning("External sites search deadline exceeded")
+    finally:
+        budget.cancelled.set()
+        executor.shutdown(wait=False, cancel_futures=True)
     
     logger.info("No results from external sites")
     return None
 
 
+@router.get("/photo/lookup/external/stats")
+def photo_lookup_external_stats():
+    """Per-source latency and success rate of the external sites search"""
+    return {
+        source: METRICS.stage_summary(f"external.{source}")
+        for source, _ in EXTERNAL_SOURCES
+    }
+
+
 # ---------------------------
 # Main endpoint
 # ---------------------------
-@router.post("/photo/lookup")
-async def photo_lookup(file: UploadFile = File(...), db: Session = Depends(get_db)):
+@router.get("/photo/lookup/cache")
+def photo_lookup_cache_stats():
+    """Hit/miss counters of the OCR/parse result cache"""
+    return get_lookup_cache().stats()
+
+
+def preprocess_and_hash(contents: bytes):
     """
-    Endpoint for recognizing events from poster photos
+    CPU-bound part of stage 1; top-level so it can run in a process pool.
+    Timings are measured here and returned, since spans can't cross processes.
     """
-    logger.info(f"\n{'='*60}")
-    logger.info(f"NEW PHOTO LOOKUP REQUEST")
-    logger.info(f"{'='*60}")
-    logger.info(f"File: {file.filename}")
-    
-    # Read file
-    contents = await file.read()
-    
-    try:
-        pil_img = Image.open(io.BytesIO(contents))
-        logger.info(f"Image loaded: {pil_img.size}, mode: {pil_img.mode}")
-    except Exception as e:
-        logger.error(f"Failed to open image: {e}")
-        raise HTTPException(status_code=400, detail=f"Invalid image file: {e}")
+    started = time.perf_counter()
+    pil_img = Image.open(io.BytesIO(contents))
+    preprocessed_img = preprocess_image(pil_img)
+    hashed = time.perf_counter()
+    phash = compute_phash(preprocessed_img)
+    timings = {
+        "preprocess": (hashed - started) * 1000,
+        "phash": (time.perf_counter() - hashed) * 1000,
+    }
+    return preprocessed_img, phash, timings
+
+
+def analyze_upload(contents: bytes, cpu_pool: Optional[Executor] = None) -> Dict[str, Any]:
+    """
+    Stages 1-2: preprocessing, pHash, OCR and parsing (with result cache)
+    """
+    # Repeat uploads of the same poster skip preprocessing, OCR and parsing
+    cache = get_lookup_cache()
+    cache_key = content_key(contents)
+    with span("cache") as stage:
+        cached = cache.get(cache_key)
+        stage.outcome = "hit" if cached else "miss"
+    if cached:
+        logger.info("Lookup cache hit by content hash")
 
     # Stage 1: Preprocessing & OCR
     logger.info(f"\n{'─'*60}")
@@ -597,11 +674,25 @@ async def photo_lookup(file: UploadFile = File(...), db: Session = Depends(get_d
     logger.info(f"{'─'*60}")
     
     try:
-        preprocessed_img = preprocess_image(pil_img)
-        phash = compute_phash(preprocessed_img)
-        logger.info(f"Image hash: {phash}")
-        
-        text = ocr_image(preprocessed_img)
+        if cached:
+            phash = cached.phash
+            text = cached.text
+        else:
+            if cpu_pool is not None:
+                preprocessed_img, phash, timings = cpu_pool.submit(preprocess_and_hash, contents).result()
+            else:
+                preprocessed_img, phash, timings = preprocess_and_hash(contents)
+            for stage_name, duration_ms in timings.items():
+                record_span(stage_name, duration_ms)
+            logger.info(f"Image hash: {phash}")
+            
+            cached = cache.get_by_phash(phash)
+            if cached:
+                logger.info("Lookup cache hit by image hash")
+                text = cached.text
+                cache.put(cache_key, cached)
+            else:
+                text = ocr_image(preprocessed_img)
         logger.info(f"OCR result ({len(text)} chars): {text[:200]}...")
         
     except Exception as e:
@@ -613,116 +704,157 @@ async def photo_lookup(file: UploadFile = File(...), db: Session = Depends(get_d
     logger.info(f"STAGE 2: TEXT PARSING")
     logger.info(f"{'─'*60}")
     
-    try:
-        parsed = parse_text_to_fields(text)
-        logger.info(f"\nPARSED DATA:")
-        logger.info(f"  Title: {parsed.get('title')}")
-        logger.info(f"  Date: {parsed.get('date')}")
-        logger.info(f"  Price: {parsed.get('price')}")
-        logger.info(f"  Location: {parsed.get('location')}")
-    except Exception as e:
-        logger.error(f"Parsing failed: {e}")
-        parsed = {
-            "title": "Событие без названия",
-            "date": None,
-            "price": None,
-            "location": None,
-            "raw_text": text
-        }
+    if cached:
+        parsed = dict(cached.parsed)
+    else:
+        try:
+            with span("parse"):
+                parsed = parse_text_to_fields(text)
+            cache.put(cache_key, CachedLookup(phash=phash, text=text, parsed=parsed))
+        except Exception as e:
+            logger.error(f"Parsing failed: {e}")
+            parsed = {
+                "title": "Событие без названия",
+                "date": None,
+                "price": None,
+                "location": None,
+                "raw_text": text
+            }
+    logger.info(f"\nPARSED DATA:")
+    logger.info(f"  Title: {parsed.get('title')}")
+    logger.info(f"  Date: {parsed.get('date')}")
+    logger.info(f"  Price: {parsed.get('price')}")
+    logger.info(f"  Location: {parsed.get('location')}")
+
+    return {"phash": phash, "text": text, "parsed": parsed}
+
 
-    # Stage 3: Database search
+def match_existing(db: Session, parsed: Dict[str, Any], phash: str) -> Optional[Dict[str, Any]]:
+    """
+    Stage 3: database search, returns response content for a matched event
+    """
     logger.info(f"\n{'─'*60}")
     logger.info(f"STAGE 3: DATABASE SEARCH")
     logger.info(f"{'─'*60}")
     
     match = find_existing_event(db, parsed, phash)
-    if match:
-        logger.info(f"\nFOUND EXISTING EVENT IN DATABASE!")
-        logger.info(f"  Event ID: {match.id}")
-        logger.info(f"  Title: {match.title}")
-        logger.info(f"{'='*60}\n")
-        
-        return JSONResponse(content={
-            "action": "matched",
-            "event_id": match.id,
-            "event": {
-                "id": match.id,
-                "title": match.title,
-                "description": match.description or "",
-                "date": match.date.isoformat() if getattr(match, "date", None) else None,
-                "location": match.location or "",
-                "price": match.price,
-                "image_hash": getattr(match, "image_hash", None),
-            }
-        })
+    if not match:
+        return None
+
+    logger.info(f"\nFOUND EXISTING EVENT IN DATABASE!")
+    logger.info(f"  Event ID: {match.id}")
+    logger.info(f"  Title: {match.title}")
+    logger.info(f"{'='*60}\n")
+    return matched_response(match)
 
-    # Stage 4: External sites search
+
+def matched_response(match: EventModel) -> Dict[str, Any]:
+    return {
+        "action": "matched",
+        "event_id": match.id,
+        "event": {
+            "id": match.id,
+            "title": match.title,
+            "description": match.description or "",
+            "date": match.date.isoformat() if getattr(match, "date", None) else None,
+            "location": match.location or "",
+            "price": match.price,
+            "image_hash": getattr(match, "image_hash", None),
+        }
+    }
+
+
+def lookup_external(parsed: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Stage 4: external sites search
+    """
     logger.info(f"\n{'─'*60}")
     logger.info(f"STAGE 4: EXTERNAL SITES SEARCH")
     logger.info(f"{'─'*60}")
     
     query = parsed.get("title") or parsed.get("raw_text", "")[:100]
-    external = None
     
     if query and query != "Событие без названия":
-        external = search_external_sites(query)
+        return search_external_sites(query)
+    return None
 
-    if external:
-        logger.info(f"\nFOUND ON EXTERNAL SITE: {external.get('source')}")
+
+def create_external_event(db: Session, parsed: Dict[str, Any], phash: str, external: Dict[str, Any], commit: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Create event from external data, or match an existing event that the external
+    title duplicates; returns None if that failed
+    """
+    logger.info(f"\nFOUND ON EXTERNAL SITE: {external.get('source')}")
+    
+    # the external page may describe an event the catalog already has under a slightly different title
+    duplicate = DuplicateDetector(db).find_title(external.get("title"))
+    if duplicate is not None and duplicate.event_id is not None:
+        match = db.get(EventModel, duplicate.event_id)
+        if match is not None:
+            logger.info(f"External result duplicates Event #{match.id} (score: {duplicate.score:.2f})")
+            return matched_response(match)
+
+    try:
+        # Create event from external data
+        title = external.get("title") or parsed.get("title") or "Новое событие"
+        desc = external.get("description") or parsed.get("raw_text") or ""
         
-        try:
-            # Create event from external data
-            title = external.get("title") or parsed.get("title") or "Новое событие"
-            desc = external.get("description") or parsed.get("raw_text") or ""
-            
-            # Parse date from external source
-            dt = None
-            if external.get("date_text"):
-                try:
-                    dt = dateparser.parse(external["date_text"], languages=['ru'], fuzzy=True)
-                    if dt:
-                        dt = dt.astimezone(timezone.utc)
-                except Exception:
-                    pass
-            
-            ev_create = EventModel(
-                title=title,
-                description=desc,
-                date=dt or parsed.get("date") or datetime.now(timezone.utc),
-                location=parsed.get("location") or "",
-                price=parsed.get("price"),
-                image_url=None,
-                image_hash=phash,
-                raw_text=parsed.get("raw_text"),
-                parsed_by_ai=True,
-                source_url=external.get("url"),
-                created_at=datetime.now(timezone.utc)
-            )
-            
-            db.add(ev_create)
+        # Parse date from external source
+        dt = None
+        if external.get("date_text"):
+            try:
+                dt = dateparser.parse(external["date_text"], languages=['ru'], fuzzy=True)
+                if dt:
+                    dt = dt.astimezone(timezone.utc)
+            except Exception:
+                pass
+        
+        ev_create = EventModel(
+            title=title,
+            description=desc,
+            date=dt or parsed.get("date") or datetime.now(timezone.utc),
+            location=parsed.get("location") or "",
+            price=parsed.get("price"),
+            image_url=None,
+            image_hash=phash,
+            raw_text=parsed.get("raw_text"),
+            parsed_by_ai=True,
+            source_url=external.get("url"),
+            created_at=datetime.now(timezone.utc)
+        )
+        
+        db.add(ev_create)
+        db.flush()
+        if commit:
             db.commit()
             db.refresh(ev_create)
-            
-            logger.info(f"Created event from external data: Event #{ev_create.id}")
-            
-            return JSONResponse(content={
-                "action": "found_external",
-                "event_id": ev_create.id,
-                "event": {
-                    "id": ev_create.id,
-                    "title": ev_create.title,
-                    "description": ev_create.description,
-                    "date": ev_create.date.isoformat() if ev_create.date else None,
-                    "location": ev_create.location,
-                    "price": ev_create.price,
-                    "source_url": ev_create.source_url
-                }
-            })
-            
-        except Exception as e:
-            logger.exception(f"Failed to create event from external data: {e}")
+        
+        logger.info(f"Created event from external data: Event #{ev_create.id}")
+        
+        return {
+            "action": "found_external",
+            "event_id": ev_create.id,
+            "event": {
+                "id": ev_create.id,
+                "title": ev_create.title,
+                "description": ev_create.description,
+                "date": ev_create.date.isoformat() if ev_create.date else None,
+                "location": ev_create.location,
+                "price": ev_create.price,
+                "source_url": ev_create.source_url
+            }
+        }
+        
+    except Exception as e:
+        db.rollback()
+        logger.exception(f"Failed to create event from external data: {e}")
+        return None
+
 
-    # Stage 5: Create new event
+def create_poster_event(db: Session, parsed: Dict[str, Any], phash: str, commit: bool = True) -> Dict[str, Any]:
+    """
+    Stage 5: create new event from the parsed poster
+    """
     logger.info(f"\n{'─'*60}")
     logger.info(f"STAGE 5: CREATING NEW EVENT")
     logger.info(f"{'─'*60}")
@@ -751,8 +883,10 @@ async def photo_lookup(file: UploadFile = File(...), db: Session = Depends(get_d
         )
         
         db.add(ev_create)
-        db.commit()
-        db.refresh(ev_create)
+        db.flush()
+        if commit:
+            db.commit()
+            db.refresh(ev_create)
         
         logger.info(f"\nCREATED NEW EVENT!")
         logger.info(f"  Event ID: {ev_create.id}")
@@ -762,7 +896,7 @@ async def photo_lookup(file: UploadFile = File(...), db: Session = Depends(get_d
         logger.info(f"  Price: {ev_create.price}")
         logger.info(f"{'='*60}\n")
         
-        return JSONResponse(content={
+        return {
             "action": "created",
             "event_id": ev_create.id,
             "event": {
@@ -774,8 +908,66 @@ async def photo_lookup(file: UploadFile = File(...), db: Session = Depends(get_d
                 "price": ev_create.price,
                 "raw_text": ev_create.raw_text
             }
-        })
+        }
         
     except Exception as e:
+        db.rollback()
         logger.exception(f"Failed to create event: {e}")
-        raise HTTPException(status_code=500, detail="Failed to create event")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to create event")
+
+
+def run_lookup(db: Session, contents: bytes, trace: Optional[Trace] = None) -> Dict[str, Any]:
+    """
+    Full synchronous pipeline; blocking, so callers run it off the event loop.
+    Stage spans go to ``trace`` when given (and to the metrics in any case)
+    """
+    with activate(trace):
+        analysis = analyze_upload(contents)
+        parsed, phash = analysis["parsed"], analysis["phash"]
+
+        matched = match_existing(db, parsed, phash)
+        if matched:
+            return matched
+
+        external = lookup_external(parsed)
+        if external:
+            with span("create"):
+                created = create_external_event(db, parsed, phash, external)
+            if created:
+                return created
+
+        with span("create"):
+            return create_poster_event(db, parsed, phash)
+
+
+def open_upload_image(contents: bytes) -> Image.Image:
+    try:
+        pil_img = Image.open(io.BytesIO(contents))
+        logger.info(f"Image loaded: {pil_img.size}, mode: {pil_img.mode}")
+        return pil_img
+    except Exception as e:
+        logger.error(f"Failed to open image: {e}")
+        raise HTTPException(status_code=400, detail=f"Invalid image file: {e}")
+
+
+@router.post("/photo/lookup")
+async def photo_lookup(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """
+    Endpoint for recognizing events from poster photos
+    """
+    logger.info(f"\n{'='*60}")
+    logger.info(f"NEW PHOTO LOOKUP REQUEST")
+    logger.info(f"{'='*60}")
+    logger.info(f"File: {file.filename}")
+    
+    # Read file
+    contents = await file.read()
+    open_upload_image(contents)
+
+    # Pillow, tesseract, scraping and SQLAlchemy are blocking — keep them off the event loop
+    trace = Trace("photo_lookup")
+    content = await run_in_threadpool(run_lookup, db, contents, trace)
+    logger.info(f"Stage timings: {trace.server_timing()}")
+
+    headers = {"Server-Timing": trace.server_timing()} if get_settings().server_timing_enabled else None
+    return JSONResponse(content=content, headers=headers)
@@ -1,28 +1,31 @@
 # api/endpoints/photo_search.py
-from fastapi import APIRouter, Depends, File, UploadFile, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, File, Query, UploadFile, HTTPException
+from typing import List, Optional
 import imagehash
 from PIL import Image
 from io import BytesIO
 import requests
+import time
 from sqlalchemy.orm import Session
 from database import get_db
-from models.event import Event
+from repositories.events import EventRepository
+from services.image_hashing import fingerprint_image
+from services.image_match import ImageThresholds, match_fingerprint
 import binascii
 
 router = APIRouter()
 
-def compute_phash_from_pil(img: Image.Image):
-    # 64-bit pHash
-    ph = imagehash.phash(img)
-    return ph  # imagehash.ImageHash object
-
 def phash_hex_to_hashobj(hexstr: str):
     # восстановить ImageHash из hex
     return imagehash.ImageHash(hexstr=hexstr)
 
 @router.post("/photo/", tags=["search"])
-async def search_similar_events_by_photo(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def search_similar_events_by_photo(
+    file: UploadFile = File(...),
+    top_k: int = Query(default=10, ge=1, le=100),
+    max_distance: Optional[int] = Query(default=None, ge=0, le=64),
+    db: Session = Depends(get_db),
+):
     # ^^^^ ИЗМЕНИЛИ ИМЯ ФУНКЦИИ
     # Ограничение типа/размера
     if file.content_type.split("/")[0] != "image":
@@ -34,37 +37,32 @@ async def search_similar_events_by_photo(file: UploadFile = File(...), db: Sessi
     except Exception as e:
         raise HTTPException(status_code=400, detail="Не удалось открыть изображение")
 
-    query_hash = compute_phash_from_pil(img)
-
-    # получить все события с непустым image_hash
-    events = db.query(Event).filter(Event.image_hash.isnot(None)).all()
-
-    results = []
-    for ev in events:
-        try:
-            stored_hex = ev.image_hash
-            stored_hash = phash_hex_to_hashobj(stored_hex)
-            distance = query_hash - stored_hash  # Хэммингово расстояние
-            results.append({"event_id": ev.id, "distance": int(distance)})
-        except Exception:
-            continue
+    started = time.perf_counter()
+    query = fingerprint_image(img)
 
-    # сортировка по distance
-    results.sort(key=lambda x: x["distance"])
-    # взять первые 10, фильтровать по порогу (например distance <= 14)
-    threshold = 14
-    filtered = [r for r in results if r["distance"] <= threshold][:10]
+    # каскад: кандидаты по общему pHash-индексу, подтверждение по dHash и colorhash;
+    # max_distance, если задан, заменяет нестрогий порог pHash из настроек
+    found = match_fingerprint(db, query, top_k=top_k, thresholds=ImageThresholds.from_settings(phash_loose=max_distance))
 
-    # вернуть события + расстояния
+    # карточки для итогового top-k — одним IN-запросом и только нужные поля
+    summaries = EventRepository(db).list_summaries([m.event_id for m in found.matches])
     out = []
-    for r in filtered:
-        ev = db.query(Event).get(r["event_id"])
-        if ev:  # добавил проверку на None
+    for r in found.matches:
+        ev = summaries.get(r.event_id)
+        if ev:  # событие могли удалить между индексом и запросом
             out.append({
                 "id": ev.id,
                 "title": ev.title,
                 "image_url": ev.image_url,
-                "distance": r["distance"],
+                "distance": r.phash_distance,
+                "dhash_distance": r.dhash_distance,
+                "colorhash_distance": r.colorhash_distance,
+                "score": round(r.score, 4),
             })
 
-    return {"query_matches": out}
\ No newline at end of file
+    return {
+        "query_matches": out,
+        "scanned": found.scanned,
+        "confirmed": found.confirmed,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
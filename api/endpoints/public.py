@@ -7,12 +7,20 @@ from fastapi import APIRouter, Depends, HTTPException, Query, status
 
 from dependencies import get_event_repository
 from repositories.events import EventRepository
-from schemas import PublicEventListResponse, PublicEventQueryParams, PublicEventRead
+from schemas import (
+    PublicEventCard,
+    PublicEventCardListResponse,
+    PublicEventListPage,
+    PublicEventListResponse,
+    PublicEventQueryParams,
+    PublicEventRead,
+)
+from services.cursors import InvalidCursor
 
 router = APIRouter()
 
 
-@router.get("/public/events", response_model=PublicEventListResponse)
+@router.get("/public/events", response_model=PublicEventListPage)
 def list_public_events(
     q: Optional[str] = Query(default=None),
     category: Optional[str] = Query(default=None),
@@ -20,10 +28,12 @@ def list_public_events(
     date_from: Optional[date] = Query(default=None),
     date_to: Optional[date] = Query(default=None),
     upcoming_only: bool = True,
-    sort_by: str = Query(default="date", pattern="^(date|created_at|title)$"),
+    sort_by: str = Query(default="date", pattern="^(date|created_at|title|relevance)$"),
     sort_order: str = Query(default="asc", pattern="^(asc|desc)$"),
     page: int = Query(default=1, ge=1),
     page_size: int = Query(default=12, ge=1, le=50),
+    cursor: Optional[str] = Query(default=None),
+    view: str = Query(default="full", pattern="^(full|compact)$"),
     events: EventRepository = Depends(get_event_repository),
 ):
     params = PublicEventQueryParams(
@@ -37,10 +47,25 @@ def list_public_events(
         sort_order=sort_order,
         page=page,
         page_size=page_size,
+        cursor=cursor,
+        view=view,
+    )
+    try:
+        items, count, next_cursor = events.list_public(params)
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    item_schema, response_schema = (
+        (PublicEventCard, PublicEventCardListResponse) if params.view == "compact" else (PublicEventRead, PublicEventListResponse)
+    )
+    payload = [item_schema.model_validate(item) for item in items]
+    return response_schema.build(
+        items=payload,
+        total=count.total,
+        page=params.page,
+        page_size=params.page_size,
+        next_cursor=next_cursor,
+        total_mode=count.mode,
     )
-    items, total = events.list_public(params)
-    payload = [PublicEventRead.model_validate(item) for item in items]
-    return PublicEventListResponse.build(items=payload, total=total, page=params.page, page_size=params.page_size)
 
 
 @router.get("/public/events/{event_id}", response_model=PublicEventRead)
@@ -1,19 +1,29 @@
 # api/endpoints/scrape.py
 from fastapi import APIRouter, HTTPException, Body, Depends
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 from bs4 import BeautifulSoup
-import requests
-from io import BytesIO
-from PIL import Image
-import imagehash
 from dateutil import parser as dateparser
 from database import get_db, SessionLocal
+from dependencies import get_current_user_from_token
 from sqlalchemy.orm import Session
 from models.event import Event
+from models.scraped_page import ScrapedPage
+from services.fingerprints import candidate_fingerprint, candidate_key, page_fingerprint
+from services.duplicates import DuplicateDetector
+from services.html_extract import has_json_ld, parse_full, parse_structured
+from services.http_client import get_scrape_client
+from services.image_hashing import fingerprint_url
+from services.phash import ImageFingerprint
+from services.tracing import Trace, activate, span
+from services.urls import normalize_url
+from settings import get_settings
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
 import logging
 import re
 from urllib.parse import urljoin
-from difflib import SequenceMatcher
 
 router = APIRouter()
 logger = logging.getLogger("scrape")
@@ -25,22 +35,13 @@ HEADERS = {
 }
 
 def safe_get(url, timeout=8):
-    r = requests.get(url, headers=HEADERS, timeout=timeout)
+    r = get_scrape_client().get(url, headers=HEADERS, timeout=timeout)
     r.raise_for_status()
     return r
 
-def compute_phash_from_url(url):
-    try:
-        r = safe_get(url, timeout=6)
-        img = Image.open(BytesIO(r.content)).convert("RGB")
-        ph = imagehash.phash(img)
-        return str(ph)
-    except Exception as e:
-        logger.debug("phash failed for %s: %s", url, e)
-        return None
-
-def text_similarity(a: str, b: str) -> float:
-    return SequenceMatcher(None, (a or "").lower(), (b or "").lower()).ratio()
+def compute_fingerprint_from_url(url) -> Optional[ImageFingerprint]:
+    # streamed with a byte cap, JPEGs decoded at reduced scale; pHash, dHash and colorhash from one decode
+    return fingerprint_url(url, timeout=6, headers=HEADERS)
 
 def parse_json_ld(soup: BeautifulSoup) -> List[Dict[str, Any]]:
     out = []
@@ -65,14 +66,14 @@ def parse_json_ld(soup: BeautifulSoup) -> List[Dict[str, Any]]:
                         image = image[0]
                     if isinstance(image, dict):
                         image = image.get("url")
-                    out.append({"title": title, "description": desc, "date": date, "location": location, "image": image})
+                    out.append({"title": title, "description": desc, "date": date, "location": location, "image": image, "url": it.get("url")})
         except Exception as e:
             logger.debug("json-ld parse error: %s", e)
     return out
 
 def parse_open_graph(soup: BeautifulSoup, base_url: str) -> Dict[str, str]:
     og = {}
-    for prop in ["og:title", "og:description", "og:image"]:
+    for prop in ["og:title", "og:description", "og:image", "og:url"]:
         tag = soup.find("meta", property=prop)
         if tag and tag.get("content"):
             og[prop] = urljoin(base_url, tag["content"])
@@ -115,65 +116,52 @@ def normalize_date(dt_str):
         return None
 
 # ---- dedup check ----
-def is_duplicate(db: Session, candidate: Dict[str, Any], title_threshold=0.75, image_threshold=14) -> bool:
-    # check by title similarity vs recent events
-    title = (candidate.get("title") or "").strip()
-    if title:
-        recent = db.query(Event).order_by(Event.created_at.desc()).limit(200).all()
-        for ev in recent:
-            sim = text_similarity(title, ev.title or "")
-            if sim >= title_threshold:
-                logger.info("Duplicate by title: %s ~ %s (sim=%.2f)", title, ev.title, sim)
-                return True
-    # check by image hash distance
-    img = candidate.get("image")
-    if img:
-        new_hash = compute_phash_from_url(img)
-        if new_hash:
-            for ev in db.query(Event).filter(Event.image_hash.isnot(None)).all():
-                try:
-                    dist = imagehash.hex_to_hash(new_hash) - imagehash.hex_to_hash(ev.image_hash)
-                    if dist <= image_threshold:
-                        logger.info("Duplicate by image hash: dist=%s", dist)
-                        return True
-                except Exception:
-                    continue
-    return False
+def is_duplicate(db: Session, candidate: Dict[str, Any], title_threshold=0.75, image_threshold=None) -> bool:
+    image = candidate.get("image_hash")
+    if image is None and candidate.get("image"):
+        image = compute_fingerprint_from_url(candidate["image"])
+    dedup = DuplicateDetector(db, title_threshold=title_threshold, image_threshold=image_threshold)
+    return dedup.check(candidate.get("title"), image) is not None
 
-# ---- main scraper entry point ----
-@router.post("/scrape/", tags=["scrape"])
-def scrape_url(payload: Dict = Body(...), db: Session = Depends(get_db)):
-    """
-    payload: {"url": "https://site.example/events/123", "max_items": 10}
-    """
-    url = payload.get("url")
-    max_items = int(payload.get("max_items", 10))
-    if not url:
-        raise HTTPException(status_code=400, detail="Provide 'url' in body")
 
-    try:
-        r = safe_get(url, timeout=10)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Fetch failed: {e}")
+def hash_images(urls: List[str]) -> Dict[str, Optional[ImageFingerprint]]:
+    """Download and fingerprint every distinct image URL exactly once, concurrently"""
+    unique = list(dict.fromkeys(u for u in urls if u))
+    if not unique:
+        return {}
+    workers = min(get_settings().scrape_image_workers, len(unique))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scrape-images") as pool:
+        hashes = pool.map(lambda u: contextvars.copy_context().run(compute_fingerprint_from_url, u), unique)
+        return dict(zip(unique, hashes))
 
-    base = r.url
-    soup = BeautifulSoup(r.text, "html.parser")
 
+def extract_candidates(html: str, base: str, max_items: int, soup: Optional[BeautifulSoup] = None) -> List[Dict[str, Any]]:
+    """
+    JSON-LD and OpenGraph come from a partial parse that keeps only <meta> and
+    ld+json <script> tags; the full DOM is built only when JSON-LD has no events
+    and the card heuristic has to run. Pages without any ld+json marker are parsed
+    fully right away, once. Pass `soup` if the caller already has the full tree
+    (the crawler needs it for links anyway)
+    """
     found = []
+    if soup is None and not has_json_ld(html):
+        soup = parse_full(html)
+    head = soup if soup is not None else parse_structured(html)
     # 1) JSON-LD
-    jsonld = parse_json_ld(soup)
+    jsonld = parse_json_ld(head)
     if jsonld:
         found.extend(jsonld)
 
     # 2) OG fallback (single event)
-    og = parse_open_graph(soup, base)
+    og = parse_open_graph(head, base)
     if og:
-        found.append({"title": og.get("og:title"), "description": og.get("og:description"), "date": None, "location": None, "image": og.get("og:image")})
+        found.append({"title": og.get("og:title"), "description": og.get("og:description"), "date": None, "location": None, "image": og.get("og:image"), "url": og.get("og:url")})
 
-    # 3) heuristic list parsing
-    heur = fallback_event_from_html(soup, base)
-    if heur:
-        found.extend(heur)
+    # 3) heuristic list parsing — only for pages without structured events
+    if not jsonld:
+        heur = fallback_event_from_html(soup if soup is not None else parse_full(html), base)
+        if heur:
+            found.extend(heur)
 
     # keep unique by title
     uniq = []
@@ -185,38 +173,177 @@ def scrape_url(payload: Dict = Body(...), db: Session = Depends(get_db)):
         if t.lower() in seen_titles:
             continue
         seen_titles.add(t.lower())
+        if it.get("url"):
+            it["url"] = urljoin(base, it["url"])
         uniq.append(it)
         if len(uniq) >= max_items:
             break
+    return uniq
 
-    added = []
-    skipped = []
-    for cand in uniq:
-        # normalize things
-        cand_title = cand.get("title")
-        cand_date = normalize_date(cand.get("date"))
-        cand_location = cand.get("location")
-        cand_image = cand.get("image")
-        # dedup
-        dup = is_duplicate(db, {"title": cand_title, "image": cand_image})
-        if dup:
-            skipped.append({"title": cand_title})
-            continue
-        # compute image_hash (optional)
-        img_hash = None
-        if cand_image:
-            img_hash = compute_phash_from_url(cand_image)
-        # create Event entry
-        ev = Event(
-            title=cand_title or "Без названия",
-            description=cand.get("description"),
-            date=cand_date,
-            location=cand_location,
-            image_url=cand_image,
-            image_hash=img_hash
+
+@dataclass
+class PageIngest:
+    """Outcome of applying one page's candidates to the database"""
+    added: List[Event] = field(default_factory=list)
+    updated: List[Event] = field(default_factory=list)
+    unchanged: int = 0
+    skipped: List[Dict[str, Any]] = field(default_factory=list)
+    page_unchanged: bool = False
+
+
+def known_page(db: Session, page_url: str, owner_id: int) -> Optional[ScrapedPage]:
+    """The page as last ingested for ``owner_id``; another user's ingest does not count"""
+    return db.query(ScrapedPage).filter(ScrapedPage.url == page_url, ScrapedPage.owner_id == owner_id).first()
+
+
+def _apply_candidate(ev: Event, cand: Dict[str, Any], image_hashes: Dict[str, Optional[ImageFingerprint]]) -> None:
+    ev.title = cand.get("title") or ev.title
+    ev.description = cand.get("description")
+    ev.date = normalize_date(cand.get("date"))
+    ev.location = cand.get("location")
+    if cand.get("image") != ev.image_url:
+        ev.image_url = cand.get("image")
+        ev.set_image_fingerprint(image_hashes.get(ev.image_url))
+
+
+def ingest_page(
+    db: Session,
+    page_url: str,
+    candidates: List[Dict[str, Any]],
+    owner_id: int,
+    dedup: Optional[DuplicateDetector] = None,
+) -> PageIngest:
+    """
+    Apply a page's candidates incrementally. Every candidate gets a content
+    fingerprint stored next to the event: an unchanged page or candidate is
+    skipped in O(1), a changed one is updated in place, and only new candidates
+    have their images hashed and go through the duplicate checks.
+    Nothing is committed — the caller owns the transaction
+    """
+    result = PageIngest()
+    fingerprints = [candidate_fingerprint(cand) for cand in candidates]
+    page_fp = page_fingerprint(fingerprints)
+    now = datetime.now(timezone.utc)
+
+    page = db.query(ScrapedPage).filter(ScrapedPage.url == page_url).first()
+    if page is not None and page.owner_id == owner_id and page.fingerprint == page_fp:
+        page.last_scraped_at = now
+        result.page_unchanged = True
+        result.unchanged = len(candidates)
+        return result
+
+    keys = [candidate_key(page_url, cand) for cand in candidates]
+    existing = (
+        {ev.source_key: ev for ev in db.query(Event).filter(Event.owner_id == owner_id, Event.source_key.in_(keys))}
+        if keys
+        else {}
+    )
+    fresh = []
+    changed = []
+    for cand, key, fp in zip(candidates, keys, fingerprints):
+        ev = existing.get(key)
+        if ev is None:
+            fresh.append((cand, key, fp))
+        elif ev.content_fingerprint == fp:
+            result.unchanged += 1
+        else:
+            changed.append((ev, cand, fp))
+
+    with span("scrape.images"):
+        image_hashes = hash_images(
+            [cand.get("image") for cand, _, _ in fresh]
+            + [cand.get("image") for ev, cand, _ in changed if cand.get("image") != ev.image_url]
         )
-        db.add(ev)
-        db.commit()
-        db.refresh(ev)
-        added.append({"id": ev.id, "title": ev.title})
-    return {"url": url, "found": len(uniq), "added": added, "skipped": skipped}
+
+    with span("scrape.dedup"):
+        if fresh and dedup is None:
+            dedup = DuplicateDetector(db)
+        for ev, cand, fp in changed:
+            _apply_candidate(ev, cand, image_hashes)
+            ev.content_fingerprint = fp
+            result.updated.append(ev)
+        for cand, key, fp in fresh:
+            cand_title = cand.get("title")
+            cand_image = cand.get("image")
+            image = image_hashes.get(cand_image)
+            if dedup.check(cand_title, image):
+                result.skipped.append({"title": cand_title})
+                continue
+            dedup.remember(cand_title, image)
+            ev = Event(
+                title=cand_title or "Без названия",
+                description=cand.get("description"),
+                date=normalize_date(cand.get("date")),
+                location=cand.get("location"),
+                image_url=cand_image,
+                source_url=cand.get("url") or page_url,
+                source_key=key,
+                content_fingerprint=fp,
+                owner_id=owner_id,
+            )
+            ev.set_image_fingerprint(image)
+            result.added.append(ev)
+
+    if page is None:
+        page = ScrapedPage(url=page_url)
+        db.add(page)
+    page.fingerprint = page_fp
+    page.owner_id = owner_id
+    page.candidate_count = len(candidates)
+    page.last_scraped_at = now
+    page.last_changed_at = now
+    return result
+
+
+# ---- main scraper entry point ----
+@router.post("/scrape/", tags=["scrape"])
+def scrape_url(payload: Dict = Body(...), db: Session = Depends(get_db), current_user=Depends(get_current_user_from_token)):
+    """
+    payload: {"url": "https://site.example/events/123", "max_items": 10}
+
+    Pipeline: fetch -> extract -> images (concurrent, each URL once) -> dedup
+    (in memory) -> insert (one transaction); per-phase timings in the response
+    """
+    url = payload.get("url")
+    max_items = int(payload.get("max_items", 10))
+    if not url:
+        raise HTTPException(status_code=400, detail="Provide 'url' in body")
+
+    trace = Trace("scrape")
+    with activate(trace):
+        try:
+            with span("scrape.fetch"):
+                r = safe_get(url, timeout=10)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Fetch failed: {e}")
+
+        page_url = normalize_url(r.url) or r.url
+        if getattr(r, "from_cache", False) and known_page(db, page_url, current_user.id) is not None:
+            # 304 from the conditional cache for a page we already ingested — nothing to parse
+            ingest = PageIngest(page_unchanged=True)
+            uniq = []
+        else:
+            with span("scrape.extract"):
+                uniq = extract_candidates(r.text, r.url, max_items)
+            ingest = ingest_page(db, page_url, uniq, current_user.id)
+
+        with span("scrape.insert"):
+            db.add_all(ingest.added)
+            db.flush()
+            # ids are read before commit expires the instances
+            added = [{"id": ev.id, "title": ev.title} for ev in ingest.added]
+            updated = [{"id": ev.id, "title": ev.title} for ev in ingest.updated]
+            db.commit()
+
+    timings = {s.name.removeprefix("scrape."): round(s.duration_ms, 2) for s in trace.spans if s.name.startswith("scrape.")}
+    timings["total"] = round(trace.elapsed_ms, 2)
+    return {
+        "url": url,
+        "found": len(uniq),
+        "added": added,
+        "updated": updated,
+        "unchanged": ingest.unchanged,
+        "page_unchanged": ingest.page_unchanged,
+        "skipped": ingest.skipped,
+        "timings_ms": timings,
+    }
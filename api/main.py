@@ -1,19 +1,38 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from database import Base, engine
+import migrations  # noqa: F401
+from database import Base, SessionLocal, engine
 from endpoints import health, search
 from endpoints import auth as auth_endpoints
-from endpoints import events, external, photo_debug, photo_lookup, photo_search, public, scrape, seo, users
+from endpoints import crawl, events, external, photo_debug, photo_jobs, photo_lookup, photo_search, public, scrape, seo, users
+from models.crawl_job import CrawlFrontierItem, CrawlJob  # noqa: F401
 from models.event import Event  # noqa: F401
 from models.event_file import EventFile  # noqa: F401
+from models.lookup_job import PhotoLookupJob  # noqa: F401
 from models.refresh_token import RefreshToken  # noqa: F401
+from models.scraped_page import ScrapedPage  # noqa: F401
 from models.user import User  # noqa: F401
+from services.crawler import get_crawl_job_runner
+from services.lookup_jobs import get_lookup_job_runner
 from settings import get_settings
 
 settings = get_settings()
 
-app = FastAPI(title=settings.app_name, version=settings.app_version)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # незавершённые photo lookup задачи и обходы сайтов продолжаются после рестарта;
+    # каждую задачу забирает ровно один воркер — через аренду в БД
+    if settings.resume_jobs_on_startup:
+        get_lookup_job_runner().resume_pending(SessionLocal)
+        get_crawl_job_runner().resume_pending(SessionLocal)
+    yield
+
+
+app = FastAPI(title=settings.app_name, version=settings.app_version, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -36,7 +55,9 @@ app.include_router(search.router, prefix="/api/v1", tags=["search"])
 app.include_router(photo_search.router, prefix="/api/v1", tags=["photo_search"])
 app.include_router(photo_debug.router, prefix="/api/v1", tags=["photo_debug"])
 app.include_router(scrape.router, prefix="/api/v1", tags=["scrape"])
+app.include_router(crawl.router, prefix="/api/v1", tags=["scrape"])
 app.include_router(photo_lookup.router, prefix="/api/v1", tags=["photo_lookup"])
+app.include_router(photo_jobs.router, prefix="/api/v1", tags=["photo_lookup"])
 app.include_router(public.router, prefix="/api/v1", tags=["public"])
 app.include_router(external.router, prefix="/api/v1", tags=["external"])
 app.include_router(auth_endpoints.router, prefix="/api/v1", tags=["auth"])
@@ -0,0 +1,139 @@
+"""Лёгкие аддитивные миграции поверх ``Base.metadata.create_all``.
+
+``create_all`` не трогает уже существующие таблицы, поэтому после него добавляем
+недостающие nullable-колонки и индексы, заполняем производные поля и создаём
+полнотекстовый индекс и журнал изменений событий (на SQLite).
+"""
+
+from __future__ import annotations
+
+import logging
+
+from sqlalchemy import bindparam, event as sa_event, inspect, text
+
+from database import Base
+from services.event_changes import create_event_changes
+from services.minhash import lsh_buckets
+from services.phash import hash_bands, phash_to_int, to_signed64
+from services.search_index import create_events_fts
+from services.text_norm import fold_case
+
+logger = logging.getLogger("migrations")
+
+
+def _add_missing_columns(connection) -> None:
+    inspector = inspect(connection)
+    preparer = connection.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                logger.warning("Колонку %s.%s нельзя добавить автоматически: NOT NULL", table.name, column.name)
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(
+                text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} {column_type}")
+            )
+            logger.info("Добавлена колонка %s.%s", table.name, column.name)
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def _backfill_image_hash_columns(connection) -> None:
+    events = Base.metadata.tables["events"]
+    rows = connection.execute(
+        text("SELECT id, image_hash FROM events WHERE image_hash IS NOT NULL AND image_hash_int IS NULL")
+    ).all()
+    updates = []
+    for event_id, image_hash in rows:
+        value = phash_to_int(image_hash)
+        if value is None:
+            continue
+        band0, band1, band2, band3 = hash_bands(value)
+        updates.append(
+            {
+                "event_id": event_id,
+                "hash_int": to_signed64(value),
+                "band0": band0,
+                "band1": band1,
+                "band2": band2,
+                "band3": band3,
+            }
+        )
+    if updates:
+        connection.execute(
+            events.update().where(events.c.id == bindparam("event_id")).values(
+                image_hash_int=bindparam("hash_int"),
+                image_hash_band0=bindparam("band0"),
+                image_hash_band1=bindparam("band1"),
+                image_hash_band2=bindparam("band2"),
+                image_hash_band3=bindparam("band3"),
+            ),
+            updates,
+        )
+        logger.info("Заполнены целочисленные pHash-колонки для %d событий", len(updates))
+
+
+def _backfill_title_buckets(connection) -> None:
+    buckets = Base.metadata.tables["event_title_buckets"]
+    rows = connection.execute(
+        text(
+            "SELECT id, title FROM events WHERE title IS NOT NULL AND title <> '' "
+            "AND NOT EXISTS (SELECT 1 FROM event_title_buckets b WHERE b.event_id = events.id)"
+        )
+    ).all()
+    inserts = [{"event_id": event_id, "bucket": bucket} for event_id, title in rows for bucket in lsh_buckets(title)]
+    if inserts:
+        connection.execute(buckets.insert(), inserts)
+        logger.info("Построены LSH-корзины заголовков для %d событий", len(rows))
+
+
+def _backfill_normalized_columns(connection) -> None:
+    events = Base.metadata.tables["events"]
+    rows = connection.execute(
+        text(
+            "SELECT id, title, category, location FROM events WHERE "
+            "(title IS NOT NULL AND title_norm IS NULL) "
+            "OR (category IS NOT NULL AND category_norm IS NULL) "
+            "OR (location IS NOT NULL AND location_norm IS NULL)"
+        )
+    ).all()
+    updates = [
+        {
+            "event_id": event_id,
+            "title_norm": fold_case(title),
+            "category_norm": fold_case(category),
+            "location_norm": fold_case(location),
+        }
+        for event_id, title, category, location in rows
+    ]
+    if updates:
+        connection.execute(
+            events.update().where(events.c.id == bindparam("event_id")).values(
+                title_norm=bindparam("title_norm"),
+                category_norm=bindparam("category_norm"),
+                location_norm=bindparam("location_norm"),
+            ),
+            updates,
+        )
+        logger.info("Заполнены нормализованные колонки для %d событий", len(updates))
+
+
+BACKFILLS = [
+    _backfill_image_hash_columns,
+    _backfill_title_buckets,
+    _backfill_normalized_columns,
+]
+
+
+@sa_event.listens_for(Base.metadata, "after_create")
+def upgrade_schema(target, connection, **kw) -> None:
+    _add_missing_columns(connection)
+    for backfill in BACKFILLS:
+        backfill(connection)
+    create_events_fts(connection)
+    create_event_changes(connection)
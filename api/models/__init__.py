@@ -1,6 +1,26 @@
+from .crawl_job import CrawlFrontierItem, CrawlJob, CrawlJobStatus, FrontierStatus
 from .event import Event
 from .event_file import EventFile
+from .event_image_fingerprint import EventImageFingerprint
+from .event_title_bucket import EventTitleBucket
+from .lookup_job import LookupJobStatus, PhotoLookupJob
 from .refresh_token import RefreshToken
+from .scraped_page import ScrapedPage
 from .user import User, UserRole
 
-__all__ = ["Event", "EventFile", "RefreshToken", "User", "UserRole"]
+__all__ = [
+    "CrawlFrontierItem",
+    "CrawlJob",
+    "CrawlJobStatus",
+    "Event",
+    "EventFile",
+    "EventImageFingerprint",
+    "EventTitleBucket",
+    "FrontierStatus",
+    "LookupJobStatus",
+    "PhotoLookupJob",
+    "RefreshToken",
+    "ScrapedPage",
+    "User",
+    "UserRole",
+]
@@ -0,0 +1,60 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, LargeBinary, String, Text, UniqueConstraint
+from sqlalchemy.sql import func
+
+from database import Base
+
+
+class CrawlJobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    ACTIVE = {QUEUED, RUNNING}
+
+
+class FrontierStatus:
+    PENDING = "pending"
+    IN_PROGRESS = "in_progress"
+    DONE = "done"
+    FAILED = "failed"
+    # скачана, но не разобрана: редирект на другой хост или на уже известный адрес
+    SKIPPED = "skipped"
+
+
+class CrawlJob(Base):
+    __tablename__ = "crawl_jobs"
+
+    id = Column(String(36), primary_key=True)
+    status = Column(String(20), nullable=False, default=CrawlJobStatus.QUEUED, index=True)
+    seed_url = Column(String, nullable=False)
+    max_depth = Column(Integer, nullable=False, default=2)
+    max_pages = Column(Integer, nullable=False, default=100)
+    pages_fetched = Column(Integer, nullable=False, default=0)
+    # страницы, которые не удалось скачать; nullable — чтобы колонка добавлялась в старые базы
+    pages_failed = Column(Integer, nullable=True, default=0)
+    events_added = Column(Integer, nullable=False, default=0)
+    events_skipped = Column(Integer, nullable=False, default=0)
+    # Bloom-фильтр нормализованных URL, уже попавших во frontier
+    visited_bloom = Column(LargeBinary, nullable=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    # аренда задачи процессом (services/job_leases.py): кто выполняет и до какого момента
+    lease_owner = Column(String(64), nullable=True)
+    lease_until = Column(DateTime, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class CrawlFrontierItem(Base):
+    __tablename__ = "crawl_frontier"
+    __table_args__ = (UniqueConstraint("job_id", "url", name="uq_crawl_frontier_job_url"),)
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String(36), ForeignKey("crawl_jobs.id"), nullable=False, index=True)
+    url = Column(String, nullable=False)
+    depth = Column(Integer, nullable=False, default=0)
+    status = Column(String(20), nullable=False, default=FrontierStatus.PENDING, index=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
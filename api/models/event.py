@@ -1,8 +1,13 @@
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
 
 from database import Base
+from models.event_image_fingerprint import EventImageFingerprint
+from models.event_title_bucket import EventTitleBucket
+from services.minhash import lsh_buckets
+from services.phash import hash_bands, phash_to_int, to_signed64
+from services.text_norm import fold_case
 
 
 class Event(Base):
@@ -10,11 +15,21 @@ class Event(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
+    # casefold-копии (ё -> е) для фильтров и сортировки одним индексируемым предикатом
+    title_norm = Column(String, nullable=True, index=True)
+    category_norm = Column(String(100), nullable=True, index=True)
+    location_norm = Column(String, nullable=True, index=True)
     description = Column(Text, nullable=True)
-    date = Column(DateTime, nullable=True)
+    date = Column(DateTime, nullable=True, index=True)
     location = Column(String, nullable=True)
     image_url = Column(String, nullable=True)
     image_hash = Column(String(64), nullable=True)
+    # pHash как знаковый 64-битный int и четыре 16-битные полосы для индексного поиска
+    image_hash_int = Column(BigInteger, nullable=True)
+    image_hash_band0 = Column(Integer, nullable=True, index=True)
+    image_hash_band1 = Column(Integer, nullable=True, index=True)
+    image_hash_band2 = Column(Integer, nullable=True, index=True)
+    image_hash_band3 = Column(Integer, nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     price = Column(String(50), nullable=True)
     category = Column(String(100), nullable=True, index=True)
@@ -22,7 +37,45 @@ class Event(Base):
     raw_text = Column(Text, nullable=True)
     parsed_by_ai = Column(Boolean, default=False)
     source_url = Column(String, nullable=True)
+    # ключ кандидата на странице-источнике и отпечаток его содержимого для инкрементального скрапинга
+    source_key = Column(String(64), nullable=True, index=True)
+    content_fingerprint = Column(String(64), nullable=True)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
 
     owner = relationship("User", back_populates="events")
     files = relationship("EventFile", back_populates="event", cascade="all, delete-orphan")
+    image_fingerprint = relationship(
+        "EventImageFingerprint", back_populates="event", uselist=False, cascade="all, delete-orphan"
+    )
+    title_buckets = relationship("EventTitleBucket", back_populates="event", cascade="all, delete-orphan")
+
+    @validates("image_hash")
+    def _sync_image_hash_columns(self, key, value):
+        number = phash_to_int(value)
+        bands = hash_bands(number) if number is not None else [None] * 4
+        self.image_hash_int = to_signed64(number) if number is not None else None
+        self.image_hash_band0, self.image_hash_band1, self.image_hash_band2, self.image_hash_band3 = bands
+        return value
+
+    def set_image_fingerprint(self, fingerprint) -> None:
+        """pHash отпечатка становится ``image_hash``; полный отпечаток сохраняется рядом."""
+        self.image_hash = fingerprint.phash_hex if fingerprint is not None else None
+        if fingerprint is None or not fingerprint.complete:
+            self.image_fingerprint = None
+            return
+        # строка обновляется на месте: замена новой упёрлась бы в уникальный event_id
+        if self.image_fingerprint is None:
+            self.image_fingerprint = EventImageFingerprint()
+        self.image_fingerprint.assign(fingerprint)
+
+    @validates("title")
+    def _sync_title_columns(self, key, value):
+        self.title_norm = fold_case(value)
+        if value != self.title:
+            self.title_buckets = [EventTitleBucket(bucket=bucket) for bucket in lsh_buckets(value)]
+        return value
+
+    @validates("category", "location")
+    def _sync_normalized_columns(self, key, value):
+        setattr(self, f"{key}_norm", fold_case(value))
+        return value
@@ -0,0 +1,28 @@
+from sqlalchemy import BigInteger, Column, ForeignKey, Integer
+from sqlalchemy.orm import relationship
+
+from database import Base
+from services.phash import ImageFingerprint, from_signed64, to_signed64
+
+
+class EventImageFingerprint(Base):
+    """Отпечаток картинки события: pHash для отсечения, dHash и colorhash для подтверждения."""
+
+    __tablename__ = "event_image_fingerprints"
+
+    id = Column(Integer, primary_key=True)
+    event_id = Column(Integer, ForeignKey("events.id"), nullable=False, unique=True)
+    # 64-битные хэши хранятся знаковыми, как image_hash_int
+    phash = Column(BigInteger, nullable=False)
+    dhash = Column(BigInteger, nullable=False)
+    colorhash = Column(BigInteger, nullable=False)
+
+    event = relationship("Event", back_populates="image_fingerprint")
+
+    def assign(self, fingerprint: ImageFingerprint) -> None:
+        self.phash = to_signed64(fingerprint.phash)
+        self.dhash = to_signed64(fingerprint.dhash)
+        self.colorhash = fingerprint.colorhash
+
+    def to_fingerprint(self) -> ImageFingerprint:
+        return ImageFingerprint(phash=from_signed64(self.phash), dhash=from_signed64(self.dhash), colorhash=self.colorhash)
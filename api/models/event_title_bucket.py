@@ -0,0 +1,16 @@
+from sqlalchemy import BigInteger, Column, ForeignKey, Integer
+from sqlalchemy.orm import relationship
+
+from database import Base
+
+
+class EventTitleBucket(Base):
+    """LSH-корзина MinHash-сигнатуры заголовка события (по строке на полосу)."""
+
+    __tablename__ = "event_title_buckets"
+
+    id = Column(Integer, primary_key=True)
+    event_id = Column(Integer, ForeignKey("events.id"), nullable=False, index=True)
+    bucket = Column(BigInteger, nullable=False, index=True)
+
+    event = relationship("Event", back_populates="title_buckets")
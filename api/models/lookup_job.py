@@ -0,0 +1,36 @@
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String, Text
+from sqlalchemy.sql import func
+
+from database import Base
+
+
+class LookupJobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    ACTIVE = {QUEUED, RUNNING}
+
+
+class PhotoLookupJob(Base):
+    __tablename__ = "photo_lookup_jobs"
+
+    id = Column(String(36), primary_key=True)
+    status = Column(String(20), nullable=False, default=LookupJobStatus.QUEUED, index=True)
+    stage = Column(String(50), nullable=False, default="queued")
+    filename = Column(String(255), nullable=True)
+    # исходные байты нужны, чтобы продолжить задачу после рестарта воркера
+    image_data = Column(LargeBinary, nullable=True)
+    phash = Column(String(64), nullable=True)
+    ocr_text = Column(Text, nullable=True)
+    parsed_json = Column(Text, nullable=True)
+    external_json = Column(Text, nullable=True)
+    result_json = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    # аренда задачи процессом (services/job_leases.py): кто выполняет и до какого момента
+    lease_owner = Column(String(64), nullable=True)
+    lease_until = Column(DateTime, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy.sql import func
+
+from database import Base
+
+
+class ScrapedPage(Base):
+    __tablename__ = "scraped_pages"
+
+    id = Column(Integer, primary_key=True)
+    url = Column(String, nullable=False, unique=True)
+    # отпечаток набора кандидатов страницы; совпал — страница не менялась
+    fingerprint = Column(String(64), nullable=False)
+    candidate_count = Column(Integer, nullable=False, default=0)
+    # чьими событиями страница была разобрана в последний раз: отпечаток страницы
+    # позволяет пропустить разбор только этому пользователю
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    last_scraped_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_changed_at = Column(DateTime(timezone=True), server_default=func.now())
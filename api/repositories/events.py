@@ -1,12 +1,19 @@
 from __future__ import annotations
 
-from datetime import date, datetime, time, timezone
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any
 
-from sqlalchemy import asc, desc, func, nullslast, or_
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import DateTime, Row, String, and_, asc, desc, false, func, nullslast, or_, type_coerce
+from sqlalchemy.orm import InstrumentedAttribute, Session, defer, load_only, selectinload
 
 from models.event import Event
-from schemas import EventCreate, EventQueryParams, EventUpdate, PublicEventQueryParams
+from models.event_title_bucket import EventTitleBucket
+from schemas import EVENT_CARD_COLUMNS, EventCreate, EventQueryParams, EventUpdate, PublicEventQueryParams
+from services.phash import from_signed64
+from services.cursors import InvalidCursor, decode_cursor, encode_cursor
+from services.list_counts import CountResult, get_list_counter
+from services.search_index import fts_available, match_expression, ranked_matches
+from services.text_norm import fold_case, prefix_upper_bound
 
 
 class EventRepository:
@@ -23,7 +30,7 @@ class EventRepository:
     def get_by_id(self, event_id: int) -> Event | None:
         return (
             self.db.query(Event)
-            .options(joinedload(Event.files))
+            .options(selectinload(Event.files))
             .filter(Event.id == event_id)
             .first()
         )
@@ -36,13 +43,22 @@ class EventRepository:
         return cleaned or None
 
 
-    @staticmethod
-
     @staticmethod
     def _contains_case_insensitive(column, value: str):
         variants = {value, value.lower(), value.upper(), value.capitalize(), value.title()}
         return or_(*(column.like(f"%{variant}%") for variant in variants if variant))
 
+    @staticmethod
+    def _contains_folded(column, value: str):
+        return column.contains(fold_case(value), autoescape=True)
+
+    @staticmethod
+    def _starts_with_folded(column, value: str):
+        # диапазон вместо LIKE 'x%': SQLite не применяет индекс к LIKE без NOCASE
+        prefix = fold_case(value)
+        return and_(column >= prefix, column < prefix_upper_bound(prefix))
+
+    @staticmethod
     def _start_of_day(value: date | datetime) -> datetime:
         if isinstance(value, datetime):
             return value
@@ -54,28 +70,36 @@ class EventRepository:
             return value
         return datetime.combine(value, time.max, tzinfo=timezone.utc)
 
-    def _apply_common_filters(self, query, params: EventQueryParams | PublicEventQueryParams):
+    def _apply_filters(self, query, params: EventQueryParams | PublicEventQueryParams):
         search = self._clean_text(params.q)
         category = self._clean_text(params.category)
         location = self._clean_text(params.location)
 
-        if search:
-            pattern = f"%{search}%"
+        relevance = None
+        match = match_expression(search) if search else None
+        if match and fts_available(self.db):
+            # полнотекстовый индекс: одно индексированное MATCH вместо LIKE-сканов по четырём колонкам
+            fts = ranked_matches(match)
+            query = query.join(fts, fts.c.event_id == Event.id)
+            relevance = fts.c.rank
+        elif search:
+            # у описания нормализованной копии нет — для него остаются варианты регистра
             query = query.filter(
                 or_(
-                    self._contains_case_insensitive(Event.title, search),
+                    self._contains_folded(Event.title_norm, search),
                     self._contains_case_insensitive(Event.description, search),
-                    self._contains_case_insensitive(Event.location, search),
-                    self._contains_case_insensitive(Event.category, search),
+                    self._contains_folded(Event.location_norm, search),
+                    self._contains_folded(Event.category_norm, search),
                 )
             )
         if category:
             # Категория на frontend может приходить как точное значение из select
-            # или как введённый пользователем текст. Поэтому используем частичное
-            # case-insensitive совпадение, чтобы фильтр не ломался от неполного ввода.
-            query = query.filter(self._contains_case_insensitive(Event.category, category))
+            # или как начало, введённое пользователем: совпадение по префиксу
+            # нормализованной колонки без учёта регистра идёт по индексу.
+            query = query.filter(self._starts_with_folded(Event.category_norm, category))
         if location:
-            query = query.filter(self._contains_case_insensitive(Event.location, location))
+            # адрес ищем по вхождению: город может стоять не в начале строки
+            query = query.filter(self._contains_folded(Event.location_norm, location))
         if getattr(params, "favorites_only", False):
             query = query.filter(Event.is_favorite.is_(True))
         if getattr(params, "date_from", None):
@@ -85,32 +109,111 @@ class EventRepository:
         if params.upcoming_only:
             query = query.filter(Event.date.is_not(None), Event.date >= datetime.now(timezone.utc))
 
+        return query, relevance
+
+    @staticmethod
+    def _sort_keys(params: EventQueryParams | PublicEventQueryParams, relevance) -> list[tuple[Any, bool]]:
+        """Полный порядок выдачи: (колонка сортировки, created_at, id), пары (колонка, по убыванию)."""
+        if params.sort_by == "relevance" and relevance is not None:
+            # bm25: чем меньше, тем релевантнее
+            return [(relevance, False), (Event.created_at, True), (Event.id, True)]
         order_column = {
             "date": Event.date,
             "created_at": Event.created_at,
-            "title": Event.title,
+            "title": Event.title_norm,
+            # без поискового запроса релевантность не определена — сортируем по дате
+            "relevance": Event.date,
         }[params.sort_by]
-        order_expr = desc(order_column) if params.sort_order == "desc" else asc(order_column)
-        query = query.order_by(nullslast(order_expr), desc(Event.created_at))
-        return query
-
-    def list_filtered(self, params: EventQueryParams, *, viewer_id: int | None, can_view_all: bool) -> tuple[list[Event], int]:
-        query = self.db.query(Event).options(joinedload(Event.files))
-        if not can_view_all or params.scope == "mine":
-            query = query.filter(Event.owner_id == viewer_id)
-        query = self._apply_common_filters(query, params)
-        total = query.with_entities(func.count(Event.id)).scalar() or 0
-        offset = (params.page - 1) * params.page_size
-        items = query.offset(offset).limit(params.page_size).all()
-        return items, total
-
-    def list_public(self, params: PublicEventQueryParams) -> tuple[list[Event], int]:
-        query = self.db.query(Event).options(joinedload(Event.files))
-        query = self._apply_common_filters(query, params)
-        total = query.with_entities(func.count(Event.id)).scalar() or 0
-        offset = (params.page - 1) * params.page_size
-        items = query.offset(offset).limit(params.page_size).all()
-        return items, total
+        keys = [(order_column, params.sort_order == "desc")]
+        if order_column is not Event.created_at:
+            keys.append((Event.created_at, True))
+        keys.append((Event.id, True))
+        return keys
+
+    def _apply_common_filters(self, query, params: EventQueryParams | PublicEventQueryParams):
+        query, relevance = self._apply_filters(query, params)
+        keys = self._sort_keys(params, relevance)
+        query = query.order_by(*(nullslast(desc(column) if descending else asc(column)) for column, descending in keys))
+        return query, keys
+
+    @staticmethod
+    def _stored(column):
+        # SQLite хранит даты текстом в разных форматах (CURRENT_TIMESTAMP без микросекунд,
+        # ORM — с ними), ORDER BY сравнивает этот текст — курсор сравнивает его же
+        return type_coerce(column, String) if isinstance(column.type, DateTime) else column
+
+    def _after(self, keys: list[tuple[Any, bool]], values: list[Any]):
+        """Строки строго после ``values`` в порядке ``keys`` (NULLS LAST у каждой колонки)."""
+        conditions = []
+        for position, (column, descending) in enumerate(keys):
+            value = values[position]
+            prefix = [
+                self._stored(key).is_(None) if previous is None else self._stored(key) == previous
+                for (key, _), previous in zip(keys[:position], values)
+            ]
+            if value is None:
+                # после NULL в порядке NULLS LAST идут только следующие NULL — их различают младшие колонки
+                continue
+            stored = self._stored(column)
+            beyond = stored < value if descending else stored > value
+            conditions.append(and_(*prefix, or_(beyond, stored.is_(None))))
+        return or_(*conditions) if conditions else false()
+
+    def _page(self, query, params: EventQueryParams | PublicEventQueryParams, keys) -> tuple[list[Event], str | None]:
+        sort_key = f"{params.sort_by}:{params.sort_order}"
+        keyset = all(isinstance(column, InstrumentedAttribute) for column, _ in keys)
+        if params.cursor:
+            if not keyset:
+                raise InvalidCursor("Курсорная пагинация недоступна для сортировки по релевантности")
+            query = query.filter(self._after(keys, decode_cursor(params.cursor, sort_key, len(keys))))
+        else:
+            query = query.offset((params.page - 1) * params.page_size)
+        rows = query.limit(params.page_size + 1).all()
+        items = rows[: params.page_size]
+        if len(rows) <= params.page_size or not keyset:
+            return items, None
+        # значения ключа последней строки — в том виде, в каком они лежат в БД
+        stored = self.db.query(*(self._stored(column) for column, _ in keys)).filter(Event.id == items[-1].id).one()
+        return items, encode_cursor(sort_key, list(stored))
+
+    def _list_query(self, params: EventQueryParams | PublicEventQueryParams):
+        """Запрос страницы списка: файлы — отдельным IN-запросом, а не JOIN под LIMIT;
+        текст OCR спискам не нужен, в view=compact не нужны и описание с файлами."""
+        if params.view == "compact":
+            return self.db.query(Event).options(load_only(*(getattr(Event, name) for name in EVENT_CARD_COLUMNS)))
+        return self.db.query(Event).options(selectinload(Event.files), defer(Event.raw_text))
+
+    def _count_key(self, params: EventQueryParams | PublicEventQueryParams, *, owner_id: int | None) -> tuple:
+        """Ключ кэша total: только то, что влияет на набор строк, — без сортировки и страницы."""
+        return (
+            fold_case(self._clean_text(params.q) or ""),
+            fold_case(self._clean_text(params.category) or ""),
+            fold_case(self._clean_text(params.location) or ""),
+            params.date_from,
+            params.date_to,
+            getattr(params, "favorites_only", False),
+            params.upcoming_only,
+            owner_id,
+        )
+
+    def list_filtered(
+        self, params: EventQueryParams, *, viewer_id: int | None, can_view_all: bool
+    ) -> tuple[list[Event], CountResult, str | None]:
+        query = self._list_query(params)
+        owner_id = viewer_id if not can_view_all or params.scope == "mine" else None
+        if owner_id is not None:
+            query = query.filter(Event.owner_id == owner_id)
+        query, keys = self._apply_common_filters(query, params)
+        count = get_list_counter(self.db).count(self.db, query, self._count_key(params, owner_id=owner_id))
+        items, next_cursor = self._page(query, params, keys)
+        return items, count, next_cursor
+
+    def list_public(self, params: PublicEventQueryParams) -> tuple[list[Event], CountResult, str | None]:
+        query = self._list_query(params)
+        query, keys = self._apply_common_filters(query, params)
+        count = get_list_counter(self.db).count(self.db, query, self._count_key(params, owner_id=None))
+        items, next_cursor = self._page(query, params, keys)
+        return items, count, next_cursor
 
     def get_recent_public(self, limit: int = 200) -> list[Event]:
         return (
@@ -121,6 +224,64 @@ class EventRepository:
             .all()
         )
 
+    def list_summaries(self, event_ids: list[int]) -> dict[int, Row]:
+        if not event_ids:
+            return {}
+        rows = self.db.query(Event.id, Event.title, Event.image_url).filter(Event.id.in_(event_ids))
+        return {row.id: row for row in rows}
+
+    def list_image_hashes(self) -> list[tuple[int, int]]:
+        rows = self.db.query(Event.id, Event.image_hash_int).filter(Event.image_hash_int.is_not(None))
+        return [(event_id, from_signed64(value)) for event_id, value in rows]
+
+    def find_by_hash_bands(self, bands: list[int]) -> list[tuple[int, int]]:
+        rows = self.db.query(Event.id, Event.image_hash_int).filter(
+            or_(
+                Event.image_hash_band0 == bands[0],
+                Event.image_hash_band1 == bands[1],
+                Event.image_hash_band2 == bands[2],
+                Event.image_hash_band3 == bands[3],
+            )
+        )
+        return [(event_id, from_signed64(value)) for event_id, value in rows]
+
+    def list_titles(self) -> list[tuple[int, str]]:
+        return [(event_id, title or "") for event_id, title in self.db.query(Event.id, Event.title).order_by(Event.id)]
+
+    def find_by_title_buckets(self, buckets: list[int], limit: int) -> list[tuple[int, str]]:
+        """События, делящие с заголовком больше всего LSH-корзин, — первыми.
+
+        Число общих корзин растёт с похожестью заголовков, поэтому при обрезке
+        ``limit`` отбрасываются самые далёкие кандидаты, а не самые новые.
+        """
+        if not buckets:
+            return []
+        shared = func.count(EventTitleBucket.id)
+        ranked = (
+            self.db.query(EventTitleBucket.event_id.label("event_id"), shared.label("shared"))
+            .filter(EventTitleBucket.bucket.in_(buckets))
+            .group_by(EventTitleBucket.event_id)
+            .order_by(shared.desc(), EventTitleBucket.event_id.desc())
+            .limit(limit)
+            .subquery()
+        )
+        rows = (
+            self.db.query(Event.id, Event.title)
+            .join(ranked, ranked.c.event_id == Event.id)
+            .order_by(ranked.c.shared.desc(), Event.id.desc())
+        )
+        return [(event_id, title or "") for event_id, title in rows]
+
+    def find_first_on_day(self, day: date) -> int | None:
+        start = datetime.combine(day, time.min)
+        return (
+            self.db.query(Event.id)
+            .filter(Event.date >= start, Event.date < start + timedelta(days=1))
+            .order_by(Event.id)
+            .limit(1)
+            .scalar()
+        )
+
     def update(self, event: Event, payload: EventUpdate) -> Event:
         for key, value in payload.model_dump(exclude_none=True).items():
             setattr(event, key, value)
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import date, datetime, timezone
 from math import ceil
-from typing import Literal, Optional
+from typing import Annotated, Literal, Optional, Union
 
 from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator
 
@@ -136,30 +136,88 @@ class FavoriteUpdate(BaseModel):
     is_favorite: bool
 
 
-class EventListResponse(BaseModel):
-    items: list[EventRead]
+class EventCard(BaseModel):
+    """Компактная карточка для списков: без описания, текста OCR и файлов."""
+
+    id: int
+    title: str
+    date: Optional[datetime] = None
+    location: Optional[str] = None
+    image_url: Optional[str] = None
+    price: Optional[str] = None
+    category: Optional[str] = None
+    is_favorite: bool = False
+    created_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class PublicEventCard(EventCard):
+    pass
+
+
+# колонки, которые читает EventCard, — остальные списки в view=compact не загружают
+EVENT_CARD_COLUMNS = tuple(EventCard.model_fields)
+
+
+class ListPage(BaseModel):
     total: int
     page: int
     page_size: int
-    total_pages: int
+    # None, если total — оценка: число страниц по ней не обещает, что страницы существуют
+    total_pages: Optional[int]
+    next_cursor: Optional[str] = None
+    # как получен total: exact — подсчитан, cached — из кэша, estimate — оценка по выборке
+    total_mode: Literal["exact", "cached", "estimate"] = "exact"
 
     @classmethod
-    def build(cls, *, items: list[EventRead], total: int, page: int, page_size: int) -> "EventListResponse":
-        total_pages = max(1, ceil(total / page_size)) if page_size else 1
-        return cls(items=items, total=total, page=page, page_size=page_size, total_pages=total_pages)
+    def build(
+        cls,
+        *,
+        items: list,
+        total: int,
+        page: int,
+        page_size: int,
+        next_cursor: Optional[str] = None,
+        total_mode: str = "exact",
+    ):
+        if total_mode == "estimate":
+            total_pages = None
+        else:
+            total_pages = max(1, ceil(total / page_size)) if page_size else 1
+        return cls(
+            items=items,
+            total=total,
+            page=page,
+            page_size=page_size,
+            total_pages=total_pages,
+            next_cursor=next_cursor,
+            total_mode=total_mode,
+        )
+
+
+class EventListResponse(ListPage):
+    view: Literal["full"] = "full"
+    items: list[EventRead]
+
 
+class EventCardListResponse(ListPage):
+    view: Literal["compact"] = "compact"
+    items: list[EventCard]
 
-class PublicEventListResponse(BaseModel):
+
+class PublicEventListResponse(ListPage):
+    view: Literal["full"] = "full"
     items: list[PublicEventRead]
-    total: int
-    page: int
-    page_size: int
-    total_pages: int
 
-    @classmethod
-    def build(cls, *, items: list[PublicEventRead], total: int, page: int, page_size: int) -> "PublicEventListResponse":
-        total_pages = max(1, ceil(total / page_size)) if page_size else 1
-        return cls(items=items, total=total, page=page, page_size=page_size, total_pages=total_pages)
+
+class PublicEventCardListResponse(ListPage):
+    view: Literal["compact"] = "compact"
+    items: list[PublicEventCard]
+
+
+EventListPage = Annotated[Union[EventListResponse, EventCardListResponse], Field(discriminator="view")]
+PublicEventListPage = Annotated[Union[PublicEventListResponse, PublicEventCardListResponse], Field(discriminator="view")]
 
 
 class EventQueryParams(BaseModel):
@@ -170,10 +228,14 @@ class EventQueryParams(BaseModel):
     date_to: Optional[date] = None
     favorites_only: bool = False
     upcoming_only: bool = False
-    sort_by: Literal["date", "created_at", "title"] = "date"
+    sort_by: Literal["date", "created_at", "title", "relevance"] = "date"
     sort_order: Literal["asc", "desc"] = "asc"
     page: int = Field(default=1, ge=1)
     page_size: int = Field(default=9, ge=1, le=50)
+    # compact — карточки EventCard вместо полных событий
+    view: Literal["full", "compact"] = "full"
+    # курсор из next_cursor предыдущей страницы; при нём page игнорируется
+    cursor: Optional[str] = None
     scope: Literal["mine", "all"] = "mine"
 
 
@@ -184,10 +246,14 @@ class PublicEventQueryParams(BaseModel):
     date_from: Optional[date] = None
     date_to: Optional[date] = None
     upcoming_only: bool = True
-    sort_by: Literal["date", "created_at", "title"] = "date"
+    sort_by: Literal["date", "created_at", "title", "relevance"] = "date"
     sort_order: Literal["asc", "desc"] = "asc"
     page: int = Field(default=1, ge=1)
     page_size: int = Field(default=12, ge=1, le=50)
+    # compact — карточки EventCard вместо полных событий
+    view: Literal["full", "compact"] = "full"
+    # курсор из next_cursor предыдущей страницы; при нём page игнорируется
+    cursor: Optional[str] = None
 
 
 class FileAccessResponse(BaseModel):
@@ -274,3 +340,9 @@ DEFAULT_ROLE_MATRIX = RoleMatrixResponse(
         "Администратор управляет ролями и имеет полный доступ к административным операциям.",
     ],
 )
+
+
+class CrawlJobCreate(BaseModel):
+    seed_url: str = Field(min_length=1, max_length=2048)
+    max_depth: int = Field(default=2, ge=0, le=10)
+    max_pages: int = Field(default=100, ge=1, le=10000)
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from endpoints.scrape import extract_candidates, fallback_event_from_html, parse_json_ld, parse_open_graph
+from services.html_extract import HTML_PARSER
+
+
+def legacy_extract(html: str, base: str, max_items: int) -> list[dict]:
+    """Прежний путь: полный DOM через html.parser и все три прохода по дереву."""
+    soup = BeautifulSoup(html, "html.parser")
+    found = parse_json_ld(soup)
+    og = parse_open_graph(soup, base)
+    if og:
+        found.append({"title": og.get("og:title")})
+    found.extend(fallback_event_from_html(soup, base))
+    return found[:max_items]
+
+
+def synthetic_pages(cards: int) -> dict[str, str]:
+    body = "".join(
+        f'<div class="card"><a href="/events/{i}"><img src="/img/{i}.jpg"></a><h3>Концерт {i}</h3>'
+        f"<p>{'Описание события. ' * 20}</p><time datetime=\"2026-06-{i % 28 + 1:02d}\">{i % 28 + 1} июня</time></div>"
+        for i in range(cards)
+    )
+    nav = "".join(f'<li><a href="/list?page={i}">{i}</a></li>' for i in range(1, 30))
+    jsonld = "".join(
+        f'<script type="application/ld+json">{{"@type": "Event", "name": "Концерт {i}", "startDate": "2026-06-01", "url": "/events/{i}"}}</script>'
+        for i in range(cards)
+    )
+    head = '<meta charset="utf-8"><meta property="og:title" content="Афиша"><script src="/app.js"></script>'
+    return {
+        "listing-jsonld.html": f"<html><head>{head}{jsonld}</head><body><ul>{nav}</ul>{body}</body></html>",
+        "listing-cards.html": f"<html><head>{head}</head><body><ul>{nav}</ul>{body}</body></html>",
+    }
+
+
+def measure(fn, html: str, base: str, repeat: int) -> tuple[float, int]:
+    timings = []
+    found = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        found = len(fn(html, base, 50))
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full-DOM and partial-parse extraction on sample pages")
+    parser.add_argument("--pages", type=Path, help="Directory with saved *.html pages (synthetic pages if omitted)")
+    parser.add_argument("--cards", type=int, default=300, help="Cards per synthetic listing page")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--base", default="https://afisha.example/")
+    args = parser.parse_args()
+
+    if args.pages:
+        pages = {path.name: path.read_text(encoding="utf-8", errors="replace") for path in sorted(args.pages.glob("*.html"))}
+    else:
+        pages = synthetic_pages(args.cards)
+    if not pages:
+        print("No pages to benchmark")
+        return
+
+    print(f"parser: {HTML_PARSER}")
+    print(f"{'page':<32} {'KiB':>7} {'legacy ms':>10} {'fast ms':>9} {'speedup':>8} {'found':>9}")
+    for name, html in pages.items():
+        legacy_ms, legacy_found = measure(legacy_extract, html, args.base, args.repeat)
+        fast_ms, fast_found = measure(extract_candidates, html, args.base, args.repeat)
+        print(
+            f"{name:<32} {len(html) / 1024:>7.0f} {legacy_ms:>10.1f} {fast_ms:>9.1f} "
+            f"{legacy_ms / max(fast_ms, 1e-6):>7.1f}x {legacy_found:>4}/{fast_found:<4}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import argparse
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import asc, create_engine, desc, event as sa_event, nullslast
+from sqlalchemy.orm import joinedload, sessionmaker
+
+import migrations  # noqa: F401  — FTS и досоздание колонок при create_all
+import models  # noqa: F401
+from database import Base
+from models.event import Event
+from models.event_file import EventFile
+from models.user import User
+from repositories.events import EventRepository
+from schemas import EventCard, EventCardListResponse, EventListResponse, EventQueryParams, EventRead
+from services.list_counts import get_list_counter
+
+
+def seed(session_factory, events: int, files: int, text_kib: int) -> None:
+    db = session_factory()
+    owner = User(email="bench@example.com", name="bench", hashed_password="-")
+    db.add(owner)
+    db.flush()
+    start = datetime.now(timezone.utc) + timedelta(days=1)
+    ocr_text = "Распознанный текст афиши. " * (text_kib * 1024 // 26)
+    for index in range(events):
+        event = Event(
+            title=f"Концерт {index}",
+            description="Описание события. " * 40,
+            raw_text=ocr_text,
+            date=start + timedelta(hours=index),
+            location="Москва",
+            category="Концерты",
+            owner_id=owner.id,
+        )
+        event.files = [
+            EventFile(
+                uploaded_by_id=owner.id,
+                object_key=f"bench/{index}/{number}",
+                original_name=f"file-{number}.pdf",
+                content_type="application/pdf",
+                size_bytes=1024,
+            )
+            for number in range(files)
+        ]
+        db.add(event)
+    db.commit()
+    db.close()
+
+
+def legacy_page(db, params: EventQueryParams) -> str:
+    """Прежний путь: joinedload(files) под LIMIT/OFFSET и все колонки, включая raw_text."""
+    query = db.query(Event).options(joinedload(Event.files)).filter(Event.owner_id == 1)
+    query = query.order_by(nullslast(asc(Event.date)), desc(Event.created_at))
+    total = query.count()
+    items = query.offset((params.page - 1) * params.page_size).limit(params.page_size).all()
+    payload = [EventRead.model_validate(item) for item in items]
+    return EventListResponse.build(items=payload, total=total, page=params.page, page_size=params.page_size).model_dump_json()
+
+
+def list_page(db, params: EventQueryParams) -> str:
+    # сравниваем сам запрос страницы, а не кэш total
+    get_list_counter(db).invalidate()
+    items, count, next_cursor = EventRepository(db).list_filtered(params, viewer_id=1, can_view_all=False)
+    item_schema, response_schema = (EventCard, EventCardListResponse) if params.view == "compact" else (EventRead, EventListResponse)
+    payload = [item_schema.model_validate(item) for item in items]
+    return response_schema.build(
+        items=payload, total=count.total, page=params.page, page_size=params.page_size, next_cursor=next_cursor
+    ).model_dump_json()
+
+
+def measure(session_factory, fn, params: EventQueryParams, repeat: int, stats: dict) -> tuple[float, int, float]:
+    timings = []
+    size = 0
+    stats["statements"] = 0
+    for _ in range(repeat):
+        # новая сессия на каждый прогон: identity map не должен прятать загрузку
+        db = session_factory()
+        started = time.perf_counter()
+        size = len(fn(db, params).encode("utf-8"))
+        timings.append((time.perf_counter() - started) * 1000)
+        db.close()
+    return statistics.median(timings), size, stats["statements"] / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the legacy joinedload list query with the list-optimised path")
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--files", type=int, default=3, help="Files per event")
+    parser.add_argument("--text-kib", type=int, default=8, help="Size of raw_text (OCR) per event")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 30])
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        Base.metadata.create_all(bind=engine)
+        stats = {"statements": 0}
+
+        @sa_event.listens_for(engine, "before_cursor_execute")
+        def _count(*_):
+            stats["statements"] += 1
+
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        seed(session_factory, args.events, args.files, args.text_kib)
+
+        variants = (
+            ("legacy joinedload", legacy_page, "full"),
+            ("selectin + defer", list_page, "full"),
+            ("compact cards", list_page, "compact"),
+        )
+        print(f"events={args.events} files/event={args.files} raw_text={args.text_kib}KiB page_size={args.page_size}")
+        print(f"{'page':>5} {'variant':<20} {'ms':>8} {'KiB':>8} {'queries':>8}")
+        for page in args.pages:
+            for name, fn, view in variants:
+                params = EventQueryParams(page=page, page_size=args.page_size, view=view)
+                ms, size, statements = measure(session_factory, fn, params, args.repeat, stats)
+                print(f"{page:>5} {name:<20} {ms:>8.1f} {size / 1024:>8.1f} {statements:>8.1f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ import imagehash
 from io import BytesIO
 from database import SessionLocal
 from models.event import Event
+from services.hash_matrix import HashMatrix
+from services.phash import from_signed64
 
 def compute_phash_from_file(path):
     with open(path, "rb") as f:
@@ -14,15 +16,20 @@ def show_distances(local_path):
     q_hex = compute_phash_from_file(local_path)
     q_int = int(q_hex, 16)
     db = SessionLocal()
-    for ev in db.query(Event).filter(Event.image_hash.isnot(None)).all():
-        try:
-            s_hex = ev.image_hash
-            s_int = int(s_hex, 16)
-            dist = (q_int ^ s_int).bit_count()
-            print(ev.id, ev.title, "dist=", dist, "stored_hash=", s_hex)
-        except Exception:
-            pass
-    db.close()
+    try:
+        rows = (
+            db.query(Event.id, Event.title, Event.image_hash, Event.image_hash_int)
+            .filter(Event.image_hash_int.isnot(None))
+            .all()
+        )
+    finally:
+        db.close()
+    stored = {ev_id: (title, s_hex, from_signed64(s_int)) for ev_id, title, s_hex, s_int in rows}
+    # все расстояния считаются одним векторным проходом
+    matrix = HashMatrix.from_rows((ev_id, s_int) for ev_id, (_, _, s_int) in stored.items())
+    for ev_id, dist in matrix.search(q_int):
+        title, s_hex, _ = stored[ev_id]
+        print(ev_id, title, "dist=", dist, "stored_hash=", s_hex)
 
 if __name__ == "__main__":
     import sys
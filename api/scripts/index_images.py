@@ -1,15 +1,25 @@
 # api/scripts/index_images.py
 """
-Индексатор изображений: скачивает image_url у событий, считает pHash и сохраняет image_hash в БД.
-Скрипт добавляет корень проекта в sys.path, импортирует модели и вызывает Base.metadata.create_all,
-чтобы гарантировать, что таблицы созданы.
+Индексатор изображений: скачивает image_url у событий, считает отпечаток (pHash, dHash, colorhash)
+и сохраняет его вместе с image_hash в БД.
+
+События читаются пачками по id (keyset), картинки качаются пулом потоков, хэши считаются
+в пуле процессов, каждая пачка пишется одним коммитом. После коммита последний id пачки
+записывается в checkpoint-файл, и повторный запуск продолжает с него.
+
+    python api/scripts/index_images.py --workers 16 --batch-size 200
+    python api/scripts/index_images.py --since-id 0   # начать заново, игнорируя checkpoint
 """
 
 from pathlib import Path
 import sys
-import time
-from io import BytesIO
+import argparse
+import json
 import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 
 # ---- Сделать доступным пакет проекта, даже если запускаем из api/ или из корня ----
 HERE = Path(__file__).resolve()
@@ -25,6 +35,8 @@ sys.path.insert(0, str(api_dir))
 # ---- теперь стандартные импорты проекта ----
 try:
     from database import SessionLocal, engine, Base
+    from settings import get_settings
+    import migrations  # noqa: F401  — досоздаёт новые колонки при create_all
 except Exception as e:
     raise SystemExit(
         "Не удалось импортировать database. Убедись, что запускаешь из корня проекта или используешь python -m api.scripts.index_images\n"
@@ -34,6 +46,7 @@ except Exception as e:
 # импорт моделей, чтобы metadata содержала таблицу events
 try:
     # предполагаем, что модель лежит в api/models/event.py и объявляет Event, и сама регистрирует Base
+    import models  # noqa: F401  — регистрирует все таблицы, на которые ссылается events
     from models.event import Event
 except Exception as e:
     raise SystemExit(
@@ -43,84 +56,145 @@ except Exception as e:
 
 # third-party
 try:
-    import requests
-    from PIL import Image
-    import imagehash
+    from services.image_hashing import download_image, fingerprint_bytes
 except Exception as e:
     raise SystemExit("Не установлены зависимости pillow/imagehash/requests. Установи: pip install pillow imagehash requests")
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
-# ---- Гарантируем создание таблиц (если их ещё нет) ----
-logging.info("Создаём таблицы (если ещё не существуют)...")
-Base.metadata.create_all(bind=engine)
+# рядом с остальными локальными данными (LOCAL_STORAGE_DIR), а не внутри исходников
+DEFAULT_CHECKPOINT = Path(get_settings().local_storage_dir) / "index_images.checkpoint.json"
+
 
 # ---- вспомогательные функции ----
-def compute_phash_from_bytes(img_bytes: bytes, size=8):
-    try:
-        img = Image.open(BytesIO(img_bytes)).convert("RGB")
-        # можно ресайзить перед хешем, но imagehash.phash сам масштабирует
-        ph = imagehash.phash(img, hash_size=size)
-        return str(ph)  # hex представление
-    except Exception as e:
-        logging.warning("Ошибка при вычислении pHash: %s", e)
-        return None
+def compute_fingerprint_from_bytes(img_bytes: bytes):
+    # pHash, dHash и colorhash за одно декодирование; JPEG — в уменьшенном масштабе
+    return fingerprint_bytes(img_bytes)
 
 def fetch_image_bytes(url: str, timeout=8):
     try:
-        r = requests.get(url, timeout=timeout)
-        r.raise_for_status()
-        return r.content
+        # потоковая загрузка с ограничением IMAGE_MAX_BYTES
+        return download_image(url, timeout=timeout)
     except Exception as e:
         logging.warning("Не удалось скачать %s — %s", url, e)
         return None
 
-# ---- основной код ----
-def main():
-    db = SessionLocal()
+
+def load_checkpoint(path: Path) -> int:
     try:
-        events = db.query(Event).all()
-    except Exception as e:
-        logging.error("Ошибка при запросе событий: %s", e)
-        db.close()
-        return
-
-    logging.info("Найдено %d событий в БД", len(events))
-    updated = 0
-    for ev in events:
-        # если нет image_url — пропускаем
-        if not getattr(ev, "image_url", None):
-            logging.debug("Событие %s не содержит image_url — пропускаем", getattr(ev, "id", "<no id>"))
-            continue
+        return int(json.loads(path.read_text(encoding="utf-8"))["last_id"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return 0
+
+
+def save_checkpoint(path: Path, last_id: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_text(json.dumps({"last_id": last_id}), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def fetch_batch(db, after_id: int, batch_size: int) -> list[tuple[int, str]]:
+    """Следующая пачка событий с картинкой, но без отпечатка, по возрастанию id."""
+    return (
+        db.query(Event.id, Event.image_url)
+        .filter(Event.id > after_id, Event.image_url.is_not(None), Event.image_url != "", ~Event.image_fingerprint.has())
+        .order_by(Event.id)
+        .limit(batch_size)
+        .all()
+    )
 
-        # если уже есть image_hash — пропускаем
-        if getattr(ev, "image_hash", None):
-            logging.debug("Событие %s уже проиндексировано", ev.id)
-            continue
 
-        img_bytes = fetch_image_bytes(ev.image_url)
+@dataclass
+class IndexStats:
+    started: float
+    scanned: int = 0
+    downloaded: int = 0
+    bytes: int = 0
+    hashed: int = 0
+    failed: int = 0
+
+    def line(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return (
+            f"scanned={self.scanned} hashed={self.hashed} failed={self.failed} "
+            f"downloaded={self.bytes / 1024 / 1024:.1f}MiB in {elapsed:.1f}s "
+            f"({self.scanned / elapsed:.1f} events/s, {self.bytes / 1024 / 1024 / elapsed:.2f} MiB/s)"
+        )
+
+
+def index_batch(rows, downloads: ThreadPoolExecutor, hashers: ProcessPoolExecutor, stats: IndexStats) -> dict:
+    """Качает картинки пачки потоками и отдаёт каждую на хэширование, как только она скачалась."""
+    hashes = {}
+    hashing = {}
+    fetches = {downloads.submit(fetch_image_bytes, url): event_id for event_id, url in rows}
+    for future in as_completed(fetches):
+        img_bytes = future.result()
         if not img_bytes:
+            stats.failed += 1
             continue
+        stats.downloaded += 1
+        stats.bytes += len(img_bytes)
+        hashing[hashers.submit(compute_fingerprint_from_bytes, img_bytes)] = fetches[future]
+    for future in as_completed(hashing):
+        fingerprint = future.result()
+        if fingerprint:
+            hashes[hashing[future]] = fingerprint
+        else:
+            stats.failed += 1
+    return hashes
 
-        ph = compute_phash_from_bytes(img_bytes)
-        if not ph:
-            continue
 
-        # записать в БД
-        try:
-            ev.image_hash = ph
-            db.add(ev)
-            db.commit()
-            updated += 1
-            logging.info("Indexed event %s -> %s", ev.id, ph)
-            # небольшой sleep чтобы не забивать внешние хосты
-            time.sleep(0.1)
-        except Exception as e:
-            logging.error("Ошибка записи в БД для event %s: %s", ev.id, e)
-            db.rollback()
-
-    logging.info("Индексация завершена: обновлено %d записей", updated)
-    db.close()
+def write_batch(db, hashes: dict) -> None:
+    # через ORM, чтобы валидатор Event заполнил целочисленные pHash-колонки и полосы
+    for ev in db.query(Event).filter(Event.id.in_(list(hashes))):
+        ev.set_image_fingerprint(hashes[ev.id])
+    db.commit()
+
+
+# ---- основной код ----
+def main():
+    parser = argparse.ArgumentParser(description="Fingerprint event images (pHash, dHash, colorhash) in parallel, resumable")
+    parser.add_argument("--workers", type=int, default=8, help="Download threads")
+    parser.add_argument("--hash-processes", type=int, default=os.cpu_count() or 1, help="Hashing processes")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--since-id", type=int, default=None, help="Start after this event id (overrides the checkpoint)")
+    parser.add_argument("--checkpoint", type=Path, default=DEFAULT_CHECKPOINT)
+    args = parser.parse_args()
+
+    # ---- Гарантируем создание таблиц (если их ещё нет) ----
+    logging.info("Создаём таблицы (если ещё не существуют)...")
+    Base.metadata.create_all(bind=engine)
+
+    last_id = args.since_id if args.since_id is not None else load_checkpoint(args.checkpoint)
+    logging.info("Начинаем с id > %d", last_id)
+    stats = IndexStats(started=time.monotonic())
+
+    db = SessionLocal()
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="index-download") as downloads, \
+                ProcessPoolExecutor(max_workers=args.hash_processes) as hashers:
+            while True:
+                rows = fetch_batch(db, last_id, args.batch_size)
+                if not rows:
+                    break
+                stats.scanned += len(rows)
+                hashes = index_batch(rows, downloads, hashers, stats)
+                try:
+                    write_batch(db, hashes)
+                except Exception as e:
+                    logging.error("Ошибка записи пачки id %d..%d: %s", rows[0][0], rows[-1][0], e)
+                    db.rollback()
+                    raise
+                stats.hashed += len(hashes)
+                last_id = rows[-1][0]
+                save_checkpoint(args.checkpoint, last_id)
+                logging.info("id <= %d: %s", last_id, stats.line())
+    finally:
+        db.close()
+
+    logging.info("Индексация завершена: %s", stats.line())
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import struct
+
+_HEADER = struct.Struct(">IIQ")
+
+
+class BloomFilter:
+    """Bloom-фильтр с двойным хешированием поверх blake2b; сериализуется в bytes для хранения в БД."""
+
+    def __init__(self, bit_count: int, hash_count: int, bits: bytearray | None = None, items: int = 0):
+        self.bit_count = bit_count
+        self.hash_count = hash_count
+        self.bits = bits if bits is not None else bytearray((bit_count + 7) // 8)
+        self.items = items
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float = 0.001) -> "BloomFilter":
+        bit_count = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        hash_count = max(1, round(bit_count / capacity * math.log(2)))
+        return cls(bit_count, hash_count)
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        first, second = struct.unpack(">QQ", digest)
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.bit_count
+
+    def __contains__(self, value: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+    def add(self, value: str) -> bool:
+        """Добавляет значение; возвращает False, если оно (вероятно) уже было."""
+        added = False
+        for pos in self._positions(value):
+            mask = 1 << (pos & 7)
+            if not self.bits[pos >> 3] & mask:
+                self.bits[pos >> 3] |= mask
+                added = True
+        if added:
+            self.items += 1
+        return added
+
+    def to_bytes(self) -> bytes:
+        return _HEADER.pack(self.bit_count, self.hash_count, self.items) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BloomFilter":
+        bit_count, hash_count, items = _HEADER.unpack_from(data)
+        return cls(bit_count, hash_count, bytearray(data[_HEADER.size:]), items)
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable
+from urllib.parse import urlsplit
+from uuid import uuid4
+
+from bs4 import BeautifulSoup
+from sqlalchemy.orm import Session, sessionmaker
+
+from endpoints import scrape
+from models.crawl_job import CrawlFrontierItem, CrawlJob, CrawlJobStatus, FrontierStatus
+from services.bloom import BloomFilter
+from services.duplicates import DuplicateDetector
+from services.job_leases import JobLease
+from services.html_extract import parse_full
+from services.urls import normalize_url
+from settings import get_settings
+
+logger = logging.getLogger("crawler")
+
+SessionFactory = Callable[[], Session]
+
+_PAGINATION_HREF = re.compile(r"([?&](page|p|PAGEN_\d+)=\d+)|(/page/\d+)", re.I)
+_PAGINATION_TEXT = {"›", "»", ">", "далее", "следующая", "вперёд", "вперед", "next"}
+_EVENT_HREF = re.compile(r"/(events?|afisha|concerts?|shows?)/[^/?#]+", re.I)
+
+
+def discover_links(soup: BeautifulSoup, base: str) -> tuple[list[str], list[str]]:
+    """Возвращает (ссылки пагинации, ссылки на страницы событий), уже нормализованные."""
+    pagination: list[str] = []
+    events: list[str] = []
+    for tag in soup.find_all(["a", "link"], href=True):
+        url = normalize_url(tag["href"], base)
+        if url is None:
+            continue
+        rel = {value.lower() for value in (tag.get("rel") or [])}
+        text = tag.get_text(" ", strip=True).lower() if tag.name == "a" else ""
+        if "next" in rel or text in _PAGINATION_TEXT or _PAGINATION_HREF.search(tag["href"]):
+            pagination.append(url)
+        elif tag.name == "a" and (tag.find_parent(class_=re.compile(r"^(event|card|listing|item)$")) or _EVENT_HREF.search(tag["href"])):
+            events.append(url)
+    return list(dict.fromkeys(pagination)), list(dict.fromkeys(events))
+
+
+def job_to_dict(job: CrawlJob) -> dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "seed_url": job.seed_url,
+        "max_depth": job.max_depth,
+        "max_pages": job.max_pages,
+        "pages_fetched": job.pages_fetched,
+        "pages_failed": job.pages_failed or 0,
+        "events_added": job.events_added,
+        "events_skipped": job.events_skipped,
+        "error": job.error,
+        "attempts": job.attempts,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
+
+
+class CrawlJobRunner:
+    """Фоновый обход сайта агрегатора с персистентным frontier.
+
+    Очередь URL живёт в ``crawl_frontier``, множество уже поставленных в очередь
+    адресов — в Bloom-фильтре задачи. Всё состояние коммитится после каждой пачки
+    страниц, поэтому после падения задача продолжается с того же места.
+    Пагинация глубину не расходует, переход на страницу события — расходует.
+    """
+
+    def __init__(self, workers: int, lease: JobLease | None = None):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crawl-job")
+        settings = get_settings()
+        self.lease = lease or JobLease(
+            CrawlJob,
+            CrawlJobStatus.ACTIVE,
+            settings.job_lease_seconds,
+            max_attempts=settings.max_job_attempts,
+        )
+
+    def submit(self, db: Session, *, seed_url: str, max_depth: int, max_pages: int, owner_id: int) -> CrawlJob:
+        seed = normalize_url(seed_url)
+        if seed is None:
+            raise ValueError("Некорректный URL для обхода")
+        bloom = BloomFilter.for_capacity(get_settings().crawl_bloom_capacity)
+        bloom.add(seed)
+        job = CrawlJob(
+            id=str(uuid4()),
+            status=CrawlJobStatus.QUEUED,
+            seed_url=seed,
+            max_depth=max_depth,
+            max_pages=max_pages,
+            owner_id=owner_id,
+            visited_bloom=bloom.to_bytes(),
+            attempts=0,
+        )
+        db.add(job)
+        db.add(CrawlFrontierItem(job_id=job.id, url=seed, depth=0, status=FrontierStatus.PENDING))
+        db.commit()
+        db.refresh(job)
+        self.schedule(sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind()), job.id)
+        return job
+
+    def resume_pending(self, session_factory: SessionFactory) -> int:
+        db = session_factory()
+        try:
+            job_ids = [job_id for (job_id,) in db.query(CrawlJob.id).filter(CrawlJob.status.in_(CrawlJobStatus.ACTIVE))]
+        finally:
+            db.close()
+        for job_id in job_ids:
+            self.schedule(session_factory, job_id)
+        if job_ids:
+            logger.info("Resumed %d crawl jobs", len(job_ids))
+        return len(job_ids)
+
+    def schedule(self, session_factory: SessionFactory, job_id: str) -> None:
+        self._executor.submit(self._run, session_factory, job_id)
+
+    def _run(self, session_factory: SessionFactory, job_id: str) -> None:
+        db = session_factory()
+        try:
+            if not self.lease.claim(db, job_id):
+                # обход ведёт другой процесс — подхватим, если его аренда истечёт
+                self.lease.retry_later(db, job_id, lambda: self.schedule(session_factory, job_id))
+                return
+            job = db.get(CrawlJob, job_id)
+            if self.lease.exhausted(job):
+                logger.error("Crawl job %s gave up after %d attempts", job_id, job.attempts)
+                job.status = CrawlJobStatus.FAILED
+                job.error = f"Обход не завершился за {job.attempts} попыток"
+                self.lease.release(job)
+                db.commit()
+                return
+            job.status = CrawlJobStatus.RUNNING
+            job.attempts = (job.attempts or 0) + 1
+            job.error = None
+            db.commit()
+            self._crawl(db, job)
+        except Exception as exc:
+            logger.exception("Crawl job %s failed", job_id)
+            db.rollback()
+            job = db.get(CrawlJob, job_id)
+            if job is not None:
+                job.status = CrawlJobStatus.FAILED
+                job.error = str(exc)
+                self.lease.release(job)
+                db.commit()
+        finally:
+            db.close()
+
+    def _crawl(self, db: Session, job: CrawlJob) -> None:
+        settings = get_settings()
+        bloom = BloomFilter.from_bytes(job.visited_bloom)
+        # страницы, взятые в работу до падения, возвращаются в очередь
+        db.query(CrawlFrontierItem).filter(
+            CrawlFrontierItem.job_id == job.id, CrawlFrontierItem.status == FrontierStatus.IN_PROGRESS
+        ).update({CrawlFrontierItem.status: FrontierStatus.PENDING}, synchronize_session=False)
+        db.commit()
+
+        seed_host = urlsplit(job.seed_url).netloc
+        dedup = DuplicateDetector(db)
+        concurrency = max(1, settings.crawl_concurrency)
+
+        # вежливость к хосту обеспечивает token bucket общего HTTP-клиента
+        def fetch(url: str):
+            try:
+                response = scrape.safe_get(url, timeout=10)
+                return response.text, response.url, None
+            except Exception as exc:
+                return None, url, str(exc)
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="crawl-fetch") as pool:
+            # бюджет max_pages расходуют и неудачные запросы, иначе битые ссылки обходились бы без конца
+            while self._pages_attempted(job) < job.max_pages:
+                batch = (
+                    db.query(CrawlFrontierItem)
+                    .filter(CrawlFrontierItem.job_id == job.id, CrawlFrontierItem.status == FrontierStatus.PENDING)
+                    .order_by(CrawlFrontierItem.depth, CrawlFrontierItem.id)
+                    .limit(min(concurrency, job.max_pages - self._pages_attempted(job)))
+                    .all()
+                )
+                if not batch:
+                    break
+                for item in batch:
+                    item.status = FrontierStatus.IN_PROGRESS
+                self.lease.renew(job)
+                db.commit()
+
+                for item, (html, final_url, error) in zip(batch, pool.map(fetch, [item.url for item in batch])):
+                    if error is not None:
+                        job.pages_failed = (job.pages_failed or 0) + 1
+                        item.status = FrontierStatus.FAILED
+                        item.error = error
+                        continue
+                    job.pages_fetched += 1
+                    skip_reason = self._redirect_skip_reason(item, final_url, bloom, seed_host)
+                    if skip_reason is not None:
+                        item.status = FrontierStatus.SKIPPED
+                        item.error = skip_reason
+                        continue
+                    self._process_page(db, job, item, html, final_url, bloom, dedup, seed_host)
+                    item.status = FrontierStatus.DONE
+                    # сессия без autoflush: следующая страница пачки должна увидеть ScrapedPage и события этой
+                    db.flush()
+                job.visited_bloom = bloom.to_bytes()
+                db.commit()
+
+        job.status = CrawlJobStatus.DONE
+        self.lease.release(job)
+        db.commit()
+        logger.info(
+            "Crawl job %s done: %d pages, %d failed, %d events added",
+            job.id,
+            job.pages_fetched,
+            job.pages_failed or 0,
+            job.events_added,
+        )
+
+    @staticmethod
+    def _pages_attempted(job: CrawlJob) -> int:
+        return job.pages_fetched + (job.pages_failed or 0)
+
+    @staticmethod
+    def _redirect_skip_reason(item: CrawlFrontierItem, final_url: str, bloom: BloomFilter, seed_host: str) -> str | None:
+        """Почему страницу после редиректа не разбирать; ``None`` — разбирать.
+
+        Адрес назначения проходит те же проверки, что и ссылка перед постановкой в очередь:
+        чужой хост не обходится, а уже известный адрес разбирается один раз — иначе две
+        ссылки пачки, ведущие на одну страницу, дали бы две записи ``scraped_pages``.
+        """
+        page_url = normalize_url(final_url) or final_url
+        if page_url == item.url:
+            return None
+        if urlsplit(page_url).netloc != seed_host:
+            return f"redirected to another host: {page_url}"
+        if page_url in bloom:
+            return f"redirected to an already queued page: {page_url}"
+        bloom.add(page_url)
+        return None
+
+    def _process_page(self, db, job, item, html, final_url, bloom, dedup, seed_host) -> None:
+        settings = get_settings()
+        soup = parse_full(html)
+        candidates = scrape.extract_candidates(html, final_url, settings.crawl_max_items_per_page, soup=soup)
+        ingest = scrape.ingest_page(db, normalize_url(final_url) or final_url, candidates, job.owner_id, dedup)
+        db.add_all(ingest.added)
+        job.events_added += len(ingest.added)
+        job.events_skipped += len(ingest.skipped)
+
+        pagination, event_links = discover_links(soup, final_url)
+        next_links = [(url, item.depth) for url in pagination] + [(url, item.depth + 1) for url in event_links]
+        for url, depth in next_links:
+            if depth > job.max_depth or urlsplit(url).netloc != seed_host or url in bloom:
+                continue
+            bloom.add(url)
+            db.add(CrawlFrontierItem(job_id=job.id, url=url, depth=depth, status=FrontierStatus.PENDING))
+
+
+@lru_cache(maxsize=1)
+def get_crawl_job_runner() -> CrawlJobRunner:
+    return CrawlJobRunner(workers=get_settings().crawl_job_workers)
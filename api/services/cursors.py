@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any
+
+
+class InvalidCursor(ValueError):
+    """Курсор повреждён или выдан для другой сортировки."""
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _load_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(sort_key: str, values: list[Any]) -> str:
+    """Непрозрачный курсор: значения ключа сортировки последней строки страницы."""
+    payload = json.dumps({"s": sort_key, "v": [_dump_value(value) for value in values]}, separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_key: str, size: int) -> list[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = [_load_value(value) for value in payload["v"]]
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError) as exc:
+        raise InvalidCursor("Некорректный курсор") from exc
+    if payload.get("s") != sort_key or len(values) != size:
+        raise InvalidCursor("Курсор выдан для другой сортировки")
+    return values
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+
+from rapidfuzz import fuzz
+from sqlalchemy.orm import Session
+
+from repositories.events import EventRepository
+from services.image_match import ImageThresholds, compare, match_fingerprint
+from services.minhash import lsh_buckets, normalize_title
+from services.phash import ImageFingerprint
+
+logger = logging.getLogger("duplicates")
+
+# больше кандидатов из одной корзины не проверяем: так стоимость проверки не растёт с каталогом
+MAX_TITLE_CANDIDATES = 200
+
+
+@dataclass(frozen=True)
+class Duplicate:
+    reason: str
+    event_id: int | None = None
+    score: float = 0.0
+
+
+class DuplicateDetector:
+    """Поиск дублей по всему каталогу за почти постоянное время на кандидата.
+
+    Заголовки: кандидаты берутся из персистентного MinHash LSH индекса
+    (``event_title_buckets``), затем проверяются ``fuzz.ratio`` по нормализованному
+    тексту. Картинки: каскад pHash-индекс -> dHash/colorhash (``services.image_match``). Принятые в текущей пачке кандидаты
+    запоминаются в памяти, чтобы пачка не дублировала сама себя.
+    """
+
+    def __init__(self, db: Session, title_threshold: float = 0.75, image_threshold: int | None = None):
+        self.db = db
+        self.title_threshold = title_threshold
+        self.image_thresholds = ImageThresholds.from_settings(phash_loose=image_threshold)
+        self._batch_buckets: dict[int, list[str]] = {}
+        self._batch_images: list[ImageFingerprint] = []
+
+    def _title_score(self, normalized: str, other: str) -> float:
+        return fuzz.ratio(normalized, normalize_title(other)) / 100
+
+    def find_title(self, title: str | None) -> Duplicate | None:
+        normalized = normalize_title(title)
+        if not normalized:
+            return None
+        buckets = lsh_buckets(title)
+        best: Duplicate | None = None
+        for event_id, known in EventRepository(self.db).find_by_title_buckets(buckets, MAX_TITLE_CANDIDATES):
+            score = self._title_score(normalized, known)
+            if score >= self.title_threshold and (best is None or score > best.score):
+                best = Duplicate(reason="title", event_id=event_id, score=score)
+        if best is not None:
+            return best
+        for bucket in buckets:
+            for known in self._batch_buckets.get(bucket, ()):
+                score = self._title_score(normalized, known)
+                if score >= self.title_threshold:
+                    return Duplicate(reason="title", score=score)
+        return None
+
+    def find_image(self, image: ImageFingerprint | str | None) -> Duplicate | None:
+        fingerprint = image if isinstance(image, ImageFingerprint) or image is None else ImageFingerprint.from_phash(image)
+        if fingerprint is None:
+            return None
+        found = match_fingerprint(self.db, fingerprint, top_k=1, thresholds=self.image_thresholds)
+        if found.matches:
+            return Duplicate(reason="image", event_id=found.matches[0].event_id)
+        if any(compare(fingerprint, other, self.image_thresholds) for other in self._batch_images):
+            return Duplicate(reason="image")
+        return None
+
+    def find(self, title: str | None, image: ImageFingerprint | str | None = None) -> Duplicate | None:
+        duplicate = self.find_title(title) or self.find_image(image)
+        if duplicate is not None:
+            logger.info("Duplicate by %s: %s (event=%s, score=%.2f)", duplicate.reason, title, duplicate.event_id, duplicate.score)
+        return duplicate
+
+    def check(self, title: str | None, image: ImageFingerprint | str | None = None) -> str | None:
+        """Причина, по которой кандидат — дубль, или ``None``."""
+        duplicate = self.find(title, image)
+        return duplicate.reason if duplicate is not None else None
+
+    def remember(self, title: str | None, image: ImageFingerprint | str | None = None) -> None:
+        if title:
+            for bucket in lsh_buckets(title):
+                self._batch_buckets.setdefault(bucket, []).append(title)
+        fingerprint = image if isinstance(image, ImageFingerprint) or image is None else ImageFingerprint.from_phash(image)
+        if fingerprint is not None:
+            self._batch_images.append(fingerprint)
@@ -0,0 +1,128 @@
+"""Журнал изменений ``events`` для индексов в памяти процесса.
+
+Индексы pHash и заголовков сразу узнают о коммитах своего процесса через события
+сессии, но не о записях других воркеров uvicorn, скрипта ``index_images.py`` и
+массовых ``query.update()``/``delete()`` в обход ORM. Поэтому триггеры пишут id
+каждого вставленного, удалённого или изменённого (заголовок, pHash) события в
+``event_changes``, а индекс помнит последний прочитанный ``seq`` и перед поиском
+дочитывает хвост журнала. Журнал хранит последние ``KEEP_CHANGES`` записей:
+процесс, отставший сильнее, пересобирает индекс целиком.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from services.index_registry import BindRegistry
+
+logger = logging.getLogger("event_changes")
+
+CHANGES_TABLE = "event_changes"
+KEEP_CHANGES = 10000
+# колонки, которые держат в памяти индексы; правка остальных в журнал не попадает
+TRACKED_COLUMNS = ("title", "image_hash", "image_hash_int")
+_READ_CHUNK = 500
+
+_LOG_CHANGE = f"""
+        INSERT INTO {CHANGES_TABLE}(event_id) VALUES ({{row}}.id);
+        DELETE FROM {CHANGES_TABLE} WHERE seq <= (SELECT max(seq) FROM {CHANGES_TABLE}) - {KEEP_CHANGES};
+"""
+
+DDL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        event_id INTEGER NOT NULL
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS events_changes_ai AFTER INSERT ON events BEGIN
+        {_LOG_CHANGE.format(row="new")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS events_changes_ad AFTER DELETE ON events BEGIN
+        {_LOG_CHANGE.format(row="old")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS events_changes_au AFTER UPDATE OF {", ".join(TRACKED_COLUMNS)} ON events
+    WHEN {" OR ".join(f"old.{column} IS NOT new.{column}" for column in TRACKED_COLUMNS)} BEGIN
+        {_LOG_CHANGE.format(row="new")}
+    END
+    """,
+]
+
+
+def create_event_changes(connection) -> bool:
+    """Создаёт журнал и триггеры; ``False`` на других СУБД — индексы тогда видят только свой процесс."""
+    if connection.dialect.name != "sqlite":
+        return False
+    try:
+        for statement in DDL:
+            connection.execute(text(statement))
+    except OperationalError as exc:
+        logger.warning("Журнал изменений событий не создан: %s", exc)
+        return False
+    return True
+
+
+@dataclass(frozen=True)
+class EventChanges:
+    seq: int
+    # {event_id: значение колонки или None, если события больше нет};
+    # None вместо словаря — журнал уже обрезан дальше прочитанного, индекс надо пересобрать
+    values: dict[int, Any] | None
+
+
+_available: BindRegistry[bool] = BindRegistry()
+
+
+def changes_available(db: Session) -> bool:
+    return _available.get_or_create(
+        db,
+        lambda: db.get_bind().dialect.name == "sqlite"
+        and db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": CHANGES_TABLE}
+        ).first()
+        is not None,
+    )
+
+
+def current_seq(db: Session) -> int | None:
+    """Последний ``seq`` журнала; ``None`` — журнала нет. Читать до построения индекса."""
+    if not changes_available(db):
+        return None
+    # отдельное соединение: транзакция сессии может держать незакоммиченные строки журнала
+    with db.get_bind().connect() as connection:
+        return connection.execute(text(f"SELECT coalesce(max(seq), 0) FROM {CHANGES_TABLE}")).scalar_one()
+
+
+def changes_since(db: Session, seq: int, column: str) -> EventChanges:
+    """Изменения после ``seq`` вместе с текущими значениями ``column`` изменённых событий.
+
+    Читает только закоммиченное: значения берутся после списка id, поэтому они не
+    старее нового ``seq``, а более поздняя запись снова попадёт в журнал.
+    """
+    if column not in TRACKED_COLUMNS:
+        raise ValueError(f"Column {column} is not tracked by {CHANGES_TABLE}")
+    with db.get_bind().connect() as connection:
+        rows = connection.execute(
+            text(f"SELECT seq, event_id FROM {CHANGES_TABLE} WHERE seq > :seq ORDER BY seq"), {"seq": seq}
+        ).all()
+        if not rows:
+            return EventChanges(seq=seq, values={})
+        if rows[0].seq > seq + 1:
+            return EventChanges(seq=rows[-1].seq, values=None)
+        event_ids = list(dict.fromkeys(row.event_id for row in rows))
+        values: dict[int, Any] = dict.fromkeys(event_ids)
+        query = text(f"SELECT id, {column} FROM events WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+        for start in range(0, len(event_ids), _READ_CHUNK):
+            values.update(connection.execute(query, {"ids": event_ids[start : start + _READ_CHUNK]}).all())
+    return EventChanges(seq=rows[-1].seq, values=values)
@@ -4,8 +4,9 @@ from fastapi import HTTPException, status
 
 from models.user import User
 from repositories.events import EventRepository
-from schemas import EventCreate, EventListResponse, EventQueryParams, EventUpdate
+from schemas import EventCardListResponse, EventCreate, EventListResponse, EventQueryParams, EventUpdate
 from services.access import AccessService
+from services.cursors import InvalidCursor
 
 
 class EventService:
@@ -16,12 +17,23 @@ class EventService:
     def create_event(self, payload: EventCreate, current_user: User):
         return self.events.create(payload, owner_id=current_user.id)
 
-    def list_events(self, params: EventQueryParams, current_user: User) -> EventListResponse:
+    def list_events(self, params: EventQueryParams, current_user: User) -> EventListResponse | EventCardListResponse:
         can_view_all = self.access.can_view_all_events(current_user)
         if params.scope == "all" and not can_view_all:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Недостаточно прав для просмотра полного каталога")
-        items, total = self.events.list_filtered(params, viewer_id=current_user.id, can_view_all=can_view_all)
-        return EventListResponse.build(items=items, total=total, page=params.page, page_size=params.page_size)
+        try:
+            items, count, next_cursor = self.events.list_filtered(params, viewer_id=current_user.id, can_view_all=can_view_all)
+        except InvalidCursor as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+        response_schema = EventCardListResponse if params.view == "compact" else EventListResponse
+        return response_schema.build(
+            items=items,
+            total=count.total,
+            page=params.page,
+            page_size=params.page_size,
+            next_cursor=next_cursor,
+            total_mode=count.mode,
+        )
 
     def get_event(self, event_id: int, current_user: User):
         event = self.events.get_by_id(event_id)
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from typing import Any
+
+from services.urls import normalize_url
+
+# поля кандидата, от которых зависит содержимое события
+FINGERPRINT_FIELDS = ("title", "description", "date", "location", "image", "url")
+
+
+def _normalize_value(value: Any) -> Any:
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value).strip()
+    return value
+
+
+def _digest(payload: str) -> str:
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def candidate_fingerprint(candidate: dict[str, Any]) -> str:
+    """Хэш нормализованного содержимого кандидата (JSON-LD, OpenGraph или эвристика)."""
+    normalized = {field: _normalize_value(candidate.get(field)) for field in FINGERPRINT_FIELDS}
+    return _digest(json.dumps(normalized, ensure_ascii=False, sort_keys=True, default=str))
+
+
+def candidate_key(page_url: str, candidate: dict[str, Any]) -> str:
+    """Устойчивый ключ кандидата: собственный URL события или страница + название."""
+    if candidate.get("url"):
+        # тот же адрес с другим utm-хвостом или фрагментом — то же событие
+        url = _normalize_value(candidate["url"])
+        return _digest(normalize_url(url) or url)
+    title = _normalize_value(candidate.get("title") or "").casefold()
+    return _digest(f"{page_url}\n{title}")
+
+
+def page_fingerprint(candidate_fingerprints: list[str]) -> str:
+    return _digest("\n".join(sorted(candidate_fingerprints)))
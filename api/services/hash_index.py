@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import combinations
+
+from sqlalchemy.orm import Session
+
+from repositories.events import EventRepository
+from services.event_changes import changes_since, current_seq
+from services.hash_matrix import HashMatrix
+from services.index_registry import BindRegistry, follow_event_changes
+from services.phash import (
+    BAND_BITS,
+    BAND_COUNT,
+    EXACT_BAND_RADIUS,
+    HASH_BITS,
+    from_signed64,
+    hamming_distance,
+    hash_bands,
+    phash_to_int,
+)
+
+# Дальше этого радиуса перебор соседей полосы обходится дороже линейного прохода.
+MAX_BAND_PROBE_RADIUS = 3
+
+_PENDING_KEY = "hash_index_pending"
+
+
+@lru_cache(maxsize=None)
+def _flip_masks(radius: int) -> tuple[int, ...]:
+    masks = []
+    for bits in range(radius + 1):
+        for positions in combinations(range(BAND_BITS), bits):
+            mask = 0
+            for position in positions:
+                mask |= 1 << position
+            masks.append(mask)
+    return tuple(masks)
+
+
+@dataclass(frozen=True)
+class HashMatch:
+    event_id: int
+    distance: int
+
+
+@dataclass
+class HashSearchResult:
+    matches: list[HashMatch] = field(default_factory=list)
+    scanned: int = 0
+
+
+class HammingIndex:
+    """Multi-index hashing по 16-битным полосам 64-битного pHash.
+
+    По принципу Дирихле хэши на расстоянии ``r`` совпадают хотя бы в одной полосе
+    с точностью до ``r // 4`` бит, поэтому достаточно проверить соседей каждой полосы.
+    Для больших радиусов перебор соседей невыгоден, и поиск уходит в векторный
+    полный проход по ``HashMatrix``.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._hashes: dict[int, int] = {}
+        self._tables: list[dict[int, set[int]]] = [{} for _ in range(BAND_COUNT)]
+        self._matrix = HashMatrix()
+        # последняя учтённая запись журнала event_changes; None — журнала нет
+        self.seq: int | None = None
+
+    @classmethod
+    def from_rows(cls, rows) -> "HammingIndex":
+        index = cls()
+        for event_id, value in rows:
+            index._hashes[event_id] = value
+            for table, band in zip(index._tables, hash_bands(value)):
+                table.setdefault(band, set()).add(event_id)
+        index._matrix = HashMatrix.from_rows(index._hashes.items())
+        return index
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def __contains__(self, event_id: int) -> bool:
+        return event_id in self._hashes
+
+    def add(self, event_id: int, value: int) -> None:
+        with self._lock:
+            self._discard(event_id)
+            self._hashes[event_id] = value
+            self._matrix.add(event_id, value)
+            for table, band in zip(self._tables, hash_bands(value)):
+                table.setdefault(band, set()).add(event_id)
+
+    def remove(self, event_id: int) -> None:
+        with self._lock:
+            self._discard(event_id)
+
+    def catch_up(self, seq: int, values: dict[int, int | None]) -> None:
+        """Применяет изменения журнала вплоть до ``seq``; более старую пачку пропускает."""
+        with self._lock:
+            if self.seq is not None and seq <= self.seq:
+                return
+            for event_id, value in values.items():
+                if value is None:
+                    self._discard(event_id)
+                else:
+                    self.add(event_id, value)
+            self.seq = seq
+
+    def _discard(self, event_id: int) -> None:
+        value = self._hashes.pop(event_id, None)
+        if value is None:
+            return
+        self._matrix.remove(event_id)
+        for table, band in zip(self._tables, hash_bands(value)):
+            bucket = table.get(band)
+            if bucket is None:
+                continue
+            bucket.discard(event_id)
+            if not bucket:
+                del table[band]
+
+    def search(self, value: int, *, max_distance: int, top_k: int | None = None) -> HashSearchResult:
+        with self._lock:
+            band_radius = max_distance // BAND_COUNT
+            if max_distance >= HASH_BITS or band_radius > MAX_BAND_PROBE_RADIUS:
+                found = self._matrix.search(value, max_distance=max_distance, top_k=top_k)
+                return HashSearchResult(
+                    matches=[HashMatch(event_id=event_id, distance=distance) for event_id, distance in found],
+                    scanned=len(self._matrix),
+                )
+
+            ids: set[int] = set()
+            masks = _flip_masks(band_radius)
+            for table, band in zip(self._tables, hash_bands(value)):
+                for mask in masks:
+                    bucket = table.get(band ^ mask)
+                    if bucket:
+                        ids.update(bucket)
+
+            matches = []
+            for event_id in ids:
+                distance = hamming_distance(value, self._hashes[event_id])
+                if distance <= max_distance:
+                    matches.append(HashMatch(event_id=event_id, distance=distance))
+
+        matches.sort(key=lambda match: (match.distance, match.event_id))
+        if top_k is not None:
+            matches = matches[:top_k]
+        return HashSearchResult(matches=matches, scanned=len(ids))
+
+
+_indexes: BindRegistry[HammingIndex] = BindRegistry()
+
+
+def _loaded_index(db: Session) -> HammingIndex | None:
+    return _indexes.get(db)
+
+
+def _build_index(db: Session) -> HammingIndex:
+    # seq читается до строк: изменения между ними индекс потом применит повторно
+    seq = current_seq(db)
+    index = HammingIndex.from_rows(EventRepository(db).list_image_hashes())
+    index.seq = seq
+    return index
+
+
+def _catch_up(db: Session, index: HammingIndex) -> HammingIndex:
+    """Дочитывает журнал изменений: записи других процессов и массовые правки в обход ORM."""
+    if index.seq is None:
+        return index
+    changes = changes_since(db, index.seq, "image_hash_int")
+    if changes.values is None:
+        return _indexes.replace(db, lambda: _build_index(db))
+    if changes.values:
+        index.catch_up(
+            changes.seq,
+            {event_id: from_signed64(value) if value is not None else None for event_id, value in changes.values.items()},
+        )
+    return index
+
+
+def get_hash_index(db: Session) -> HammingIndex:
+    """Возвращает общий индекс для базы сессии, при первом обращении строит его из БД."""
+    return _catch_up(db, _indexes.get_or_create(db, lambda: _build_index(db)))
+
+
+def _search_by_bands(db: Session, value: int, *, max_distance: int, top_k: int | None) -> HashSearchResult:
+    rows = EventRepository(db).find_by_hash_bands(hash_bands(value))
+    matches = []
+    for event_id, stored in rows:
+        distance = hamming_distance(value, stored)
+        if distance <= max_distance:
+            matches.append(HashMatch(event_id=event_id, distance=distance))
+    matches.sort(key=lambda match: (match.distance, match.event_id))
+    if top_k is not None:
+        matches = matches[:top_k]
+    return HashSearchResult(matches=matches, scanned=len(rows))
+
+
+def search_similar(db: Session, phash: str | int, *, max_distance: int, top_k: int | None = None) -> HashSearchResult:
+    value = phash if isinstance(phash, int) else phash_to_int(phash)
+    if value is None:
+        return HashSearchResult()
+    index = _loaded_index(db)
+    if index is None and max_distance <= EXACT_BAND_RADIUS:
+        # почти точные совпадения дешевле найти индексированным SQL, чем прогревать индекс
+        return _search_by_bands(db, value, max_distance=max_distance, top_k=top_k)
+    index = get_hash_index(db)
+    return index.search(value, max_distance=max_distance, top_k=top_k)
+
+
+# ---- синхронизация индекса с изменениями событий ----
+def _apply_hash_changes(session: Session, pending: dict[int, str | None]) -> None:
+    index = _indexes.get(session)
+    if index is None:
+        return
+    for event_id, image_hash in pending.items():
+        value = phash_to_int(image_hash)
+        if value is None:
+            index.remove(event_id)
+        else:
+            index.add(event_id, value)
+
+
+follow_event_changes(_PENDING_KEY, lambda event: event.image_hash, _apply_hash_changes)
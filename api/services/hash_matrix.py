@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+import numpy as np
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(values: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(values)
+else:  # numpy < 2.0
+    _BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(values: np.ndarray) -> np.ndarray:
+        return _BYTE_POPCOUNT[values.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+
+
+class HashMatrix:
+    """Плотный массив uint64-хэшей с id событий для векторного XOR + popcount."""
+
+    def __init__(self, capacity: int = 1024):
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._hashes = np.zeros(capacity, dtype=np.uint64)
+        self._size = 0
+        self._positions: dict[int, int] = {}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple[int, int]]) -> "HashMatrix":
+        pairs = list(rows)
+        matrix = cls(capacity=max(len(pairs), 1024))
+        if pairs:
+            size = len(pairs)
+            matrix._ids[:size] = np.fromiter((event_id for event_id, _ in pairs), dtype=np.int64, count=size)
+            matrix._hashes[:size] = np.fromiter((value for _, value in pairs), dtype=np.uint64, count=size)
+            matrix._positions = {event_id: position for position, (event_id, _) in enumerate(pairs)}
+            matrix._size = size
+        return matrix
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, event_id: int, value: int) -> None:
+        position = self._positions.get(event_id)
+        if position is None:
+            if self._size == len(self._ids):
+                self._grow()
+            position = self._size
+            self._size += 1
+            self._positions[event_id] = position
+            self._ids[position] = event_id
+        self._hashes[position] = value
+
+    def remove(self, event_id: int) -> None:
+        position = self._positions.pop(event_id, None)
+        if position is None:
+            return
+        last = self._size - 1
+        if position != last:
+            moved_id = int(self._ids[last])
+            self._ids[position] = moved_id
+            self._hashes[position] = self._hashes[last]
+            self._positions[moved_id] = position
+        self._size = last
+
+    def _grow(self) -> None:
+        capacity = max(len(self._ids) * 2, 1024)
+        self._ids = np.resize(self._ids, capacity)
+        self._hashes = np.resize(self._hashes, capacity)
+
+    def distances(self, value: int) -> np.ndarray:
+        return _popcount(self._hashes[: self._size] ^ np.uint64(value))
+
+    def search(self, value: int, *, max_distance: int | None = None, top_k: int | None = None) -> list[tuple[int, int]]:
+        """Возвращает пары ``(event_id, distance)``, отсортированные по расстоянию, затем по id."""
+        if not self._size:
+            return []
+        distances = self.distances(value)
+        ids = self._ids[: self._size]
+        if max_distance is not None:
+            selected = np.flatnonzero(distances <= max_distance)
+        else:
+            selected = np.arange(self._size)
+        if top_k is not None and top_k < len(selected):
+            # argpartition находит k-е расстояние за O(n); равные ему оставляем все,
+            # чтобы порядок по id среди одинаковых расстояний был детерминированным.
+            candidate_distances = distances[selected]
+            kth = candidate_distances[np.argpartition(candidate_distances, top_k - 1)[top_k - 1]]
+            selected = selected[candidate_distances <= kth]
+        order = np.lexsort((ids[selected], distances[selected]))
+        if top_k is not None:
+            order = order[:top_k]
+        chosen = selected[order]
+        return [(int(event_id), int(distance)) for event_id, distance in zip(ids[chosen], distances[chosen])]
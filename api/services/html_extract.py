@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# быстрая проверка по сырому тексту, до любого разбора
+_JSON_LD_MARKER = re.compile(r"application/ld\+json", re.I)
+
+
+def _is_structured_tag(name: str, attrs: dict) -> bool:
+    if name == "meta":
+        return True
+    return name == "script" and (attrs.get("type") or "").strip().lower() == "application/ld+json"
+
+
+# в дерево попадают только <meta> и <script type="application/ld+json">
+STRUCTURED_DATA = SoupStrainer(_is_structured_tag)
+
+
+def has_json_ld(html: str) -> bool:
+    return bool(_JSON_LD_MARKER.search(html or ""))
+
+
+def parse_structured(html: str) -> BeautifulSoup:
+    """Частичный разбор: только JSON-LD и мета-теги, без построения полного DOM."""
+    return BeautifulSoup(html or "", HTML_PARSER, parse_only=STRUCTURED_DATA)
+
+
+def parse_full(html: str) -> BeautifulSoup:
+    return BeautifulSoup(html or "", HTML_PARSER)
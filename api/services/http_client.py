@@ -0,0 +1,386 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+from settings import get_settings
+
+logger = logging.getLogger("http_client")
+
+# заголовки, которые нужны, чтобы восстановить ответ из кэша. Content-Encoding не
+# хранится: в кэш пишется уже распакованное тело
+_STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control")
+
+
+class RateLimited(requests.RequestException):
+    """Токен для хоста не освобождается за отведённое время."""
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, burst: float):
+        self.rate = rate_per_second
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def reserve(self, now: float, max_wait: float | None) -> float | None:
+        """Резервирует токен и возвращает, сколько ждать; ``None`` — если дольше ``max_wait``."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # токены уходят в долг: следующий запрос ждёт, пока долг не погасится
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        wait = max(wait, self.blocked_until - now)
+        if max_wait is not None and wait > max_wait:
+            return None
+        self.tokens -= 1
+        return wait
+
+
+def parse_rate_overrides(raw: str) -> dict[str, tuple[float, float | None]]:
+    """``"kudago.com=1:2,afisha.yandex.ru=0.5"`` -> ``{host: (rate, burst)}``."""
+    overrides: dict[str, tuple[float, float | None]] = {}
+    for item in raw.split(","):
+        if "=" not in item:
+            continue
+        host, value = item.split("=", 1)
+        rate, _, burst = value.partition(":")
+        overrides[host.strip().lower()] = (float(rate), float(burst) if burst else None)
+    return overrides
+
+
+class HostRateLimiter:
+    """Token bucket на каждый хост: разные хосты не ждут друг друга.
+
+    ``Retry-After`` от хоста блокирует его бакет до указанного момента для всех
+    потоков, которые ходят через общий клиент.
+    """
+
+    def __init__(self, rate_per_second: float, burst: float, overrides: dict[str, tuple[float, float | None]] | None = None):
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.overrides = dict(overrides or {})
+        self._lock = threading.Lock()
+        self._buckets: dict[str, TokenBucket] = {}
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.penalties = 0
+
+    def configure(self, host: str, *, rate_per_second: float, burst: float | None = None) -> None:
+        with self._lock:
+            self.overrides[host.lower()] = (rate_per_second, burst)
+            self._buckets.pop(host.lower(), None)
+
+    def _bucket(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            rate, burst = self.overrides.get(host, (self.rate_per_second, None))
+            bucket = self._buckets[host] = TokenBucket(rate, burst or max(1.0, self.burst))
+        return bucket
+
+    def acquire(self, host: str, *, max_wait: float | None = None) -> float:
+        host = host.lower()
+        with self._lock:
+            wait = self._bucket(host).reserve(time.monotonic(), max_wait)
+            if wait is None:
+                raise RateLimited(f"Rate limit for {host} exceeds {max_wait:.1f}s")
+            if wait > 0:
+                self.waits += 1
+                self.wait_seconds += wait
+        # ждём вне блокировки, чтобы другие хосты не простаивали
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def penalize(self, host: str, seconds: float) -> None:
+        host = host.lower()
+        with self._lock:
+            bucket = self._bucket(host)
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + seconds)
+            self.penalties += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"waits": self.waits, "wait_seconds": round(self.wait_seconds, 3), "penalties": self.penalties}
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+
+class ConditionalCache:
+    """Дисковый кэш GET-ответов для условных запросов.
+
+    Хранятся только ответы 200 с ``ETag`` или ``Last-Modified`` и без
+    ``Cache-Control: no-store``/``private``: мета в ``<key>.json``, тело в ``<key>.body``.
+    При повторном запросе уходят ``If-None-Match`` / ``If-Modified-Since``, и на 304
+    тело берётся с диска.
+
+    Записи старше ``ttl_seconds`` не используются. Когда кэш перерастает ``max_bytes``,
+    удаляются записи, которые дольше всех не читались (время чтения — mtime меты),
+    пока размер не опустится до 90% бюджета.
+    """
+
+    def __init__(self, directory: str, max_entry_bytes: int, *, max_bytes: int = 0, ttl_seconds: float = 0):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_entry_bytes = max_entry_bytes
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # размер кэша на диске; считается при первой записи, дальше — по своим записям
+        self._size: int | None = None
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        return self.directory / f"{key}.json", self.directory / f"{key}.body"
+
+    def load(self, key: str) -> tuple[dict[str, Any], bytes] | None:
+        meta_path, body_path = self._paths(key)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            body = body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+        if self.ttl_seconds and time.time() - meta.get("stored_at", 0) > self.ttl_seconds:
+            self.discard(key)
+            return None
+        try:
+            # отметка использования для вытеснения
+            os.utime(meta_path)
+        except OSError:
+            pass
+        return meta, body
+
+    def discard(self, key: str) -> None:
+        for path in self._paths(key):
+            path.unlink(missing_ok=True)
+
+    def store(self, key: str, response: requests.Response) -> bool:
+        if response.status_code != 200 or len(response.content) > self.max_entry_bytes:
+            return False
+        if not (response.headers.get("ETag") or response.headers.get("Last-Modified")):
+            return False
+        directives = {part.strip().split("=", 1)[0].lower() for part in response.headers.get("Cache-Control", "").split(",")}
+        if directives & {"no-store", "private"}:
+            # прежняя копия тоже больше не должна отдаваться
+            self.discard(key)
+            return False
+        meta = {
+            "url": response.url,
+            "encoding": response.encoding,
+            "stored_at": time.time(),
+            "headers": {name: response.headers[name] for name in _STORED_HEADERS if name in response.headers},
+        }
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+        meta_path, body_path = self._paths(key)
+        # тело пишется раньше меты: мета без тела не появится даже при обрыве записи
+        self._write_atomic(body_path, response.content)
+        self._write_atomic(meta_path, meta_bytes)
+        self._account(len(response.content) + len(meta_bytes))
+        return True
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for meta_path in self.directory.glob("*.json"):
+            try:
+                meta_stat = meta_path.stat()
+                size = meta_stat.st_size + meta_path.with_suffix(".body").stat().st_size
+            except OSError:
+                continue
+            entries.append((meta_stat.st_mtime, size, meta_path.stem))
+        return entries
+
+    def _account(self, added: int) -> None:
+        if not self.max_bytes:
+            return
+        with self._lock:
+            # перезапись ключа и записи других процессов уточняются пересчётом при вытеснении
+            self._size = sum(size for _, size, _ in self._entries()) if self._size is None else self._size + added
+            if self._size <= self.max_bytes:
+                return
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            target = self.max_bytes * 0.9
+            for _, size, key in entries:
+                if total <= target:
+                    break
+                self.discard(key)
+                total -= size
+            self._size = total
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes) -> None:
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+
+class ScrapeClient:
+    """Общий HTTP-клиент скраперов: пулы keep-alive соединений по хостам,
+    per-host token bucket и условный кэш."""
+
+    def __init__(
+        self,
+        *,
+        user_agent: str,
+        pool_maxsize: int = 10,
+        retries: int = 1,
+        cache: ConditionalCache | None = None,
+        limiter: HostRateLimiter | None = None,
+        max_retry_after: float = 30.0,
+    ):
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=0.3,
+            # 429 и 503 с Retry-After обрабатывает лимитер, чтобы пауза была общей для хоста
+            status_forcelist=(500, 502, 504),
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            raise_on_status=False,
+            respect_retry_after_header=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": user_agent})
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.cache = cache
+        self.limiter = limiter
+        self.max_retry_after = max_retry_after
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.revalidated = 0
+        self.stored = 0
+
+    def get(
+        self,
+        url: str,
+        *,
+        params: dict[str, Any] | None = None,
+        headers: dict[str, str] | None = None,
+        timeout: float = 8,
+        max_wait: float | None = None,
+        stream: bool = False,
+    ) -> requests.Response:
+        """``stream=True`` отдаёт тело по частям и идёт мимо кэша: кэшу нужно тело целиком."""
+        request_headers = dict(headers or {})
+        cache_key = cached = None
+        if self.cache is not None and not stream:
+            cache_key = self.cache.key(requests.Request("GET", url, params=params).prepare().url)
+            cached = self.cache.load(cache_key)
+            if cached is not None:
+                stored_headers = cached[0]["headers"]
+                if stored_headers.get("ETag"):
+                    request_headers["If-None-Match"] = stored_headers["ETag"]
+                if stored_headers.get("Last-Modified"):
+                    request_headers["If-Modified-Since"] = stored_headers["Last-Modified"]
+
+        host = urlsplit(url).hostname or ""
+        for attempt in range(2):
+            if self.limiter is not None:
+                self.limiter.acquire(host, max_wait=max_wait)
+            response = self.session.get(url, params=params, headers=request_headers, timeout=timeout, stream=stream)
+            with self._lock:
+                self.requests += 1
+            retry_after = parse_retry_after(response.headers.get("Retry-After")) if response.status_code in (429, 503) else None
+            if retry_after is None or self.limiter is None:
+                break
+            self.limiter.penalize(host, retry_after)
+            logger.info("%s asked to retry after %.1fs", host, retry_after)
+            # повторяем один раз, если пауза укладывается в лимиты
+            if attempt or retry_after > self.max_retry_after or (max_wait is not None and retry_after > max_wait):
+                break
+            response.close()
+
+        if response.status_code == 304 and cached is not None:
+            with self._lock:
+                self.revalidated += 1
+            return self._replay(response, *cached)
+        if cache_key is not None and self.cache.store(cache_key, response):
+            with self._lock:
+                self.stored += 1
+        return response
+
+    @staticmethod
+    def _replay(not_modified: requests.Response, meta: dict[str, Any], body: bytes) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.url = meta["url"]
+        response.encoding = meta.get("encoding")
+        response.headers = CaseInsensitiveDict(meta["headers"])
+        # записи, сохранённые до того, как заголовок перестал храниться
+        response.headers.pop("Content-Encoding", None)
+        response.request = not_modified.request
+        response.elapsed = not_modified.elapsed
+        response._content = body
+        response.from_cache = True
+        return response
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "revalidated": self.revalidated,
+                "stored": self.stored,
+                "rate_limit": self.limiter.stats() if self.limiter is not None else None,
+                "cache_dir": str(self.cache.directory) if self.cache is not None else None,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_scrape_client() -> ScrapeClient:
+    settings = get_settings()
+    cache = None
+    if settings.scrape_cache_dir:
+        cache = ConditionalCache(
+            settings.scrape_cache_dir,
+            max_entry_bytes=settings.scrape_cache_max_entry_bytes,
+            max_bytes=settings.scrape_cache_max_bytes,
+            ttl_seconds=settings.scrape_cache_ttl_seconds,
+        )
+    limiter = HostRateLimiter(
+        settings.scrape_host_rate_per_second,
+        settings.scrape_host_burst,
+        overrides=parse_rate_overrides(settings.scrape_host_rates),
+    )
+    return ScrapeClient(
+        user_agent=settings.scrape_user_agent,
+        pool_maxsize=settings.scrape_pool_maxsize,
+        retries=settings.scrape_retries,
+        cache=cache,
+        limiter=limiter,
+        max_retry_after=settings.scrape_max_retry_after_seconds,
+    )
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import logging
+from io import BytesIO
+
+import imagehash
+from PIL import Image
+
+from services.http_client import get_scrape_client
+from services.phash import ImageFingerprint
+from settings import get_settings
+
+logger = logging.getLogger("image_hashing")
+
+# imagehash.phash масштабирует картинку до hash_size * 4 по стороне
+_PHASH_FACTOR = 4
+# запас по разрешению перед финальным ресайзом, чтобы хэш почти не отличался от полного декодирования
+_OVERSAMPLE = 4
+_CHUNK_SIZE = 64 * 1024
+COLORHASH_BINBITS = 3
+# 14 цветовых корзин imagehash.colorhash по COLORHASH_BINBITS бит
+COLORHASH_BITS = 14 * COLORHASH_BINBITS
+
+
+class ImageTooLarge(ValueError):
+    """Картинка больше допустимого размера в байтах."""
+
+
+def download_image(url: str, *, max_bytes: int | None = None, timeout: float = 8, headers: dict[str, str] | None = None) -> bytes:
+    """Скачивает картинку потоком и обрывает загрузку, как только превышен ``max_bytes``."""
+    limit = max_bytes if max_bytes is not None else get_settings().image_max_bytes
+    response = get_scrape_client().get(url, headers=headers, timeout=timeout, stream=True)
+    try:
+        response.raise_for_status()
+        declared = response.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > limit:
+            raise ImageTooLarge(f"{url}: {declared} bytes > {limit}")
+        buffer = bytearray()
+        for chunk in response.iter_content(_CHUNK_SIZE):
+            buffer += chunk
+            if len(buffer) > limit:
+                raise ImageTooLarge(f"{url}: more than {limit} bytes")
+        return bytes(buffer)
+    finally:
+        response.close()
+
+
+def _hash_to_int(value: imagehash.ImageHash) -> int:
+    number = 0
+    for bit in value.hash.flatten():
+        number = (number << 1) | int(bit)
+    return number
+
+
+def open_for_hashing(data: bytes, hash_size: int = 8, mode: str = "L") -> Image.Image:
+    """Открывает картинку в разрешении, достаточном для pHash.
+
+    JPEG декодируется сразу в уменьшенном масштабе (до 1/8) через ``draft()``, полный
+    битмап не создаётся. Остальные форматы сразу переводятся в ``mode`` и ужимаются ``reduce()``.
+    """
+    target = hash_size * _PHASH_FACTOR * _OVERSAMPLE
+    img = Image.open(BytesIO(data))
+    if img.format == "JPEG":
+        img.draft(mode, (target, target))
+    if img.mode != mode:
+        img = img.convert(mode)
+    factor = min(img.size) // target
+    if factor > 1:
+        img = img.reduce(factor)
+    return img
+
+
+def phash_bytes(data: bytes, hash_size: int = 8) -> str | None:
+    try:
+        return str(imagehash.phash(open_for_hashing(data, hash_size), hash_size=hash_size))
+    except Exception as exc:
+        logger.warning("Ошибка при вычислении pHash: %s", exc)
+        return None
+
+
+def fingerprint_image(img: Image.Image) -> ImageFingerprint:
+    gray = img if img.mode == "L" else img.convert("L")
+    return ImageFingerprint(
+        phash=_hash_to_int(imagehash.phash(gray)),
+        dhash=_hash_to_int(imagehash.dhash(gray)),
+        colorhash=_hash_to_int(imagehash.colorhash(img, binbits=COLORHASH_BINBITS)),
+    )
+
+
+def fingerprint_bytes(data: bytes) -> ImageFingerprint | None:
+    """Все хэши отпечатка за одно (уменьшенное) декодирование."""
+    try:
+        return fingerprint_image(open_for_hashing(data, mode="RGB"))
+    except Exception as exc:
+        logger.warning("Ошибка при вычислении отпечатка картинки: %s", exc)
+        return None
+
+
+def fingerprint_url(
+    url: str, *, max_bytes: int | None = None, timeout: float = 8, headers: dict[str, str] | None = None
+) -> ImageFingerprint | None:
+    try:
+        data = download_image(url, max_bytes=max_bytes, timeout=timeout, headers=headers)
+    except Exception as exc:
+        logger.debug("fingerprint failed for %s: %s", url, exc)
+        return None
+    return fingerprint_bytes(data)
+
+
+def phash_url(url: str, *, max_bytes: int | None = None, timeout: float = 8, headers: dict[str, str] | None = None) -> str | None:
+    try:
+        data = download_image(url, max_bytes=max_bytes, timeout=timeout, headers=headers)
+    except Exception as exc:
+        logger.debug("phash failed for %s: %s", url, exc)
+        return None
+    return phash_bytes(data)
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+from sqlalchemy.orm import Session
+
+from models.event_image_fingerprint import EventImageFingerprint
+from services.hash_index import search_similar
+from services.image_hashing import COLORHASH_BITS
+from services.phash import HASH_BITS, ImageFingerprint
+from settings import get_settings
+
+# веса нормированных расстояний в итоговом счёте (меньше — похожее)
+_WEIGHTS = {"phash": 0.5, "dhash": 0.3, "colorhash": 0.2}
+
+
+@dataclass(frozen=True)
+class ImageThresholds:
+    """Пороги каскада. ``phash_strict`` — порог pHash для пар, которые нечем подтвердить
+    (у одного из отпечатков нет dHash/colorhash), ``phash_loose`` — для остальных."""
+
+    phash_strict: int
+    phash_loose: int
+    dhash: int
+    colorhash: int
+
+    @classmethod
+    def from_settings(cls, *, phash_loose: int | None = None) -> "ImageThresholds":
+        """Явный ``phash_loose`` (``max_distance`` вызывающего) действует и на пары без
+        подтверждения: такой вызывающий просит именно pHash-радиус, как до каскада."""
+        settings = get_settings()
+        if phash_loose is None:
+            loose = settings.image_phash_loose_distance
+            strict = min(settings.image_phash_strict_distance, loose)
+        else:
+            loose = strict = phash_loose
+        return cls(
+            phash_strict=strict,
+            phash_loose=loose,
+            dhash=settings.image_dhash_max_distance,
+            colorhash=settings.image_colorhash_max_distance,
+        )
+
+
+@dataclass(frozen=True)
+class ImageMatch:
+    event_id: int | None
+    phash_distance: int
+    dhash_distance: int | None
+    colorhash_distance: int | None
+    score: float
+
+    @property
+    def confirmed(self) -> bool:
+        return self.dhash_distance is not None
+
+
+@dataclass
+class ImageMatchResult:
+    matches: list[ImageMatch] = field(default_factory=list)
+    scanned: int = 0
+    confirmed: int = 0
+
+
+def _score(phash: int, dhash: int | None, color: int | None, thresholds: ImageThresholds) -> float:
+    """Взвешенная сумма нормированных расстояний, одна шкала для подтверждённых и нет.
+
+    Недостающие dHash/colorhash считаются равными своим порогам — худшему, что каскад
+    принял бы при подтверждении, поэтому неподтверждённое совпадение не обгоняет
+    подтверждённое с тем же pHash.
+    """
+    dhash = thresholds.dhash if dhash is None else dhash
+    color = thresholds.colorhash if color is None else color
+    return (
+        _WEIGHTS["phash"] * phash / HASH_BITS
+        + _WEIGHTS["dhash"] * dhash / HASH_BITS
+        + _WEIGHTS["colorhash"] * color / COLORHASH_BITS
+    )
+
+
+def compare(query: ImageFingerprint, stored: ImageFingerprint, thresholds: ImageThresholds, event_id: int | None = None) -> ImageMatch | None:
+    """Каскадное сравнение двух отпечатков; ``None`` — не совпадают.
+
+    pHash дальше ``loose`` — сразу мимо. Если у обоих отпечатков есть dHash и colorhash,
+    они должны уложиться в свои пороги (даже при близком pHash — это и даёт точность).
+    Без них совпадением считается только pHash не дальше ``strict``.
+    """
+    phash, dhash, color = query.distances(stored)
+    if phash > thresholds.phash_loose:
+        return None
+    if dhash is None or color is None:
+        if phash > thresholds.phash_strict:
+            return None
+        return ImageMatch(event_id, phash, None, None, _score(phash, None, None, thresholds))
+    if dhash > thresholds.dhash or color > thresholds.colorhash:
+        return None
+    return ImageMatch(event_id, phash, dhash, color, _score(phash, dhash, color, thresholds))
+
+
+def match_fingerprint(
+    db: Session,
+    query: ImageFingerprint,
+    *,
+    top_k: int | None = None,
+    thresholds: ImageThresholds | None = None,
+) -> ImageMatchResult:
+    """Ищет события с похожей картинкой: pHash-индекс отсекает кандидатов, остальные хэши подтверждают.
+
+    Отпечатки кандидатов читаются одним запросом; события без отпечатка (проиндексированные
+    до его появления) проходят по порогу ``phash_strict`` — по умолчанию строгому, а при
+    явном ``max_distance`` вызывающего — по нему же. Дозаполнить отпечатки старых событий
+    можно скриптом ``scripts/index_images.py``.
+    """
+    thresholds = thresholds or ImageThresholds.from_settings()
+    radius = thresholds.phash_loose if query.complete else thresholds.phash_strict
+    found = search_similar(db, query.phash, max_distance=radius)
+    if not found.matches:
+        return ImageMatchResult(scanned=found.scanned)
+
+    ids = [candidate.event_id for candidate in found.matches]
+    stored = {
+        row.event_id: row.to_fingerprint()
+        for row in db.query(EventImageFingerprint).filter(EventImageFingerprint.event_id.in_(ids))
+    } if query.complete else {}
+
+    result = ImageMatchResult(scanned=found.scanned)
+    for candidate in found.matches:
+        fingerprint = stored.get(candidate.event_id)
+        if fingerprint is None:
+            # у кандидата есть только pHash — расстояние уже посчитано индексом
+            if candidate.distance <= thresholds.phash_strict:
+                result.matches.append(
+                    ImageMatch(candidate.event_id, candidate.distance, None, None, _score(candidate.distance, None, None, thresholds))
+                )
+            continue
+        match = compare(query, fingerprint, thresholds, candidate.event_id)
+        if match is not None:
+            result.matches.append(match)
+            result.confirmed += 1
+    result.matches.sort(key=lambda match: (match.score, match.event_id))
+    if top_k is not None:
+        result.matches = result.matches[:top_k]
+    return result
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Generic, TypeVar
+
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import Session
+
+from models.event import Event
+
+T = TypeVar("T")
+
+
+def bind_key(session: Session) -> str:
+    return str(session.get_bind().url)
+
+
+class BindRegistry(Generic[T]):
+    """Общие для процесса объекты (индексы, кэши) — по одному на базу сессии."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items: dict[str, T] = {}
+
+    def get(self, db: Session) -> T | None:
+        return self._items.get(bind_key(db))
+
+    def get_or_create(self, db: Session, factory: Callable[[], T]) -> T:
+        """При первом обращении строит объект; ``factory`` вызывается под блокировкой один раз."""
+        key = bind_key(db)
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                item = self._items[key] = factory()
+        return item
+
+    def replace(self, db: Session, factory: Callable[[], T]) -> T:
+        """Строит объект заново и подменяет им прежний."""
+        key = bind_key(db)
+        with self._lock:
+            item = self._items[key] = factory()
+        return item
+
+
+def follow_event_changes(
+    pending_key: str,
+    value: Callable[[Event], Any],
+    apply: Callable[[Session, dict[int, Any]], None],
+) -> None:
+    """Подписывает ``apply`` на закоммиченные изменения событий.
+
+    После flush копит ``{event_id: value(event)}`` (``None`` — событие удалено) в
+    ``session.info[pending_key]``; после commit передаёт накопленное в ``apply``,
+    после rollback — отбрасывает.
+    """
+
+    @sa_event.listens_for(Session, "after_flush")
+    def _collect(session: Session, flush_context) -> None:
+        pending = session.info.setdefault(pending_key, {})
+        for obj in session.new | session.dirty:
+            if isinstance(obj, Event) and obj.id is not None:
+                pending[obj.id] = value(obj)
+        for obj in session.deleted:
+            if isinstance(obj, Event) and obj.id is not None:
+                pending[obj.id] = None
+
+    @sa_event.listens_for(Session, "after_commit")
+    def _apply(session: Session) -> None:
+        pending = session.info.pop(pending_key, None)
+        if pending:
+            apply(session, pending)
+
+    @sa_event.listens_for(Session, "after_rollback")
+    def _discard(session: Session) -> None:
+        session.info.pop(pending_key, None)
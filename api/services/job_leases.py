@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import os
+import socket
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+from uuid import uuid4
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+# один на процесс: воркеры uvicorn/gunicorn различаются pid и случайным суффиксом
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+
+def _now() -> datetime:
+    # naive UTC — в том же виде, в каком DateTime без timezone хранится в SQLite
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class JobLease:
+    """Аренда фоновой задачи одним процессом.
+
+    ``claim`` — один условный UPDATE: задача достаётся процессу, только если она
+    активна и никем не арендована либо аренда истекла. Поэтому при нескольких
+    воркерах, каждый из которых на старте продолжает незавершённые задачи,
+    задача выполняется ровно одним из них. Владелец продлевает аренду на каждом
+    коммите прогресса; задача упавшего процесса освобождается по истечении аренды.
+
+    Задача, которая уже ``max_attempts`` раз начиналась и не завершилась (процесс
+    падал посреди неё — OOM, segfault в tesseract/PIL), больше не запускается:
+    иначе она роняла бы воркер на каждом рестарте. ``0`` — без ограничения.
+    """
+
+    def __init__(
+        self, model, active_statuses: set[str], seconds: float, worker_id: str = WORKER_ID, max_attempts: int = 0
+    ):
+        self.model = model
+        self.active_statuses = active_statuses
+        self.seconds = seconds
+        self.worker_id = worker_id
+        self.max_attempts = max_attempts
+
+    def claim(self, db: Session, job_id: str) -> bool:
+        model = self.model
+        now = _now()
+        result = db.execute(
+            update(model)
+            .where(
+                model.id == job_id,
+                model.status.in_(self.active_statuses),
+                or_(model.lease_owner.is_(None), model.lease_owner == self.worker_id, model.lease_until < now),
+            )
+            .values(lease_owner=self.worker_id, lease_until=now + timedelta(seconds=self.seconds))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+    def exhausted(self, job) -> bool:
+        """Попытки задачи исчерпаны; вызывается после ``claim``, до увеличения ``attempts``."""
+        return self.max_attempts > 0 and (job.attempts or 0) >= self.max_attempts
+
+    def renew(self, job) -> None:
+        """Продлевает аренду; попадает в БД со следующим коммитом задачи."""
+        job.lease_until = _now() + timedelta(seconds=self.seconds)
+
+    def release(self, job) -> None:
+        job.lease_owner = None
+        job.lease_until = None
+
+    def retry_later(self, db: Session, job_id: str, callback: Callable[[], None]) -> bool:
+        """Задача арендована другим процессом: повторить ``callback`` после истечения аренды.
+
+        Пока владелец жив и продлевает аренду, повтор снова не получит задачу и
+        отложится ещё раз; если владелец упал — задачу подхватит этот процесс.
+        """
+        db.expire_all()
+        job = db.get(self.model, job_id)
+        if job is None or job.status not in self.active_statuses or job.lease_until is None:
+            return False
+        delay = max(0.0, (job.lease_until - _now()).total_seconds()) + 1.0
+        timer = threading.Timer(delay, callback)
+        timer.daemon = True
+        timer.start()
+        return True
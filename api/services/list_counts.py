@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, Literal
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Query, Session
+
+from models.event import Event
+from services.index_registry import BindRegistry, follow_event_changes
+from settings import get_settings
+
+_PENDING_KEY = "list_counts_stale"
+
+CountMode = Literal["exact", "cached", "estimate"]
+
+
+@dataclass(frozen=True)
+class CountResult:
+    total: int
+    mode: CountMode
+
+
+class ListCounter:
+    """Счётчик ``total`` для отфильтрованных списков событий.
+
+    Порядок: кэш по нормализованным фильтрам -> точный подсчёт с потолком
+    ``exact_limit`` -> оценка по выборке последних ``sample_size`` id, масштабированная
+    на ``max(id)``. Любая
+    запись в ``events`` сбрасывает кэш, TTL покрывает фильтры, зависящие от
+    текущего времени (``upcoming_only``).
+    """
+
+    def __init__(self, *, exact_limit: int, ttl_seconds: float, max_entries: int, sample_size: int, estimate: bool = True):
+        self.exact_limit = exact_limit
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.sample_size = sample_size
+        self.estimate = estimate
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._entries: OrderedDict[Hashable, tuple[int, float, int, CountMode]] = OrderedDict()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def _cached(self, key: Hashable) -> CountResult | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            generation, expires_at, total, mode = entry
+            if generation != self._generation or expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        # закэшированная оценка остаётся оценкой
+        return CountResult(total=total, mode="estimate" if mode == "estimate" else "cached")
+
+    def _store(self, key: Hashable, generation: int, result: CountResult) -> None:
+        with self._lock:
+            # подсчёт, начатый до записи в events, в кэш не попадает
+            if generation != self._generation or self.max_entries <= 0:
+                return
+            self._entries[key] = (generation, time.monotonic() + self.ttl_seconds, result.total, result.mode)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def count(self, db: Session, query: Query, key: Hashable) -> CountResult:
+        """``query`` — отфильтрованный запрос по Event без сортировки и пагинации."""
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        generation = self._generation
+        query = query.order_by(None)
+        ids = query.with_entities(Event.id)
+        if self.estimate:
+            # LIMIT останавливает сканирование, как только результат перестаёт быть «маленьким»
+            capped = ids.limit(self.exact_limit + 1).subquery()
+            total = db.execute(select(func.count()).select_from(capped)).scalar() or 0
+            result = CountResult(total=total, mode="exact") if total <= self.exact_limit else self._estimate(db, query)
+        else:
+            result = CountResult(total=query.with_entities(func.count(Event.id)).scalar() or 0, mode="exact")
+        self._store(key, generation, result)
+        return result
+
+    def _estimate(self, db: Session, query: Query) -> CountResult:
+        # доля подходящих id среди последних sample_size, умноженная на max(id): без полного
+        # COUNT(*) по таблице. Пропуски id от удалений учтены, если они распределены равномерно
+        max_id = db.query(func.max(Event.id)).scalar() or 0
+        span = min(self.sample_size, max_id)
+        hits = query.filter(Event.id > max_id - span).with_entities(func.count(Event.id)).scalar() or 0
+        total = round(hits * max_id / span) if span else 0
+        # точный подсчёт уже показал, что строк больше потолка
+        return CountResult(total=max(total, self.exact_limit + 1), mode="estimate")
+
+
+_counters: BindRegistry[ListCounter] = BindRegistry()
+
+
+def _new_counter() -> ListCounter:
+    settings = get_settings()
+    return ListCounter(
+        exact_limit=settings.list_count_exact_limit,
+        ttl_seconds=settings.list_count_cache_ttl_seconds,
+        max_entries=settings.list_count_cache_size,
+        sample_size=settings.list_count_estimate_sample,
+        estimate=settings.list_count_estimate,
+    )
+
+
+def get_list_counter(db: Session) -> ListCounter:
+    """Общий счётчик для базы сессии, с настройками из ``LIST_COUNT_*``."""
+    return _counters.get_or_create(db, _new_counter)
+
+
+# ---- сброс кэша при изменениях событий ----
+def _invalidate_counts(session: Session, pending: dict[int, bool | None]) -> None:
+    counter = _counters.get(session)
+    if counter is not None:
+        counter.invalidate()
+
+
+follow_event_changes(_PENDING_KEY, lambda event: True, _invalidate_counts)
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from settings import get_settings
+
+
+def content_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+@dataclass(frozen=True)
+class CachedLookup:
+    phash: str
+    text: str
+    parsed: dict[str, Any]
+
+    def copy(self) -> "CachedLookup":
+        # frozen защищает только поля, словарь parsed изменяем — у каждого получателя своя копия
+        return CachedLookup(phash=self.phash, text=self.text, parsed=copy.deepcopy(self.parsed))
+
+    def to_json(self) -> str:
+        parsed = dict(self.parsed)
+        if isinstance(parsed.get("date"), datetime):
+            parsed["date"] = parsed["date"].isoformat()
+        return json.dumps({"phash": self.phash, "text": self.text, "parsed": parsed}, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, payload: str) -> "CachedLookup":
+        data = json.loads(payload)
+        parsed = data["parsed"]
+        if parsed.get("date"):
+            parsed["date"] = datetime.fromisoformat(parsed["date"])
+        return cls(phash=data["phash"], text=data["text"], parsed=parsed)
+
+
+class LookupCache:
+    """Кэш результатов OCR и разбора афиши по sha256 загруженных байт.
+
+    Память — LRU с лимитом по суммарному размеру записей; опционально второй
+    уровень в SQLite, который переживает рестарт. Вторичный ключ — pHash.
+    """
+
+    def __init__(self, max_bytes: int, db_path: str | None = None):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[int, CachedLookup]] = OrderedDict()
+        self._by_phash: dict[str, str] = {}
+        self._size = 0
+        self.hits = 0
+        self.phash_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._db: sqlite3.Connection | None = None
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS lookup_cache ("
+                "content_key TEXT PRIMARY KEY, phash TEXT, payload TEXT NOT NULL, "
+                "created_at TEXT DEFAULT CURRENT_TIMESTAMP)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_lookup_cache_phash ON lookup_cache (phash)")
+            self._db.commit()
+
+    def get(self, key: str) -> CachedLookup | None:
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def get_by_phash(self, phash: str) -> CachedLookup | None:
+        with self._lock:
+            key = self._by_phash.get(phash)
+            if key is None and self._db is not None:
+                row = self._db.execute("SELECT content_key FROM lookup_cache WHERE phash = ? LIMIT 1", (phash,)).fetchone()
+                key = row[0] if row else None
+            entry = self._lookup(key) if key else None
+            # промах по pHash уже учтён промахом по содержимому в get()
+            if entry is not None:
+                self.phash_hits += 1
+            return entry
+
+    def put(self, key: str, entry: CachedLookup) -> None:
+        payload = entry.to_json()
+        with self._lock:
+            self._remember(key, payload, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO lookup_cache (content_key, phash, payload) VALUES (?, ?, ?)",
+                    (key, entry.phash, payload),
+                )
+                self._db.commit()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "phash_hits": self.phash_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "persistent": self._db is not None,
+            }
+
+    def _lookup(self, key: str) -> CachedLookup | None:
+        cached = self._entries.get(key)
+        if cached is not None:
+            self._entries.move_to_end(key)
+            return cached[1].copy()
+        if self._db is None:
+            return None
+        row = self._db.execute("SELECT payload FROM lookup_cache WHERE content_key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        entry = CachedLookup.from_json(row[0])
+        self.disk_hits += 1
+        self._remember(key, row[0], entry)
+        return entry.copy()
+
+    def _remember(self, key: str, payload: str, entry: CachedLookup) -> None:
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= previous[0]
+        self._entries[key] = (size, entry.copy())
+        self._by_phash[entry.phash] = key
+        self._size += size
+        while self._size > self.max_bytes:
+            old_key, (old_size, old_entry) = self._entries.popitem(last=False)
+            self._size -= old_size
+            if self._by_phash.get(old_entry.phash) == old_key:
+                del self._by_phash[old_entry.phash]
+            self.evictions += 1
+
+
+@lru_cache(maxsize=1)
+def get_lookup_cache() -> LookupCache:
+    settings = get_settings()
+    return LookupCache(max_bytes=settings.lookup_cache_max_bytes, db_path=settings.lookup_cache_path or None)
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable
+from uuid import uuid4
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session, sessionmaker
+
+from endpoints import photo_lookup as pipeline
+from models.lookup_job import LookupJobStatus, PhotoLookupJob
+from services.job_leases import JobLease
+from services.ocr import get_ocr_pool
+from services.tracing import Trace, activate, span
+from settings import get_settings
+
+logger = logging.getLogger("photo_lookup.jobs")
+
+SessionFactory = Callable[[], Session]
+
+
+def _dump_parsed(parsed: dict[str, Any]) -> str:
+    payload = dict(parsed)
+    if isinstance(payload.get("date"), datetime):
+        payload["date"] = payload["date"].isoformat()
+    return json.dumps(payload, ensure_ascii=False)
+
+
+def _load_parsed(raw: str) -> dict[str, Any]:
+    parsed = json.loads(raw)
+    if parsed.get("date"):
+        parsed["date"] = datetime.fromisoformat(parsed["date"])
+    return parsed
+
+
+def job_to_dict(job: PhotoLookupJob) -> dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "filename": job.filename,
+        "phash": job.phash,
+        "parsed": json.loads(job.parsed_json) if job.parsed_json else None,
+        "result": json.loads(job.result_json) if job.result_json else None,
+        "error": job.error,
+        "attempts": job.attempts,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
+
+
+class LookupJobRunner:
+    """Фоновое выполнение photo lookup по стадиям с сохранением промежуточных результатов.
+
+    Оркестрация и сетевые стадии идут в пуле потоков, CPU-стадии (предобработка,
+    OCR) — в общем пуле процессов. После каждой стадии результат коммитится в
+    ``photo_lookup_jobs``, поэтому незавершённую задачу можно продолжить после рестарта.
+    """
+
+    def __init__(self, workers: int, lease: JobLease | None = None):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="photo-lookup-job")
+        settings = get_settings()
+        self.lease = lease or JobLease(
+            PhotoLookupJob,
+            LookupJobStatus.ACTIVE,
+            settings.job_lease_seconds,
+            max_attempts=settings.max_job_attempts,
+        )
+
+    def submit(self, db: Session, *, contents: bytes, filename: str | None) -> PhotoLookupJob:
+        job = PhotoLookupJob(
+            id=str(uuid4()),
+            status=LookupJobStatus.QUEUED,
+            stage="queued",
+            filename=filename,
+            image_data=contents,
+            attempts=0,
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        self._schedule(sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind()), job.id)
+        return job
+
+    def resume_pending(self, session_factory: SessionFactory) -> int:
+        db = session_factory()
+        try:
+            job_ids = [
+                job_id
+                for (job_id,) in db.query(PhotoLookupJob.id).filter(PhotoLookupJob.status.in_(LookupJobStatus.ACTIVE))
+            ]
+        finally:
+            db.close()
+        for job_id in job_ids:
+            self._schedule(session_factory, job_id)
+        if job_ids:
+            logger.info("Resumed %d photo lookup jobs", len(job_ids))
+        return len(job_ids)
+
+    def _schedule(self, session_factory: SessionFactory, job_id: str) -> None:
+        self._executor.submit(self._run, session_factory, job_id)
+
+    def _run(self, session_factory: SessionFactory, job_id: str) -> None:
+        db = session_factory()
+        try:
+            if not self.lease.claim(db, job_id):
+                # задачу выполняет другой процесс — подхватим, если его аренда истечёт
+                self.lease.retry_later(db, job_id, lambda: self._schedule(session_factory, job_id))
+                return
+            job = db.get(PhotoLookupJob, job_id)
+            if self.lease.exhausted(job):
+                logger.error("Photo lookup job %s gave up after %d attempts", job_id, job.attempts)
+                job.status = LookupJobStatus.FAILED
+                job.error = f"Задача не завершилась за {job.attempts} попыток"
+                self.lease.release(job)
+                db.commit()
+                return
+            job.status = LookupJobStatus.RUNNING
+            job.attempts = (job.attempts or 0) + 1
+            db.commit()
+            trace = Trace("photo_lookup_job")
+            with activate(trace):
+                self._advance(db, job)
+            logger.info("Photo lookup job %s stage timings: %s", job_id, trace.server_timing())
+        except Exception as exc:
+            logger.exception("Photo lookup job %s failed", job_id)
+            db.rollback()
+            job = db.get(PhotoLookupJob, job_id)
+            if job is not None:
+                job.status = LookupJobStatus.FAILED
+                job.error = str(exc.detail) if isinstance(exc, HTTPException) else str(exc)
+                self.lease.release(job)
+                db.commit()
+        finally:
+            db.close()
+
+    def _set_stage(self, db: Session, job: PhotoLookupJob, stage: str) -> None:
+        job.stage = stage
+        self.lease.renew(job)
+        db.commit()
+
+    def _advance(self, db: Session, job: PhotoLookupJob) -> None:
+        if job.parsed_json is None:
+            self._set_stage(db, job, "analyze")
+            analysis = pipeline.analyze_upload(job.image_data, cpu_pool=get_ocr_pool())
+            job.phash = analysis["phash"]
+            job.ocr_text = analysis["text"]
+            job.parsed_json = _dump_parsed(analysis["parsed"])
+            db.commit()
+        parsed = _load_parsed(job.parsed_json)
+
+        if job.external_json is None:
+            self._set_stage(db, job, "match")
+            matched = pipeline.match_existing(db, parsed, job.phash)
+            if matched:
+                self._finish(db, job, matched)
+                return
+            self._set_stage(db, job, "external")
+            job.external_json = json.dumps(pipeline.lookup_external(parsed), ensure_ascii=False)
+            db.commit()
+        external = json.loads(job.external_json)
+
+        # событие и результат задачи коммитятся вместе, чтобы повтор не создал дубль
+        self._set_stage(db, job, "create")
+        result = None
+        with span("create"):
+            if external:
+                result = pipeline.create_external_event(db, parsed, job.phash, external, commit=False)
+            if result is None:
+                result = pipeline.create_poster_event(db, parsed, job.phash, commit=False)
+        self._finish(db, job, result)
+
+    def _finish(self, db: Session, job: PhotoLookupJob, result: dict[str, Any]) -> None:
+        job.result_json = json.dumps(result, ensure_ascii=False)
+        job.status = LookupJobStatus.DONE
+        job.stage = "done"
+        job.image_data = None
+        self.lease.release(job)
+        db.commit()
+
+
+@lru_cache(maxsize=1)
+def get_lookup_job_runner() -> LookupJobRunner:
+    return LookupJobRunner(workers=get_settings().lookup_job_workers)
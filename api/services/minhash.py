@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import struct
+
+import numpy as np
+
+from services.phash import to_signed64
+from services.text_norm import fold_case
+
+SHINGLE_SIZE = 3
+LSH_BANDS = 16
+LSH_ROWS = 3
+NUM_PERM = LSH_BANDS * LSH_ROWS
+
+# простое число больше 2**32: a * x + b для 32-битных x не переполняет uint64
+_PRIME = np.uint64(4294967311)
+_rng = np.random.default_rng(20240601)
+# коэффициенты фиксированы: сигнатуры хранятся в БД и должны совпадать между запусками
+_A = _rng.integers(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_title(title: str | None) -> str:
+    text = fold_case(title or "")
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def title_shingles(normalized: str) -> set[str]:
+    if not normalized:
+        return set()
+    padded = f" {normalized} "
+    if len(padded) <= SHINGLE_SIZE:
+        return {padded}
+    return {padded[i:i + SHINGLE_SIZE] for i in range(len(padded) - SHINGLE_SIZE + 1)}
+
+
+def _shingle_hash(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "big")
+
+
+def minhash_signature(shingles: set[str]) -> np.ndarray | None:
+    if not shingles:
+        return None
+    values = np.fromiter((_shingle_hash(s) for s in shingles), dtype=np.uint64, count=len(shingles))
+    return ((_A[:, None] * values[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+
+
+def lsh_buckets(title: str | None) -> list[int]:
+    """Ключи LSH-корзин заголовка: по одной на полосу из ``LSH_ROWS`` значений MinHash.
+
+    Номер полосы входит в ключ, поэтому все корзины живут в одной индексированной колонке.
+    Заголовки с Жаккаром по 3-граммам ~0.5 попадают в общую корзину с вероятностью ~0.9.
+    """
+    signature = minhash_signature(title_shingles(normalize_title(title)))
+    if signature is None:
+        return []
+    buckets = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(struct.pack(">H", band) + rows.astype(">u8").tobytes(), digest_size=8).digest()
+        buckets.append(to_signed64(int.from_bytes(digest, "big")))
+    return buckets
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import re
+import shlex
+import subprocess
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Protocol
+
+import pytesseract
+from PIL import Image
+
+from services.tracing import record_span
+from settings import get_settings
+
+logger = logging.getLogger("ocr")
+
+OCR_LANG = "rus+eng"
+# Разные PSM-режимы под разную раскладку текста на афише
+OCR_CONFIGS = [
+    ("--oem 3 --psm 6", "Single uniform block"),
+    ("--oem 3 --psm 11", "Sparse text"),
+    ("--oem 3 --psm 3", "Fully automatic"),
+    ("--oem 3 --psm 4", "Single column of text"),
+]
+OCR_STRATEGIES = ("first-good", "best-of-n", "single-pass")
+MIN_USEFUL_LENGTH = 10
+# как часто работающий tesseract проверяет флаг отмены и дедлайн
+CANCEL_POLL_SECONDS = 0.05
+
+
+class CancelFlag(Protocol):
+    def is_set(self) -> bool: ...
+
+    def set(self) -> None: ...
+
+
+class OcrCancelled(Exception):
+    """Прогон остановлен: ответ на запрос уже получен другой конфигурацией."""
+
+
+@dataclass(frozen=True)
+class OcrAttempt:
+    config_name: str
+    text: str
+    confidence: float
+    duration_ms: float = 0.0
+
+    @property
+    def useful(self) -> bool:
+        return len(self.text) > MIN_USEFUL_LENGTH
+
+
+def span_name(config: str) -> str:
+    match = re.search(r"--psm (\d+)", config)
+    return f"ocr.psm{match.group(1)}" if match else "ocr"
+
+
+def _tesseract_data(image: Image.Image, config: str, deadline: float | None, cancelled: CancelFlag | None) -> dict:
+    """То же, что ``pytesseract.image_to_data(..., output_type=Output.DICT)``, но процесс
+    tesseract убивается не только на дедлайне, а и как только выставлен ``cancelled``."""
+    tesseract = pytesseract.pytesseract
+    with tesseract.save(image) as (temp_name, input_filename):
+        args = [
+            tesseract.tesseract_cmd,
+            input_filename,
+            temp_name,
+            "-l",
+            OCR_LANG,
+            "-c",
+            "tessedit_create_tsv=1",
+            *shlex.split(config),
+        ]
+        try:
+            proc = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as exc:
+            raise tesseract.TesseractNotFoundError() from exc
+        try:
+            while True:
+                try:
+                    _, stderr = proc.communicate(timeout=CANCEL_POLL_SECONDS)
+                    break
+                except subprocess.TimeoutExpired:
+                    if cancelled is not None and cancelled.is_set():
+                        raise OcrCancelled("OCR run cancelled")
+                    if deadline is not None and time.time() >= deadline:
+                        raise TimeoutError("OCR deadline passed while tesseract was running")
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.communicate()
+        if proc.returncode:
+            raise tesseract.TesseractError(proc.returncode, tesseract.get_errors(stderr))
+        with open(f"{temp_name}.tsv", encoding="utf-8") as output:
+            return tesseract.file_to_dict(output.read(), "\t", -1)
+
+
+def run_config(
+    image: Image.Image,
+    config: str,
+    config_name: str,
+    deadline: float | None = None,
+    cancelled: CancelFlag | None = None,
+) -> OcrAttempt:
+    """Один прогон tesseract; средняя уверенность считается по распознанным словам.
+
+    ``deadline`` — момент по ``time.time()``: на нём процесс tesseract убивается
+    и бросается ``TimeoutError``. Прогон, дождавшийся места в пуле уже после
+    дедлайна, не запускается вовсе. ``cancelled`` — флаг запроса: как только он
+    выставлен, tesseract убивается и бросается ``OcrCancelled``.
+    """
+    if cancelled is not None and cancelled.is_set():
+        raise OcrCancelled(f"OCR request finished before '{config_name}' started")
+    if deadline is not None and deadline - time.time() <= 0:
+        raise TimeoutError(f"OCR deadline passed before '{config_name}' started")
+    started = time.perf_counter()
+    data = _tesseract_data(image, config, deadline, cancelled)
+    words = []
+    confidences = []
+    for word, conf in zip(data.get("text", []), data.get("conf", [])):
+        word = (word or "").strip()
+        conf = float(conf)
+        if not word or conf < 0:
+            continue
+        words.append(word)
+        confidences.append(conf)
+    text = re.sub(r"\s+", " ", " ".join(words)).strip()
+    confidence = sum(confidences) / len(confidences) if confidences else 0.0
+    duration_ms = (time.perf_counter() - started) * 1000
+    return OcrAttempt(config_name=config_name, text=text, confidence=confidence, duration_ms=duration_ms)
+
+
+def _remaining(deadline: float) -> float:
+    return deadline - time.time()
+
+
+def _is_good(attempt: OcrAttempt, settings) -> bool:
+    return len(attempt.text) >= settings.ocr_min_text_length and attempt.confidence >= settings.ocr_min_confidence
+
+
+def _pick_best(attempts: list[OcrAttempt]) -> OcrAttempt | None:
+    # как и раньше, побеждает самый длинный осмысленный текст; уверенность — при равной длине
+    useful = [attempt for attempt in attempts if attempt.useful]
+    if not useful:
+        return None
+    return max(useful, key=lambda attempt: (len(attempt.text), attempt.confidence))
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+_manager = None
+
+
+def get_ocr_pool() -> Executor | None:
+    workers = get_settings().ocr_workers
+    if workers <= 0:
+        return None
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers)
+    return _pool
+
+
+def _new_cancel_flag(executor: Executor) -> CancelFlag:
+    """Флаг отмены для прогонов одного запроса.
+
+    В пул процессов обычный ``threading.Event`` не передать, поэтому для него флаг
+    живёт в общем ``multiprocessing.Manager``, который поднимается при первой нужде.
+    """
+    if not isinstance(executor, ProcessPoolExecutor):
+        return threading.Event()
+    global _manager
+    with _pool_lock:
+        if _manager is None:
+            _manager = multiprocessing.Manager()
+    return _manager.Event()
+
+
+def recognize(image: Image.Image, *, strategy: str | None = None, executor: Executor | None = None) -> OcrAttempt | None:
+    """Распознаёт текст по выбранной стратегии.
+
+    ``single-pass`` — только первая конфигурация; ``best-of-n`` — все конфигурации
+    параллельно, выбирается лучшая; ``first-good`` — все параллельно, но ответ
+    возвращается, как только одна из них прошла порог длины и уверенности.
+    """
+    settings = get_settings()
+    strategy = strategy or settings.ocr_strategy
+    if strategy not in OCR_STRATEGIES:
+        raise ValueError(f"Unknown OCR strategy: {strategy}")
+
+    configs = OCR_CONFIGS[:1] if strategy == "single-pass" else OCR_CONFIGS
+    if len(configs) > 1:
+        executor = executor or get_ocr_pool()
+    attempts: list[OcrAttempt] = []
+    # один абсолютный дедлайн на весь запрос, а не таймаут на каждое ожидание;
+    # time.time(), а не perf_counter — его сравнивают и процессы пула
+    submitted = time.perf_counter()
+    deadline = time.time() + settings.ocr_timeout_seconds
+
+    if executor is None or len(configs) == 1:
+        for config, config_name in configs:
+            if _remaining(deadline) <= 0:
+                logger.warning("OCR deadline reached, skipping '%s'", config_name)
+                break
+            started = time.perf_counter()
+            try:
+                attempt = run_config(image, config, config_name, deadline)
+            except Exception as e:
+                record_span(span_name(config), (time.perf_counter() - started) * 1000, "error")
+                logger.debug(f"Config '{config_name}' failed: {e}")
+                continue
+            record_span(span_name(config), attempt.duration_ms, "ok")
+            logger.info(f"Config '{config_name}' - length: {len(attempt.text)} chars, conf: {attempt.confidence:.1f}")
+            attempts.append(attempt)
+            if strategy == "first-good" and _is_good(attempt, settings):
+                return attempt
+        return _pick_best(attempts)
+
+    # tesseract в каждом прогоне убивается на общем дедлайне или как только ответ уже получен
+    cancelled = _new_cancel_flag(executor)
+    futures = {
+        executor.submit(run_config, image, config, config_name, deadline, cancelled): (config, config_name)
+        for config, config_name in configs
+    }
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, _remaining(deadline)), return_when=FIRST_COMPLETED)
+            if not done:
+                logger.warning("OCR timed out, %d configs still running", len(pending))
+                break
+            for future in done:
+                config, config_name = futures[future]
+                try:
+                    attempt = future.result()
+                except Exception as e:
+                    record_span(span_name(config), (time.perf_counter() - submitted) * 1000, "error")
+                    logger.debug(f"Config '{config_name}' failed: {e}")
+                    continue
+                record_span(span_name(config), attempt.duration_ms, "ok")
+                logger.info(f"Config '{config_name}' - length: {len(attempt.text)} chars, conf: {attempt.confidence:.1f}")
+                attempts.append(attempt)
+                if strategy == "first-good" and _is_good(attempt, settings):
+                    return attempt
+    finally:
+        # уже запущенные прогоны увидят флаг и убьют свой tesseract, ещё не начатые снимаются с очереди
+        cancelled.set()
+        for future in pending:
+            if future.cancel():
+                record_span(span_name(futures[future][0]), (time.perf_counter() - submitted) * 1000, "cancelled")
+    return _pick_best(attempts)
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+HASH_BITS = 64
+BAND_BITS = 16
+BAND_COUNT = HASH_BITS // BAND_BITS
+BAND_MASK = (1 << BAND_BITS) - 1
+# При радиусе < BAND_COUNT хотя бы одна полоса совпадает точно (принцип Дирихле).
+EXACT_BAND_RADIUS = BAND_COUNT - 1
+
+_SIGN_BIT = 1 << (HASH_BITS - 1)
+_MODULUS = 1 << HASH_BITS
+
+
+def phash_to_int(value: str | None) -> int | None:
+    if not value:
+        return None
+    try:
+        number = int(value, 16)
+    except ValueError:
+        return None
+    if number >= _MODULUS:
+        return None
+    return number
+
+
+def hamming_distance(left: int, right: int) -> int:
+    return (left ^ right).bit_count()
+
+
+def hash_bands(value: int) -> list[int]:
+    return [(value >> (BAND_BITS * i)) & BAND_MASK for i in range(BAND_COUNT)]
+
+
+def to_signed64(value: int) -> int:
+    """SQLite и Postgres хранят только знаковый BIGINT."""
+    return value - _MODULUS if value & _SIGN_BIT else value
+
+
+def from_signed64(value: int) -> int:
+    return value + _MODULUS if value < 0 else value
+
+
+@dataclass(frozen=True)
+class ImageFingerprint:
+    """Несколько дешёвых хэшей одной картинки; ``dhash``/``colorhash`` нет, если известен только pHash."""
+
+    phash: int
+    dhash: int | None = None
+    colorhash: int | None = None
+
+    @classmethod
+    def from_phash(cls, value: str | int | None) -> "ImageFingerprint | None":
+        number = value if isinstance(value, int) else phash_to_int(value)
+        return cls(phash=number) if number is not None else None
+
+    @property
+    def phash_hex(self) -> str:
+        return f"{self.phash:016x}"
+
+    @property
+    def complete(self) -> bool:
+        return self.dhash is not None and self.colorhash is not None
+
+    def distances(self, other: "ImageFingerprint") -> tuple[int, int | None, int | None]:
+        dhash = hamming_distance(self.dhash, other.dhash) if self.dhash is not None and other.dhash is not None else None
+        color = (
+            hamming_distance(self.colorhash, other.colorhash)
+            if self.colorhash is not None and other.colorhash is not None
+            else None
+        )
+        return hamming_distance(self.phash, other.phash), dhash, color
@@ -0,0 +1,120 @@
+"""Полнотекстовый индекс каталога событий на SQLite FTS5.
+
+Таблица ``events_fts`` — contentless (``content=''``): тексты хранятся только в
+``events``, индекс поддерживают триггеры. Токенайзер ``unicode61`` сам приводит
+кириллицу к нижнему регистру и снимает диакритику у латиницы, а «ё» сводится к «е»
+заменой и в индексируемом тексте, и в запросе.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+
+from sqlalchemy import Float, Integer, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from services.index_registry import BindRegistry
+
+logger = logging.getLogger("search_index")
+
+FTS_TABLE = "events_fts"
+FTS_COLUMNS = ("title", "description", "location", "category")
+# веса колонок для bm25: заголовок важнее описания
+BM25_WEIGHTS = (10.0, 1.0, 3.0, 3.0)
+MAX_QUERY_TERMS = 8
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def _folded(expression: str) -> str:
+    return f"replace(replace({expression}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _values(prefix: str) -> str:
+    return ", ".join(_folded(f"{prefix}.{column}") for column in FTS_COLUMNS)
+
+
+_COLUMN_LIST = ", ".join(FTS_COLUMNS)
+
+DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {_COLUMN_LIST}, content='', tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS events_fts_ai AFTER INSERT ON events BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {_COLUMN_LIST}) VALUES (new.id, {_values("new")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS events_fts_ad AFTER DELETE ON events BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_COLUMN_LIST}) VALUES ('delete', old.id, {_values("old")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS events_fts_au AFTER UPDATE OF {_COLUMN_LIST} ON events BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_COLUMN_LIST}) VALUES ('delete', old.id, {_values("old")});
+        INSERT INTO {FTS_TABLE}(rowid, {_COLUMN_LIST}) VALUES (new.id, {_values("new")});
+    END
+    """,
+]
+
+
+def create_events_fts(connection) -> bool:
+    """Создаёт FTS5-таблицу и триггеры; при первом создании заполняет индекс из ``events``.
+
+    Возвращает ``False`` на других СУБД и на сборках SQLite без FTS5 — поиск тогда идёт через LIKE.
+    """
+    if connection.dialect.name != "sqlite":
+        return False
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+    ).first()
+    try:
+        for statement in DDL:
+            connection.execute(text(statement))
+    except OperationalError as exc:
+        logger.warning("FTS5 недоступен, поиск по каталогу останется на LIKE: %s", exc)
+        return False
+    if not exists:
+        connection.execute(
+            text(f"INSERT INTO {FTS_TABLE}(rowid, {_COLUMN_LIST}) SELECT e.id, {_values('e')} FROM events e")
+        )
+        logger.info("Построен полнотекстовый индекс %s", FTS_TABLE)
+    return True
+
+
+def match_expression(search: str) -> str | None:
+    """Пользовательский ввод -> безопасный FTS5-запрос: все слова обязательны, каждое — как префикс."""
+    terms = _TERM.findall(search.replace("ё", "е").replace("Ё", "Е"))[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+_available: BindRegistry[bool] = BindRegistry()
+
+
+def fts_available(db: Session) -> bool:
+    return _available.get_or_create(
+        db,
+        lambda: db.get_bind().dialect.name == "sqlite"
+        and db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+        ).first()
+        is not None,
+    )
+
+
+def ranked_matches(match: str):
+    """Подзапрос ``(event_id, rank)`` по FTS-индексу; меньший ``rank`` — релевантнее (bm25)."""
+    weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+    return (
+        text(f"SELECT rowid AS event_id, bm25({FTS_TABLE}, {weights}) AS rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :fts_match")
+        .bindparams(fts_match=match)
+        .columns(event_id=Integer, rank=Float)
+        .subquery("fts")
+    )
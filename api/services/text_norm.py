@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+
+def fold_case(value: str | None) -> str | None:
+    """Ключ для сравнения без учёта регистра: ``casefold()`` плюс «ё» -> «е».
+
+    SQLite ``LIKE`` и ``lower()`` приводят к нижнему регистру только ASCII, поэтому
+    нормализованное значение считается в Python и хранится в отдельной колонке.
+    """
+    if value is None:
+        return None
+    return value.casefold().replace("ё", "е")
+
+
+def prefix_upper_bound(prefix: str) -> str:
+    """Наименьшая строка больше всех строк с префиксом ``prefix``: ``col >= p AND col < bound`` идёт по B-tree."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
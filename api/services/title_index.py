@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+
+from rapidfuzz import fuzz, process
+from sqlalchemy.orm import Session
+
+from repositories.events import EventRepository
+from services.event_changes import changes_since, current_seq
+from services.index_registry import BindRegistry, follow_event_changes
+
+_PENDING_KEY = "title_index_pending"
+
+
+@dataclass(frozen=True)
+class TitleMatch:
+    event_id: int
+    score: float
+
+
+class TitleIndex:
+    """Кэш заголовков событий для нечёткого поиска без гидратации ORM-объектов.
+
+    Заголовки лежат в параллельных списках ``ids``/``titles``: новое событие —
+    два ``append``, правка — замена элемента, удаление — ``None`` на его месте
+    (rapidfuzz такие варианты пропускает). Поиск берёт пару списков один раз, так
+    что дописывание в конец ему не мешает; когда удалённых набирается половина,
+    списки пересобираются и подменяются целиком. Порядок позиций совпадает с
+    порядком id, поэтому при равном счёте выигрывает более старое событие.
+    """
+
+    def __init__(self, rows=()):
+        self._lock = threading.RLock()
+        ids: list[int] = []
+        titles: list[str | None] = []
+        for event_id, title in rows:
+            ids.append(event_id)
+            titles.append(title or "")
+        self._state = (ids, titles)
+        self._positions = {event_id: position for position, event_id in enumerate(ids)}
+        self._removed = 0
+        # последняя учтённая запись журнала event_changes; None — журнала нет
+        self.seq: int | None = None
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def set(self, event_id: int, title: str | None) -> None:
+        with self._lock:
+            ids, titles = self._state
+            position = self._positions.get(event_id)
+            if position is not None:
+                titles[position] = title or ""
+                return
+            # id раньше заголовка: читатель, увидевший новый заголовок, найдёт и его id
+            ids.append(event_id)
+            titles.append(title or "")
+            self._positions[event_id] = len(ids) - 1
+
+    def remove(self, event_id: int) -> None:
+        with self._lock:
+            position = self._positions.pop(event_id, None)
+            if position is None:
+                return
+            self._state[1][position] = None
+            self._removed += 1
+            if self._removed * 2 > len(self._state[0]):
+                self._compact()
+
+    def catch_up(self, seq: int, titles: dict[int, str | None]) -> None:
+        """Применяет изменения журнала вплоть до ``seq``; более старую пачку пропускает."""
+        with self._lock:
+            if self.seq is not None and seq <= self.seq:
+                return
+            for event_id, title in titles.items():
+                if title is None:
+                    self.remove(event_id)
+                else:
+                    self.set(event_id, title)
+            self.seq = seq
+
+    def _compact(self) -> None:
+        ids, titles = self._state
+        live = [(event_id, title) for event_id, title in zip(ids, titles) if title is not None]
+        self._state = ([event_id for event_id, _ in live], [title for _, title in live])
+        self._positions = {event_id: position for position, (event_id, _) in enumerate(live)}
+        self._removed = 0
+
+    def best_match(self, title: str, *, score_cutoff: float = 0) -> TitleMatch | None:
+        ids, titles = self._state
+        if not self._positions:
+            return None
+        found = process.extractOne(title, titles, scorer=fuzz.token_set_ratio, processor=None, score_cutoff=score_cutoff)
+        if found is None:
+            return None
+        _, score, position = found
+        return TitleMatch(event_id=ids[position], score=score)
+
+
+_indexes: BindRegistry[TitleIndex] = BindRegistry()
+
+
+def _build_index(db: Session) -> TitleIndex:
+    # seq читается до строк: изменения между ними индекс потом применит повторно
+    seq = current_seq(db)
+    index = TitleIndex(EventRepository(db).list_titles())
+    index.seq = seq
+    return index
+
+
+def get_title_index(db: Session) -> TitleIndex:
+    """Возвращает общий индекс заголовков для базы сессии, при первом обращении строит его из БД.
+
+    Перед возвратом дочитывает журнал ``event_changes``: записи других процессов и
+    массовые правки в обход ORM.
+    """
+    index = _indexes.get_or_create(db, lambda: _build_index(db))
+    if index.seq is None:
+        return index
+    changes = changes_since(db, index.seq, "title")
+    if changes.values is None:
+        return _indexes.replace(db, lambda: _build_index(db))
+    if changes.values:
+        index.catch_up(changes.seq, changes.values)
+    return index
+
+
+# ---- синхронизация индекса с изменениями событий ----
+def _apply_title_changes(session: Session, pending: dict[int, str | None]) -> None:
+    index = _indexes.get(session)
+    if index is None:
+        return
+    for event_id, title in pending.items():
+        if title is None:
+            index.remove(event_id)
+        else:
+            index.set(event_id, title)
+
+
+follow_event_changes(_PENDING_KEY, lambda event: event.title, _apply_title_changes)
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+# границы бакетов гистограммы, миллисекунды
+DEFAULT_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Гистограммы длительностей стадий в разрезе ``(stage, outcome)``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: dict[tuple[str, str], Histogram] = {}
+
+    def observe(self, stage: str, outcome: str, duration_ms: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get((stage, outcome))
+            if histogram is None:
+                histogram = self._histograms[(stage, outcome)] = Histogram()
+            histogram.observe(duration_ms)
+
+    def snapshot(self) -> dict[tuple[str, str], Histogram]:
+        with self._lock:
+            return dict(self._histograms)
+
+    def stage_summary(self, stage: str) -> dict:
+        """Число вызовов, средняя длительность и доля успешных исходов стадии."""
+        with self._lock:
+            outcomes = {
+                outcome: {"count": h.count, "mean_ms": round(h.total / h.count, 2) if h.count else 0.0}
+                for (name, outcome), h in self._histograms.items()
+                if name == stage
+            }
+        total = sum(item["count"] for item in outcomes.values())
+        hits = outcomes.get("hit", {}).get("count", 0) + outcomes.get("ok", {}).get("count", 0)
+        return {"calls": total, "success_rate": round(hits / total, 3) if total else None, "outcomes": outcomes}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def render_prometheus(self, metric: str = "eventfinder_stage_duration_ms") -> str:
+        lines = [f"# HELP {metric} Duration of pipeline stages in milliseconds", f"# TYPE {metric} histogram"]
+        with self._lock:
+            for (stage, outcome), histogram in sorted(self._histograms.items()):
+                labels = f'stage="{stage}",outcome="{outcome}"'
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"{metric}_sum{{{labels}}} {histogram.total:.3f}")
+                lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+
+@dataclass
+class Span:
+    name: str
+    duration_ms: float = 0.0
+    outcome: str = "ok"
+
+
+@dataclass
+class Trace:
+    """Длительности стадий одного запроса; в ответ уходит как ``Server-Timing``."""
+
+    name: str
+    spans: list[Span] = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def to_dict(self) -> list[dict]:
+        return [{"name": s.name, "duration_ms": round(s.duration_ms, 2), "outcome": s.outcome} for s in self.spans]
+
+    def server_timing(self) -> str:
+        parts = [f'{s.name};desc="{s.outcome}";dur={s.duration_ms:.1f}' for s in self.spans]
+        parts.append(f"total;dur={self.elapsed_ms:.1f}")
+        return ", ".join(parts)
+
+
+_current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+
+
+def current_trace() -> Trace | None:
+    return _current_trace.get()
+
+
+@contextmanager
+def activate(trace: Trace | None) -> Iterator[Trace | None]:
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def record_span(name: str, duration_ms: float, outcome: str = "ok") -> Span:
+    """Учитывает уже измеренную стадию (например, посчитанную в другом процессе)."""
+    recorded = Span(name=name, duration_ms=duration_ms, outcome=outcome)
+    METRICS.observe(name, outcome, duration_ms)
+    trace = current_trace()
+    if trace is not None:
+        trace.add(recorded)
+    return recorded
+
+
+@contextmanager
+def span(name: str) -> Iterator[Span]:
+    """Замеряет блок; исход можно уточнить через ``current.outcome = "miss"``."""
+    current = Span(name=name)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException:
+        current.outcome = "error"
+        raise
+    finally:
+        record_span(name, (time.perf_counter() - started) * 1000, current.outcome)
@@ -44,6 +44,69 @@ class Settings:
     open_meteo_geocoding_base_url: str = os.getenv("OPEN_METEO_GEOCODING_BASE_URL", "https://geocoding-api.open-meteo.com/v1")
     open_meteo_weather_base_url: str = os.getenv("OPEN_METEO_WEATHER_BASE_URL", "https://api.open-meteo.com/v1")
 
+    external_search_deadline_seconds: float = float(os.getenv("EXTERNAL_SEARCH_DEADLINE_SECONDS", "12"))
+    kudago_base_url: str = os.getenv("KUDAGO_BASE_URL", "https://kudago.com")
+    afisha_ru_base_url: str = os.getenv("AFISHA_RU_BASE_URL", "https://www.afisha.ru")
+    yandex_afisha_base_url: str = os.getenv("YANDEX_AFISHA_BASE_URL", "https://afisha.yandex.ru")
+
+    scrape_user_agent: str = os.getenv("SCRAPE_USER_AGENT", "EventFinderBot/1.0 (+https://yourdomain.example) Python/requests")
+    scrape_pool_maxsize: int = int(os.getenv("SCRAPE_POOL_MAXSIZE", "10"))
+    scrape_retries: int = int(os.getenv("SCRAPE_RETRIES", "1"))
+    scrape_host_rate_per_second: float = float(os.getenv("SCRAPE_HOST_RATE_PER_SECOND", "2"))
+    scrape_host_burst: float = float(os.getenv("SCRAPE_HOST_BURST", "4"))
+    # переопределения для отдельных хостов: "kudago.com=1:2,afisha.yandex.ru=0.5"
+    scrape_host_rates: str = os.getenv("SCRAPE_HOST_RATES", "")
+    scrape_max_retry_after_seconds: float = float(os.getenv("SCRAPE_MAX_RETRY_AFTER_SECONDS", "30"))
+    # по умолчанию рядом с загрузками: в контейнере ./storage — это Python-пакет storage,
+    # писать туда нельзя. Пустое значение отключает кэш
+    scrape_cache_dir: str = os.getenv("SCRAPE_CACHE_DIR", str(Path(local_storage_dir) / "http_cache"))
+    scrape_cache_max_entry_bytes: int = int(os.getenv("SCRAPE_CACHE_MAX_ENTRY_BYTES", str(5 * 1024 * 1024)))
+    # общий бюджет кэша: сверх него вытесняются давно не использованные записи; 0 — без ограничения
+    scrape_cache_max_bytes: int = int(os.getenv("SCRAPE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    # запись старше этого не ревалидируется, а скачивается заново; 0 — без срока
+    scrape_cache_ttl_seconds: float = float(os.getenv("SCRAPE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+    scrape_image_workers: int = int(os.getenv("SCRAPE_IMAGE_WORKERS", "8"))
+    # картинка для хэширования скачивается потоком и обрывается на этом размере
+    image_max_bytes: int = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+    # пороги сравнения картинок — единственное место, где они задаются.
+    # pHash <= strict — совпадение и без подтверждения; <= loose — кандидат, которого
+    # подтверждают dHash и colorhash
+    image_phash_strict_distance: int = int(os.getenv("IMAGE_PHASH_STRICT_DISTANCE", "8"))
+    image_phash_loose_distance: int = int(os.getenv("IMAGE_PHASH_LOOSE_DISTANCE", "14"))
+    image_dhash_max_distance: int = int(os.getenv("IMAGE_DHASH_MAX_DISTANCE", "16"))
+    image_colorhash_max_distance: int = int(os.getenv("IMAGE_COLORHASH_MAX_DISTANCE", "6"))
+
+    crawl_job_workers: int = int(os.getenv("CRAWL_JOB_WORKERS", "2"))
+    crawl_concurrency: int = int(os.getenv("CRAWL_CONCURRENCY", "4"))
+    crawl_bloom_capacity: int = int(os.getenv("CRAWL_BLOOM_CAPACITY", "200000"))
+    crawl_max_items_per_page: int = int(os.getenv("CRAWL_MAX_ITEMS_PER_PAGE", "50"))
+
+    ocr_strategy: str = os.getenv("OCR_STRATEGY", "first-good")
+    ocr_workers: int = int(os.getenv("OCR_WORKERS", "4"))
+    ocr_min_confidence: float = float(os.getenv("OCR_MIN_CONFIDENCE", "70"))
+    ocr_min_text_length: int = int(os.getenv("OCR_MIN_TEXT_LENGTH", "30"))
+    ocr_timeout_seconds: float = float(os.getenv("OCR_TIMEOUT_SECONDS", "30"))
+
+    lookup_cache_max_bytes: int = int(os.getenv("LOOKUP_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    lookup_cache_path: str = os.getenv("LOOKUP_CACHE_PATH", "")
+
+    lookup_job_workers: int = int(os.getenv("LOOKUP_JOB_WORKERS", "4"))
+    # фоновая задача арендуется одним процессом; владелец продлевает аренду на каждом шаге
+    job_lease_seconds: float = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+    # столько раз задача может начаться и не завершиться, дальше она помечается failed; 0 — без ограничения
+    max_job_attempts: int = int(os.getenv("MAX_JOB_ATTEMPTS", "3"))
+    resume_jobs_on_startup: bool = os.getenv("RESUME_JOBS_ON_STARTUP", "true").lower() in {"1", "true", "yes"}
+
+    # total для списков: точный подсчёт до этого числа строк, дальше — оценка по выборке последних id
+    list_count_exact_limit: int = int(os.getenv("LIST_COUNT_EXACT_LIMIT", "1000"))
+    list_count_estimate: bool = os.getenv("LIST_COUNT_ESTIMATE", "true").lower() in {"1", "true", "yes"}
+    list_count_estimate_sample: int = int(os.getenv("LIST_COUNT_ESTIMATE_SAMPLE", "5000"))
+    list_count_cache_ttl_seconds: float = float(os.getenv("LIST_COUNT_CACHE_TTL_SECONDS", "60"))
+    list_count_cache_size: int = int(os.getenv("LIST_COUNT_CACHE_SIZE", "1024"))
+
+    server_timing_enabled: bool = os.getenv("SERVER_TIMING_ENABLED", "false").lower() in {"1", "true", "yes"}
+
     def ensure_local_storage(self) -> Path:
         path = Path(self.local_storage_dir)
         path.mkdir(parents=True, exist_ok=True)
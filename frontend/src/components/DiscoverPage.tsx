@@ -60,7 +60,9 @@ export function DiscoverPage() {
   });
   const [items, setItems] = useState<PublicEventDto[]>([]);
   const [total, setTotal] = useState(0);
-  const [totalPages, setTotalPages] = useState(1);
+  // null, если total — оценка: тогда листаем только «Назад»/«Вперёд»
+  const [totalPages, setTotalPages] = useState<number | null>(1);
+  const [hasNextPage, setHasNextPage] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
@@ -96,7 +98,9 @@ export function DiscoverPage() {
         if (ignore) return;
         setItems(response.items);
         setTotal(response.total);
-        setTotalPages(response.total_pages);
+        const pages = response.total_mode === "estimate" ? null : response.total_pages;
+        setTotalPages(pages);
+        setHasNextPage(pages !== null ? response.page < pages : response.items.length >= response.page_size);
       })
       .catch((err: Error) => {
         if (!ignore) setError(err.message || "Не удалось загрузить публичный каталог");
@@ -268,7 +272,8 @@ export function DiscoverPage() {
         <>
           <div className="mb-4 flex items-center justify-between">
             <p className="text-sm text-muted-foreground">
-              Найдено: {total}. Страница {filters.page} из {totalPages}
+              Найдено: {totalPages === null ? "≈" : ""}{total}. Страница {filters.page}
+              {totalPages !== null && ` из ${totalPages}`}
             </p>
           </div>
 
@@ -278,19 +283,19 @@ export function DiscoverPage() {
             ))}
           </div>
 
-          {totalPages > 1 && (
+          {(filters.page > 1 || hasNextPage) && (
             <div className="mt-6 flex flex-wrap items-center justify-center gap-2">
               <Button variant="outline" disabled={filters.page <= 1} onClick={() => updateParam("page", filters.page - 1)}>
                 Назад
               </Button>
-              {Array.from({ length: totalPages }, (_, index) => index + 1)
+              {Array.from({ length: totalPages ?? 0 }, (_, index) => index + 1)
                 .slice(0, 7)
                 .map((pageNumber) => (
                   <Button key={pageNumber} variant={pageNumber === filters.page ? "default" : "outline"} onClick={() => updateParam("page", pageNumber)}>
                     {pageNumber}
                   </Button>
                 ))}
-              <Button variant="outline" disabled={filters.page >= totalPages} onClick={() => updateParam("page", filters.page + 1)}>
+              <Button variant="outline" disabled={!hasNextPage} onClick={() => updateParam("page", filters.page + 1)}>
                 Вперёд
               </Button>
             </div>
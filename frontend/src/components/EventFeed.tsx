@@ -60,6 +60,12 @@ export function EventFeed() {
   }, [filters]);
 
   const cardEvents = useMemo(() => (payload?.items || []).map(mapEventToCard), [payload]);
+  const currentPage = payload?.page ?? 1;
+  // по оценке total номера страниц не рисуем: последние из них могли бы оказаться пустыми
+  const estimated = payload?.total_mode === "estimate";
+  const totalPages = estimated ? null : payload?.total_pages ?? 1;
+  const hasNextPage =
+    totalPages !== null ? currentPage < totalPages : (payload?.items.length ?? 0) >= (payload?.page_size ?? Infinity);
 
   const updateParam = (key: string, value: string | boolean | number | null) => {
     const next = new URLSearchParams(searchParams);
@@ -196,7 +202,8 @@ export function EventFeed() {
         <>
           <div className="flex items-center justify-between">
             <p className="text-sm text-muted-foreground">
-              Найдено: {payload?.total ?? 0}. Страница {payload?.page ?? 1} из {payload?.total_pages ?? 1}
+              Найдено: {estimated ? "≈" : ""}{payload?.total ?? 0}. Страница {currentPage}
+              {totalPages !== null && ` из ${totalPages}`}
             </p>
             {user && <p className="text-sm text-muted-foreground">Роль: {user.role}</p>}
           </div>
@@ -222,12 +229,12 @@ export function EventFeed() {
             </div>
           )}
 
-          {(payload?.total_pages ?? 1) > 1 && (
+          {(currentPage > 1 || hasNextPage) && (
             <div className="flex flex-wrap items-center justify-center gap-2">
-              <Button variant="outline" disabled={(payload?.page ?? 1) <= 1} onClick={() => updateParam("page", (payload?.page ?? 1) - 1)}>
+              <Button variant="outline" disabled={currentPage <= 1} onClick={() => updateParam("page", currentPage - 1)}>
                 Назад
               </Button>
-              {Array.from({ length: payload?.total_pages ?? 1 }, (_, index) => index + 1)
+              {Array.from({ length: totalPages ?? 0 }, (_, index) => index + 1)
                 .slice(0, 7)
                 .map((pageNumber) => (
                   <Button
@@ -240,8 +247,8 @@ export function EventFeed() {
                 ))}
               <Button
                 variant="outline"
-                disabled={(payload?.page ?? 1) >= (payload?.total_pages ?? 1)}
-                onClick={() => updateParam("page", (payload?.page ?? 1) + 1)}
+                disabled={!hasNextPage}
+                onClick={() => updateParam("page", currentPage + 1)}
               >
                 Вперёд
               </Button>
@@ -78,6 +78,30 @@ describe("DiscoverPage", () => {
     });
   });
 
+  it("pages an estimated total without numbered page links", async () => {
+    vi.mocked(publicApi.list).mockResolvedValueOnce({
+      items: [{ id: 2, title: "Estimated Event", owner_id: 1 }],
+      total: 5001,
+      page: 1,
+      page_size: 1,
+      total_pages: null,
+      total_mode: "estimate",
+    });
+
+    render(
+      <MemoryRouter>
+        <DiscoverPage />
+      </MemoryRouter>,
+    );
+
+    await waitFor(() => {
+      expect(screen.getByText("Estimated Event")).toBeInTheDocument();
+    });
+    expect(screen.getByText(/Найдено: ≈5001/)).toBeInTheDocument();
+    expect(screen.queryByRole("button", { name: "2" })).not.toBeInTheDocument();
+    expect(screen.getByRole("button", { name: "Вперёд" })).toBeEnabled();
+  });
+
   it("applies typed filters through query params", async () => {
     const user = userEvent.setup();
 
@@ -57,7 +57,10 @@ export interface EventListResponse<T = EventDto> {
   total: number;
   page: number;
   page_size: number;
-  total_pages: number;
+  // null, если total — оценка (total_mode "estimate"): страницы не нумеруются
+  total_pages: number | null;
+  next_cursor?: string | null;
+  total_mode?: "exact" | "cached" | "estimate";
 }
 
 export interface EventFilters {
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import os
 import sys
+import tempfile
 from pathlib import Path
 
 import pytest
@@ -13,6 +15,13 @@ API_ROOT = PROJECT_ROOT / "api"
 if str(API_ROOT) not in sys.path:
     sys.path.insert(0, str(API_ROOT))
 
+# main при импорте создаёт таблицы и гоняет миграции на движке по умолчанию —
+# он должен смотреть во временную базу, а не в eventfinder_lab.db из репозитория
+_DEFAULT_DB_DIR = tempfile.mkdtemp(prefix="eventfinder-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(_DEFAULT_DB_DIR) / 'default.db'}"
+# тесты продолжают задачи сами, на своих базах
+os.environ["RESUME_JOBS_ON_STARTUP"] = "false"
+
 from database import Base, get_db  # noqa: E402
 from dependencies import get_external_insights_service  # noqa: E402
 from main import app  # noqa: E402
@@ -68,3 +77,11 @@ def client(tmp_path):
         yield test_client
 
     app.dependency_overrides.clear()
+
+
+@pytest.fixture(autouse=True)
+def unthrottled_loopback():
+    # заглушки сайтов в тестах живут на 127.0.0.1 — общий token bucket их не тормозит
+    from services.http_client import get_scrape_client
+
+    get_scrape_client().limiter.configure("127.0.0.1", rate_per_second=1000, burst=1000)
@@ -64,6 +64,178 @@ def test_event_creation_public_catalog_and_seo_endpoints(client):
     assert f"/discover/{event_id}" in sitemap.text
 
 
+def test_category_and_location_filters_use_casefolded_columns(client):
+    token_pair = register_and_login(client)
+    headers = auth_headers(token_pair["access_token"])
+    for title, category, location in (
+        ("Ярмарка", "ЁЛОЧНЫЕ Базары", "Санкт-Петербург, НЕВСКИЙ пр."),
+        ("Каток", "Спорт", "Москва, Парк Горького"),
+    ):
+        client.post("/api/v1/events/", headers=headers, json={"title": title, "category": category, "location": location})
+
+    def titles(**params):
+        response = client.get("/api/v1/events/", headers=headers, params=params)
+        assert response.status_code == 200, response.text
+        return [item["title"] for item in response.json()["items"]]
+
+    assert titles(category="елочн") == ["Ярмарка"]
+    assert titles(category="базары") == []
+    assert titles(location="невский") == ["Ярмарка"]
+    assert titles(location="ПАРК горь") == ["Каток"]
+
+    from models.event import Event
+
+    db = db_session(client)
+    event = db.query(Event).filter(Event.title == "Каток").one()
+    assert (event.title_norm, event.category_norm) == ("каток", "спорт")
+    event.category = "Зимний СПОРТ"
+    db.commit()
+    assert event.category_norm == "зимний спорт"
+
+
+def test_catalog_search_uses_full_text_index(client):
+    token_pair = register_and_login(client)
+    headers = auth_headers(token_pair["access_token"])
+    ids = {}
+    for title, description, category in (
+        ("Ёлка в Кремле", "Новогоднее представление", "Праздники"),
+        ("Новогодний концерт", "У входа стоит большая ёлка", "Концерты"),
+        ("Выставка графики", "Офорты и литографии", "Выставки"),
+    ):
+        response = client.post(
+            "/api/v1/events/",
+            headers=headers,
+            json={
+                "title": title,
+                "description": description,
+                "category": category,
+                "location": "Москва",
+                "date": (datetime.now(timezone.utc) + timedelta(days=3)).isoformat(),
+            },
+        )
+        ids[title] = response.json()["id"]
+
+    def search(path, **params):
+        response = client.get(path, headers=headers, params=params)
+        assert response.status_code == 200, response.text
+        return [item["title"] for item in response.json()["items"]]
+
+    # регистр, «ё» и префикс слова
+    assert search("/api/v1/events/", q="ЕЛК", sort_by="relevance") == ["Ёлка в Кремле", "Новогодний концерт"]
+    assert search("/api/v1/public/events", q="новогод кремл") == ["Ёлка в Кремле"]
+    assert search("/api/v1/public/events", q="литограф") == ["Выставка графики"]
+
+    # индекс поддерживают триггеры
+    client.put(f"/api/v1/events/{ids['Выставка графики']}", headers=headers, json={"title": "Выставка гравюр"})
+    client.delete(f"/api/v1/events/{ids['Новогодний концерт']}", headers=headers)
+    assert search("/api/v1/events/", q="гравюр") == ["Выставка гравюр"]
+    assert search("/api/v1/events/", q="ёлка") == ["Ёлка в Кремле"]
+
+
+def test_events_cursor_pagination_is_stable_under_inserts(client):
+    token_pair = register_and_login(client)
+    headers = auth_headers(token_pair["access_token"])
+    base = datetime.now(timezone.utc) + timedelta(days=1)
+
+    def create(title, date):
+        payload = {"title": title, "category": "Концерты", "location": "Москва"}
+        if date is not None:
+            payload["date"] = date.isoformat()
+        assert client.post("/api/v1/events/", headers=headers, json=payload).status_code == 201
+
+    # одинаковые даты и события без даты — ключ (date, created_at, id) всё равно задаёт полный порядок
+    for index in range(7):
+        create(f"Событие {index}", None if index >= 5 else base + timedelta(days=index // 2))
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"page_size": 3, **({"cursor": cursor} if cursor else {})}
+        body = client.get("/api/v1/events/", headers=headers, params=params).json()
+        seen += [item["title"] for item in body["items"]]
+        if not seen or len(seen) == 3:
+            # новое событие в начале выдачи не сдвигает уже выданные страницы
+            create("Поздняя вставка", base - timedelta(days=1))
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted(f"Событие {index}" for index in range(7))
+    assert seen[5:] == ["Событие 6", "Событие 5"]
+
+    offset_page = client.get("/api/v1/public/events", params={"page_size": 2}).json()
+    next_page = client.get("/api/v1/public/events", params={"page_size": 2, "cursor": offset_page["next_cursor"]}).json()
+    assert [item["title"] for item in next_page["items"]] == ["Событие 3", "Событие 2"]
+
+    # курсор привязан к сортировке, мусор отклоняется
+    other_sort = {"cursor": offset_page["next_cursor"], "sort_by": "title"}
+    assert client.get("/api/v1/events/", headers=headers, params=other_sort).status_code == 400
+    assert client.get("/api/v1/public/events", params={"cursor": "не-курсор"}).status_code == 400
+
+
+def test_list_totals_are_cached_invalidated_and_estimated(client):
+    from services.list_counts import get_list_counter
+
+    token_pair = register_and_login(client)
+    headers = auth_headers(token_pair["access_token"])
+
+    def create(title):
+        response = client.post("/api/v1/events/", headers=headers, json={"title": title, "category": "Концерты"})
+        return response.json()["id"]
+
+    def listing(**params):
+        body = client.get("/api/v1/events/", headers=headers, params=params).json()
+        # по оценке страницы не нумеруются
+        assert (body["total_pages"] is None) == (body["total_mode"] == "estimate")
+        return body["total"], body["total_mode"]
+
+    for index in range(3):
+        create(f"Концерт {index}")
+    assert listing(category="концерты") == (3, "exact")
+    # другая сортировка и страница — тот же набор строк, тот же ключ кэша
+    assert listing(category="Концерты ", sort_by="title", page=2) == (3, "cached")
+
+    event_id = create("Концерт 3")
+    assert listing(category="концерты") == (4, "exact")
+    client.delete(f"/api/v1/events/{event_id}", headers=headers)
+    assert listing(category="концерты") == (3, "exact")
+
+    counter = get_list_counter(db_session(client))
+    counter.exact_limit = 2
+    counter.invalidate()
+    assert listing(q="концерт") == (3, "estimate")
+    assert listing(q="концерт") == (3, "estimate")
+
+
+def test_list_endpoints_defer_large_columns_and_offer_compact_cards(client):
+    from repositories.events import EventRepository
+    from schemas import PublicEventQueryParams
+
+    token_pair = register_and_login(client)
+    headers = auth_headers(token_pair["access_token"])
+    date = (datetime.now(timezone.utc) + timedelta(days=2)).isoformat()
+    for index in range(3):
+        client.post(
+            "/api/v1/events/",
+            headers=headers,
+            json={"title": f"Лекция {index}", "description": "Длинное описание. " * 50, "date": date},
+        )
+
+    full = client.get("/api/v1/public/events").json()
+    assert full["view"] == "full" and full["items"][0]["description"] and full["items"][0]["files"] == []
+
+    compact = client.get("/api/v1/public/events", params={"view": "compact", "page_size": 2}).json()
+    assert compact["view"] == "compact" and compact["total"] == 3 and compact["next_cursor"]
+    assert set(compact["items"][0]) == {"id", "title", "date", "location", "image_url", "price", "category", "is_favorite", "created_at"}
+    mine = client.get("/api/v1/events/", headers=headers, params={"view": "compact"}).json()
+    assert [item["title"] for item in mine["items"]] == ["Лекция 2", "Лекция 1", "Лекция 0"]
+
+    # файлы подгружены отдельным запросом, текст OCR не читался вовсе
+    items, _, _ = EventRepository(db_session(client)).list_public(PublicEventQueryParams())
+    assert all("files" in item.__dict__ and "raw_text" not in item.__dict__ for item in items)
+    cards, _, _ = EventRepository(db_session(client)).list_public(PublicEventQueryParams(view="compact"))
+    assert all("files" not in card.__dict__ and "description" not in card.__dict__ for card in cards)
+
+
 def test_external_location_insights_endpoint(client):
     response = client.get("/api/v1/external/location-insights", params={"location": "Vilnius"})
     assert response.status_code == 200, response.text
@@ -119,3 +291,68 @@ def test_events_filtering_sorting_and_pagination(client):
     assert second_page.status_code == 200, second_page.text
     assert second_page.json()["page"] == 2
     assert second_page.json()["items"][0]["title"] == "Jazz Night"
+
+
+def make_poster_png(seed: int = 0) -> bytes:
+    from io import BytesIO
+
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (160, 240), "white")
+    draw = ImageDraw.Draw(image)
+    for step in range(0, 160, 16):
+        draw.rectangle([step, (step * 3 + seed * 40) % 240, step + 8, 240], fill=(step, 80 + seed * 30, 200 - step))
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def db_session(client):
+    from database import get_db
+
+    return next(client.app.dependency_overrides[get_db]())
+
+
+def test_photo_search_returns_projected_top_k(client):
+    import imagehash
+    from io import BytesIO
+
+    from PIL import Image
+
+    from models.event import Event
+
+    token_pair = register_and_login(client)
+    headers = auth_headers(token_pair["access_token"])
+    poster = make_poster_png()
+    ids = []
+    for title in ("Poster match", "Other poster"):
+        response = client.post("/api/v1/events/", headers=headers, json={"title": title, "image_url": "https://example.com/p.png"})
+        ids.append(response.json()["id"])
+
+    db = db_session(client)
+    db.get(Event, ids[0]).image_hash = str(imagehash.phash(Image.open(BytesIO(poster)).convert("RGB")))
+    db.get(Event, ids[1]).image_hash = str(imagehash.phash(Image.open(BytesIO(make_poster_png(seed=3))).convert("RGB")))
+    db.commit()
+    db.close()
+
+    response = client.post(
+        "/api/v1/photo/",
+        params={"top_k": 1, "max_distance": 64},
+        files={"file": ("poster.png", poster, "image/png")},
+    )
+    assert response.status_code == 200, response.text
+    payload = response.json()
+    assert payload["query_matches"] == [
+        {
+            "id": ids[0],
+            "title": "Poster match",
+            "image_url": "https://example.com/p.png",
+            "distance": 0,
+            "dhash_distance": None,
+            "colorhash_distance": None,
+            # без dHash/colorhash их расстояния берутся по порогам: та же шкала, что у подтверждённых
+            "score": 0.1036,
+        }
+    ]
+    assert payload["scanned"] == 2
+    assert payload["elapsed_ms"] >= 0
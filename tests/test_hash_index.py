@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import random
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models.event import Event
+from models.user import User
+from repositories.events import EventRepository
+from services.hash_index import HammingIndex, get_hash_index, search_similar
+from services.hash_matrix import HashMatrix
+from services.phash import EXACT_BAND_RADIUS, to_signed64
+from settings import get_settings
+
+
+@pytest.fixture()
+def session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'index.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    owner = User(email="owner@example.com", hashed_password="x", role="user")
+    db.add(owner)
+    db.commit()
+    yield db, owner
+    db.close()
+
+
+def test_hamming_index_matches_linear_scan():
+    rng = random.Random(7)
+    index = HammingIndex()
+    hashes = {event_id: rng.getrandbits(64) for event_id in range(1, 2001)}
+    for event_id, value in hashes.items():
+        index.add(event_id, value)
+    query = hashes[42] ^ 0b1011  # три бита отличаются
+
+    for radius in (0, 3, 8, 14, 64):
+        expected = sorted(
+            (bin(query ^ value).count("1"), event_id)
+            for event_id, value in hashes.items()
+            if bin(query ^ value).count("1") <= radius
+        )
+        found = index.search(query, max_distance=radius)
+        assert [(m.distance, m.event_id) for m in found.matches] == expected
+
+    assert index.search(query, max_distance=8).scanned < len(hashes)
+
+
+def test_shared_index_follows_event_changes(session):
+    db, owner = session
+    event = Event(title="Poster", image_hash="ffff0000ffff0000", owner_id=owner.id)
+    db.add(event)
+    db.commit()
+    assert [m.event_id for m in search_similar(db, "ffff0000ffff0001", max_distance=2).matches] == [event.id]
+
+    event.image_hash = "0000ffff0000ffff"
+    db.commit()
+    assert search_similar(db, "ffff0000ffff0000", max_distance=8).matches == []
+    assert search_similar(db, "0000ffff0000ffff", max_distance=0).matches[0].event_id == event.id
+
+    created = Event(title="Rolled back", image_hash="0000ffff0000ffff", owner_id=owner.id)
+    db.add(created)
+    db.flush()
+    db.rollback()
+    assert len(get_hash_index(db)) == 1
+
+    db.delete(event)
+    db.commit()
+    assert len(get_hash_index(db)) == 0
+
+
+def test_shared_index_catches_up_on_writes_outside_the_session(session):
+    db, owner = session
+    event = Event(title="Poster", image_hash="ffff0000ffff0000", owner_id=owner.id)
+    db.add(event)
+    db.commit()
+    assert len(get_hash_index(db)) == 1
+
+    # массовая правка: события сессии её не видят, журнал event_changes — видит
+    db.query(Event).filter(Event.id == event.id).update(
+        {Event.image_hash: "0000ffff0000ffff", Event.image_hash_int: 0x0000FFFF0000FFFF},
+        synchronize_session=False,
+    )
+    db.commit()
+    assert search_similar(db, "0000ffff0000ffff", max_distance=8).matches[0].event_id == event.id
+
+    # запись другого процесса: отдельный engine и голый SQL
+    other = create_engine(db.get_bind().url)
+    insert = text("INSERT INTO events (title, owner_id, image_hash, image_hash_int) VALUES (:title, :owner, :hex, :value)")
+    with other.begin() as connection:
+        connection.execute(insert, {"title": "Other", "owner": owner.id, "hex": "00ff00ff00ff00ff", "value": 0x00FF00FF00FF00FF})
+    assert len(search_similar(db, "00ff00ff00ff00ff", max_distance=8).matches) == 1
+
+    # журнал обрезан дальше прочитанного — индекс пересобирается целиком
+    with other.begin() as connection:
+        connection.execute(insert, {"title": "Third", "owner": owner.id, "hex": "0f0f0f0f0f0f0f0f", "value": 0x0F0F0F0F0F0F0F0F})
+        connection.execute(insert, {"title": "Fourth", "owner": owner.id, "hex": "f0f0f0f0f0f0f0f0", "value": to_signed64(0xF0F0F0F0F0F0F0F0)})
+        connection.execute(text("DELETE FROM event_changes WHERE seq < (SELECT max(seq) FROM event_changes)"))
+    other.dispose()
+    assert len(get_hash_index(db)) == 4
+    assert len(search_similar(db, "0f0f0f0f0f0f0f0f", max_distance=0).matches) == 1
+
+
+def test_hash_matrix_top_k_and_removal():
+    rng = random.Random(11)
+    hashes = {event_id: rng.getrandbits(64) for event_id in range(1, 5001)}
+    matrix = HashMatrix.from_rows(hashes.items())
+    query = rng.getrandbits(64)
+
+    expected = sorted((bin(query ^ value).count("1"), event_id) for event_id, value in hashes.items())[:25]
+    assert [(d, i) for i, d in matrix.search(query, top_k=25)] == expected
+
+    for event_id in range(1, 5001, 2):
+        matrix.remove(event_id)
+    matrix.add(2, query)
+    found = matrix.search(query, max_distance=20, top_k=5)
+    assert found[0] == (2, 0)
+    assert all(event_id % 2 == 0 for event_id, _ in found)
+    assert len(matrix) == 2500
+
+
+def test_hash_columns_support_band_lookup_without_index(session):
+    db, owner = session
+    event = Event(title="Banded", image_hash="8000000000000001", owner_id=owner.id)
+    db.add(event)
+    db.commit()
+
+    assert event.image_hash_int < 0  # старший бит хранится как знаковый BIGINT
+    assert EventRepository(db).list_image_hashes() == [(event.id, 0x8000000000000001)]
+    found = search_similar(db, "8000000000000003", max_distance=EXACT_BAND_RADIUS)
+    assert [(m.event_id, m.distance) for m in found.matches] == [(event.id, 1)]
+
+
+def test_title_index_appends_in_place_and_follows_event_changes(session):
+    from services.title_index import TitleIndex, get_title_index
+
+    index = TitleIndex([(1, "Концерт органной музыки"), (2, "Выставка графики")])
+    titles_before = index._state[1]
+    index.set(3, "Концерт органной музыки")
+    # новое событие дописывается в те же списки, без копии всего каталога
+    assert index._state[1] is titles_before and len(index) == 3
+    # при равном счёте выигрывает более старое событие
+    assert index.best_match("концерт органной музыки").event_id == 1
+    index.remove(1)
+    assert index.best_match("Концерт органной музыки").event_id == 3
+    index.remove(2)
+    # удалённых больше половины — списки пересобраны, позиции остались верными
+    assert index._state[0] == [3] and index.best_match("Выставка").event_id == 3
+
+    db, owner = session
+    event = Event(title="Лекция о джазе", owner_id=owner.id)
+    db.add(event)
+    db.commit()
+    shared = get_title_index(db)
+    added = Event(title="Спектакль «Чайка»", owner_id=owner.id)
+    db.add(added)
+    db.commit()
+    assert shared.best_match("Спектакль «Чайка»", score_cutoff=90).event_id == added.id
+    db.delete(added)
+    db.commit()
+    assert shared.best_match("Спектакль «Чайка»", score_cutoff=90) is None
+    assert len(shared) == 1
+
+    # массовая правка и запись другого процесса приходят через журнал event_changes
+    db.query(Event).filter(Event.id == event.id).update({Event.title: "Лекция о блюзе"}, synchronize_session=False)
+    db.commit()
+    other = create_engine(db.get_bind().url)
+    with other.begin() as connection:
+        connection.execute(text("INSERT INTO events (title, owner_id) VALUES ('Опера «Кармен»', :owner)"), {"owner": owner.id})
+    other.dispose()
+    shared = get_title_index(db)
+    assert shared.best_match("Лекция о блюзе", score_cutoff=90).event_id == event.id
+    assert shared.best_match("Опера «Кармен»", score_cutoff=90) is not None
+    assert len(shared) == 2
+
+
+def test_index_images_script_resumes_from_checkpoint(session, tmp_path):
+    from test_api_flows import make_poster_png
+
+    from scripts import index_images
+    from services.image_hashing import fingerprint_bytes
+
+    db, owner = session
+    events = [Event(title=f"Афиша {i}", image_url=f"https://img.example/{i}.png", owner_id=owner.id) for i in range(5)]
+    events.append(Event(title="Без картинки", owner_id=owner.id))
+    db.add_all(events)
+    db.commit()
+    checkpoint = tmp_path / "checkpoint.json"
+    assert index_images.load_checkpoint(checkpoint) == 0
+
+    rows = index_images.fetch_batch(db, 0, 2)
+    assert [event_id for event_id, _ in rows] == [events[0].id, events[1].id]
+    index_images.write_batch(db, {event_id: fingerprint_bytes(make_poster_png(seed)) for seed, (event_id, _) in enumerate(rows)})
+    index_images.save_checkpoint(checkpoint, rows[-1][0])
+
+    # повторный запуск продолжает после checkpoint; проиндексированные события не выбираются даже с начала
+    resumed = index_images.fetch_batch(db, index_images.load_checkpoint(checkpoint), 10)
+    assert [event_id for event_id, _ in resumed] == [ev.id for ev in events[2:5]]
+    assert index_images.fetch_batch(db, 0, 10) == resumed
+    db.expire_all()
+    assert db.get(Event, events[0].id).image_hash is not None and db.get(Event, events[0].id).image_fingerprint is not None
+    assert index_images.DEFAULT_CHECKPOINT.parent == Path(get_settings().local_storage_dir)
+
+
+def test_models_import_without_image_and_http_stack():
+    import subprocess
+    import sys
+
+    # модели нужны миграциям и скриптам — PIL, requests и HTTP-клиент им не нужны
+    code = "import sys, models; print(sorted(m for m in ('PIL', 'requests', 'services.http_client') if m in sys.modules))"
+    api_dir = Path(__file__).resolve().parents[1] / "api"
+    output = subprocess.run([sys.executable, "-c", code], cwd=api_dir, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "[]"
@@ -0,0 +1,604 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+
+import pytest
+
+from services import ocr
+
+
+def fake_run_config(delays: dict[str, float], results: dict[str, tuple[str, float]], calls: list[str]):
+    def run(image, config, config_name, deadline=None, cancelled=None):
+        calls.append(config_name)
+        time.sleep(delays.get(config_name, 0))
+        text, confidence = results[config_name]
+        return ocr.OcrAttempt(config_name=config_name, text=text, confidence=confidence)
+
+    return run
+
+
+class ManualExecutor(Executor):
+    """Первые ``run_now`` задач выполняются сразу при submit, следующая остаётся
+    «запущенной» навсегда, остальные ждут в очереди и могут быть отменены."""
+
+    def __init__(self, run_now: int):
+        self.run_now = run_now
+        self.futures: list[Future] = []
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        if len(self.futures) < self.run_now:
+            future.set_running_or_notify_cancel()
+            future.set_result(fn(*args, **kwargs))
+        elif len(self.futures) == self.run_now:
+            future.set_running_or_notify_cancel()
+        self.futures.append(future)
+        return future
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def perf_counter(self) -> float:
+        return self.now
+
+
+@pytest.fixture()
+def ocr_results():
+    return {
+        "Single uniform block": ("КОНЦЕРТ ГРУППЫ «ФЕНИС» 25 июня 20:00", 55.0),
+        "Sparse text": ("КОНЦЕРТ ГРУППЫ «ФЕНИС» 25 июня, 20:00 клуб Зал", 91.0),
+        "Fully automatic": ("КОНЦЕРТ ГРУППЫ «ФЕНИС» 25 июня, 20:00 клуб Зал, цена 1500 руб", 80.0),
+        "Single column of text": ("шум", 10.0),
+    }
+
+
+def test_ocr_first_good_stops_slow_configs(monkeypatch, ocr_results):
+    stopped: list[str] = []
+    fast = fake_run_config({}, ocr_results, [])
+    # хороший ответ приходит, только когда оба медленных прогона уже запущены
+    all_started = threading.Barrier(3, timeout=5)
+
+    def run(image, config, config_name, deadline=None, cancelled=None):
+        if config_name in {"Fully automatic", "Single column of text"}:
+            all_started.wait()
+            # медленный прогон ждёт флага отмены, как tesseract в _tesseract_data
+            if cancelled.wait(timeout=5):
+                stopped.append(config_name)
+                raise ocr.OcrCancelled(config_name)
+        if config_name == "Sparse text":
+            all_started.wait()
+        return fast(image, config, config_name)
+
+    monkeypatch.setattr(ocr, "run_config", run)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        attempt = ocr.recognize(object(), strategy="first-good", executor=pool)
+
+    assert attempt.config_name == "Sparse text"
+    assert sorted(stopped) == ["Fully automatic", "Single column of text"]
+
+
+def test_ocr_records_cancelled_only_for_runs_that_never_started(monkeypatch, ocr_results):
+    flags = []
+    spans: list[tuple[str, str]] = []
+    run = fake_run_config({}, ocr_results, [])
+
+    def recording_run(image, config, config_name, deadline=None, cancelled=None):
+        flags.append(cancelled)
+        return run(image, config, config_name)
+
+    monkeypatch.setattr(ocr, "run_config", recording_run)
+    monkeypatch.setattr(ocr, "record_span", lambda name, duration_ms, status: spans.append((name, status)))
+
+    # psm6 и psm11 готовы, psm3 уже выполняется, psm4 ещё в очереди
+    executor = ManualExecutor(run_now=2)
+    attempt = ocr.recognize(object(), strategy="first-good", executor=executor)
+
+    assert attempt.config_name == "Sparse text"
+    running, queued = executor.futures[2:]
+    assert queued.cancelled() and not running.cancelled()
+    assert [name for name, status in spans if status == "cancelled"] == ["ocr.psm4"]
+    # запущенный прогон остановит флаг запроса
+    assert all(flag.is_set() for flag in flags)
+
+
+def test_ocr_best_of_n_and_single_pass(monkeypatch, ocr_results):
+    calls: list[str] = []
+    monkeypatch.setattr(ocr, "run_config", fake_run_config({}, ocr_results, calls))
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        assert ocr.recognize(object(), strategy="best-of-n", executor=pool).config_name == "Fully automatic"
+
+    calls.clear()
+    assert ocr.recognize(object(), strategy="single-pass").config_name == "Single uniform block"
+    assert calls == ["Single uniform block"]
+
+
+def test_ocr_uses_one_absolute_deadline(monkeypatch, ocr_results):
+    from settings import get_settings
+
+    clock = FakeClock()
+    calls: list[str] = []
+    deadlines: list[float] = []
+    waits: list[float] = []
+    real_wait = ocr.wait
+
+    def run(image, config, config_name, deadline=None, cancelled=None):
+        # каждый прогон «длится» 0.15 с по подменённым часам
+        calls.append(config_name)
+        deadlines.append(deadline)
+        clock.now += 0.15
+        return ocr.OcrAttempt(config_name=config_name, text="шум", confidence=10.0)
+
+    def recording_wait(futures, timeout=None, return_when=None):
+        waits.append(timeout)
+        return real_wait(futures, timeout=timeout, return_when=return_when)
+
+    monkeypatch.setattr(ocr, "time", clock)
+    monkeypatch.setattr(ocr, "wait", recording_wait)
+    monkeypatch.setattr(ocr, "run_config", run)
+    monkeypatch.setattr(get_settings(), "ocr_timeout_seconds", 0.25)
+    monkeypatch.setattr(get_settings(), "ocr_workers", 0)
+
+    # прогоны по очереди: после дедлайна следующая конфигурация не запускается
+    ocr.recognize(object(), strategy="best-of-n", executor=None)
+    assert len(calls) == 2 and len(set(deadlines)) == 1
+
+    # параллельно: ожидание не перезапускается после каждого готового прогона,
+    # а все прогоны получают тот же дедлайн, на котором tesseract будет убит
+    calls.clear()
+    deadlines.clear()
+    executor = ManualExecutor(run_now=2)
+    ocr.recognize(object(), strategy="best-of-n", executor=executor)
+    assert len(calls) == 2 and len(set(deadlines)) == 1
+    assert waits == [0.0, 0.0]
+    assert executor.futures[3].cancelled()
+
+
+def test_ocr_skips_runs_that_start_after_the_deadline():
+    with pytest.raises(TimeoutError):
+        ocr.run_config(object(), "--oem 3 --psm 6", "Single uniform block", deadline=time.time() - 1)
+
+
+def test_ocr_cancel_flag_kills_running_tesseract(monkeypatch, tmp_path):
+    from PIL import Image
+
+    pid_file = tmp_path / "tesseract.pid"
+    fake_tesseract = tmp_path / "tesseract"
+    fake_tesseract.write_text(f"#!/bin/sh\necho $$ > {pid_file}\nexec sleep 30\n")
+    fake_tesseract.chmod(0o755)
+    monkeypatch.setattr(ocr.pytesseract.pytesseract, "tesseract_cmd", str(fake_tesseract))
+
+    cancelled = threading.Event()
+
+    def cancel_once_started():
+        # запрос отменяется, когда tesseract уже работает
+        deadline = time.monotonic() + 5
+        while not pid_file.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        cancelled.set()
+
+    threading.Thread(target=cancel_once_started, daemon=True).start()
+    with pytest.raises(ocr.OcrCancelled):
+        ocr.run_config(Image.new("RGB", (8, 8)), "--oem 3 --psm 6", "Single uniform block", cancelled=cancelled)
+
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(pid_file.read_text()), 0)
+
+
+def test_lookup_cache_lru_phash_and_disk_tier(tmp_path):
+    from datetime import datetime, timezone
+
+    from services.lookup_cache import CachedLookup, LookupCache, content_key
+
+    parsed = {"title": "ФЕНИС", "date": datetime(2026, 6, 25, 20, tzinfo=timezone.utc), "price": "1500", "location": None}
+    entry = CachedLookup(phash="ffff0000ffff0000", text="КОНЦЕРТ ГРУППЫ «ФЕНИС»", parsed=parsed)
+    size = len(entry.to_json().encode("utf-8"))
+
+    cache = LookupCache(max_bytes=size * 2, db_path=str(tmp_path / "cache.db"))
+    first, second, third = (content_key(f"poster-{i}".encode()) for i in range(3))
+    cache.put(first, entry)
+    cache.put(second, CachedLookup(phash="1111000011110000", text=entry.text, parsed=parsed))
+    assert cache.get(first) == entry  # first становится самым свежим
+    cache.put(third, CachedLookup(phash="2222000022220000", text=entry.text, parsed=parsed))
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["entries"] == 2
+    assert cache.get_by_phash("ffff0000ffff0000") == entry
+    assert cache.get(content_key(b"unknown")) is None
+
+    # записи отдаются копиями: правка одного ответа не портит кэш и исходный словарь
+    hit = cache.get_by_phash("ffff0000ffff0000")
+    hit.parsed["title"] = "чужое"
+    parsed["price"] = "0"
+    assert cache.get(first).parsed["title"] == "ФЕНИС"
+    assert cache.get(first).parsed["price"] == "1500"
+    parsed["price"] = "1500"
+
+    restarted = LookupCache(max_bytes=size * 2, db_path=str(tmp_path / "cache.db"))
+    restored = restarted.get(first)
+    assert restored.parsed["date"] == parsed["date"]
+    stats = restarted.stats()
+    assert (stats["hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 0)
+
+
+def wait_for_job(client, job_id: str, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        state = client.get(f"/api/v1/photo/lookup/jobs/{job_id}").json()
+        if state["status"] in ("done", "failed"):
+            return state
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish: {state}")
+
+
+def seed_event_with_hash(client, phash: str) -> int:
+    from test_api_flows import auth_headers, db_session, register_and_login
+
+    from models.event import Event
+
+    token_pair = register_and_login(client)
+    response = client.post("/api/v1/events/", headers=auth_headers(token_pair["access_token"]), json={"title": "Фенис"})
+    event_id = response.json()["id"]
+    db = db_session(client)
+    db.get(Event, event_id).image_hash = phash
+    db.commit()
+    db.close()
+    return event_id
+
+
+def test_photo_lookup_job_runs_in_background_and_streams(client, monkeypatch):
+    from test_api_flows import make_poster_png
+
+    from endpoints import photo_lookup
+
+    event_id = seed_event_with_hash(client, "ffff0000ffff0000")
+    analysis = {"phash": "ffff0000ffff0001", "text": "КОНЦЕРТ", "parsed": {"title": "КОНЦЕРТ", "date": None}}
+    monkeypatch.setattr(photo_lookup, "analyze_upload", lambda contents, cpu_pool=None: analysis)
+
+    response = client.post("/api/v1/photo/lookup/jobs", files={"file": ("poster.png", make_poster_png(), "image/png")})
+    assert response.status_code == 202, response.text
+    job_id = response.json()["job_id"]
+
+    state = wait_for_job(client, job_id)
+    assert state["status"] == "done", state
+    assert state["result"]["action"] == "matched"
+    assert state["result"]["event_id"] == event_id
+
+    with client.stream("GET", f"/api/v1/photo/lookup/jobs/{job_id}/events") as stream:
+        lines = [line for line in stream.iter_lines() if line.startswith("data:")]
+    assert '"status": "done"' in lines[-1]
+
+    assert client.get("/api/v1/photo/lookup/jobs/missing").status_code == 404
+    assert client.post("/api/v1/photo/lookup/jobs", files={"file": ("x.png", b"not an image", "image/png")}).status_code == 400
+
+
+def test_photo_lookup_job_resumes_from_persisted_stage(client, monkeypatch):
+    from sqlalchemy.orm import sessionmaker
+    from test_api_flows import db_session
+
+    from endpoints import photo_lookup
+    from models.lookup_job import PhotoLookupJob
+    from services.lookup_jobs import LookupJobRunner
+
+    event_id = seed_event_with_hash(client, "00000000ffffffff")
+
+    def fail_analyze(*args, **kwargs):
+        raise AssertionError("analysis stage must not rerun after restart")
+
+    monkeypatch.setattr(photo_lookup, "analyze_upload", fail_analyze)
+
+    db = db_session(client)
+    db.add(
+        PhotoLookupJob(
+            id="resumed-job",
+            status="running",
+            stage="match",
+            phash="00000000ffffffff",
+            ocr_text="Фенис",
+            parsed_json='{"title": "Фенис", "date": null}',
+            attempts=1,
+        )
+    )
+    db.commit()
+
+    runner = LookupJobRunner(workers=1)
+    assert runner.resume_pending(sessionmaker(bind=db.get_bind())) == 1
+    db.close()
+    state = wait_for_job(client, "resumed-job")
+    assert state["status"] == "done", state
+    assert (state["result"]["event_id"], state["attempts"]) == (event_id, 2)
+
+
+def test_photo_lookup_job_is_claimed_by_one_worker_only(client, monkeypatch):
+    from datetime import datetime, timedelta, timezone
+
+    from sqlalchemy.orm import sessionmaker
+    from test_api_flows import db_session
+
+    from models.lookup_job import LookupJobStatus, PhotoLookupJob
+    from services.job_leases import JobLease
+    from services.lookup_jobs import LookupJobRunner
+
+    db = db_session(client)
+    factory = sessionmaker(bind=db.get_bind())
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    db.add_all(
+        [
+            PhotoLookupJob(id="leased", status="running", stage="match", attempts=1,
+                           lease_owner="other-worker", lease_until=now + timedelta(minutes=5)),
+            PhotoLookupJob(id="orphaned", status="running", stage="match", attempts=1,
+                           lease_owner="dead-worker", lease_until=now - timedelta(seconds=1)),
+        ]
+    )
+    db.commit()
+
+    # два процесса делят одну базу: условный UPDATE отдаёт задачу только одному
+    first = JobLease(PhotoLookupJob, LookupJobStatus.ACTIVE, 60, worker_id="worker-a")
+    second = JobLease(PhotoLookupJob, LookupJobStatus.ACTIVE, 60, worker_id="worker-b")
+    assert first.claim(factory(), "orphaned") is True
+    assert second.claim(factory(), "orphaned") is False
+    assert second.claim(factory(), "leased") is False
+
+    ran: list[str] = []
+    runner = LookupJobRunner(workers=1, lease=second)
+    monkeypatch.setattr(runner, "_advance", lambda session, job: ran.append(job.id))
+    retries: list[str] = []
+    monkeypatch.setattr(second, "retry_later", lambda session, job_id, callback: retries.append(job_id))
+    assert runner.resume_pending(factory) == 2
+    runner._executor.shutdown(wait=True)
+    # живые аренды не выполняются повторно, а ждут своего истечения
+    assert ran == [] and sorted(retries) == ["leased", "orphaned"]
+    db.close()
+
+
+def test_photo_lookup_job_fails_after_max_attempts(client, monkeypatch):
+    from sqlalchemy.orm import sessionmaker
+    from test_api_flows import db_session
+
+    from models.lookup_job import LookupJobStatus, PhotoLookupJob
+    from services.job_leases import JobLease
+    from services.lookup_jobs import LookupJobRunner
+
+    db = db_session(client)
+    # задача трижды начиналась и роняла воркер, не дойдя до failed
+    db.add(PhotoLookupJob(id="crashing", status="running", stage="analyze", attempts=3))
+    db.commit()
+
+    runner = LookupJobRunner(workers=1, lease=JobLease(PhotoLookupJob, LookupJobStatus.ACTIVE, 60, max_attempts=3))
+    ran: list[str] = []
+    monkeypatch.setattr(runner, "_advance", lambda session, job: ran.append(job.id))
+    assert runner.resume_pending(sessionmaker(bind=db.get_bind())) == 1
+    runner._executor.shutdown(wait=True)
+
+    db.expire_all()
+    job = db.get(PhotoLookupJob, "crashing")
+    assert ran == []
+    assert (job.status, job.attempts, job.lease_owner) == ("failed", 3, None)
+    assert "3" in job.error
+    db.close()
+
+
+def test_photo_lookup_records_stage_spans_and_server_timing(client, monkeypatch):
+    from test_api_flows import make_poster_png
+
+    from endpoints import photo_lookup
+    from services.tracing import Trace, activate, span
+    from settings import get_settings
+
+    with activate(Trace("unit")) as trace:
+        with pytest.raises(ValueError):
+            with span("failing"):
+                raise ValueError("boom")
+    assert [(s.name, s.outcome) for s in trace.spans] == [("failing", "error")]
+
+    poster = make_poster_png(seed=808)
+    _, phash, _ = photo_lookup.preprocess_and_hash(poster)
+    event_id = seed_event_with_hash(client, phash)
+    monkeypatch.setattr(photo_lookup, "ocr_image", lambda img, strategy=None: "КОНЦЕРТ ГРУППЫ «ФЕНИС»")
+    monkeypatch.setattr(get_settings(), "server_timing_enabled", True)
+
+    response = client.post("/api/v1/photo/lookup", files={"file": ("poster.png", poster, "image/png")})
+    assert response.status_code == 200, response.text
+    assert response.json()["event_id"] == event_id
+    timing = response.headers["Server-Timing"]
+    for stage in ("cache", "preprocess", "phash", "parse", "match.hash", "total"):
+        assert f"{stage};" in timing
+    assert 'match.hash;desc="hit"' in timing
+
+    metrics = client.get("/api/v1/metrics")
+    assert metrics.status_code == 200
+    assert 'eventfinder_stage_duration_ms_count{stage="match.hash",outcome="hit"}' in metrics.text
+
+
+def test_find_existing_event_uses_title_index_and_date_window(client):
+    from datetime import datetime, timezone
+
+    from test_api_flows import auth_headers, db_session, register_and_login
+
+    from endpoints.photo_lookup import find_existing_event
+    from services.title_index import get_title_index
+
+    token_pair = register_and_login(client)
+    headers = auth_headers(token_pair["access_token"])
+    ids = [
+        client.post("/api/v1/events/", headers=headers, json=payload).json()["id"]
+        for payload in (
+            {"title": "Концерт группы Фенис", "date": "2031-06-25T20:00:00Z"},
+            {"title": "Выставка импрессионистов", "date": "2031-07-01T12:00:00Z"},
+        )
+    ]
+
+    db = db_session(client)
+    assert len(get_title_index(db)) == 2
+    found = find_existing_event(db, {"title": "группы Фенис концерт", "date": None}, "")
+    assert found.id == ids[0]
+
+    # индекс уже прогрет — новое событие и переименование приходят через хуки сессии
+    created = client.post("/api/v1/events/", headers=headers, json={"title": "Спектакль Чайка"}).json()["id"]
+    client.put(f"/api/v1/events/{ids[1]}", headers=headers, json={"title": "Лекция о космосе"})
+    db.expire_all()
+    assert find_existing_event(db, {"title": "Спектакль Чайка", "date": None}, "").id == created
+    assert find_existing_event(db, {"title": "Лекция о космосе", "date": None}, "").id == ids[1]
+
+    parsed_date = datetime(2031, 7, 1, 23, 30, tzinfo=timezone.utc)
+    assert find_existing_event(db, {"title": "Событие без названия", "date": parsed_date}, "").id == ids[1]
+    assert find_existing_event(db, {"title": "Событие без названия", "date": parsed_date.replace(day=2)}, "") is None
+    db.close()
+
+
+@pytest.fixture()
+def stub_sites(monkeypatch):
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import urlsplit
+
+    from settings import get_settings
+
+    delays: dict[str, float] = {"/events/": 2.0}
+    pages = {
+        "/events/": '<div class="post"><div class="title"><a href="/kudago-event">x</a></div></div>',
+        "/kudago-event": "<h1>Фенис на KudaGo</h1>",
+        "/search/": '<div class="o-teaser"><a href="/afisha-event">x</a></div>',
+        "/afisha-event": '<h1>Фенис на Афише</h1><div class="b-event__description">Концерт</div>',
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = urlsplit(self.path).path
+            time.sleep(delays.get(path, 0))
+            body = pages.get(path)
+            if body is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            payload = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    settings = get_settings()
+    for name in ("kudago_base_url", "afisha_ru_base_url", "yandex_afisha_base_url"):
+        monkeypatch.setattr(settings, name, base_url)
+    yield delays
+    server.shutdown()
+    server.server_close()
+
+
+def test_external_search_fans_out_with_shared_deadline(client, stub_sites, monkeypatch):
+    from endpoints import photo_lookup
+    from services.tracing import Trace, activate
+    from settings import get_settings
+
+    trace = Trace("external")
+    started = time.monotonic()
+    with activate(trace):
+        found = photo_lookup.search_external_sites("Фенис")
+    # Афиша отвечает сразу, медленный KudaGo не задерживает ответ
+    assert time.monotonic() - started < 1.5
+    assert (found["source"], found["title"]) == ("afisha.ru", "Фенис на Афише")
+    outcomes = {s.name: s.outcome for s in trace.spans}
+    assert outcomes["external.afisha.ru"] == "hit"
+    assert outcomes["external.yandex.afisha"] == "miss"
+
+    stub_sites["/search/"] = 2.0
+    monkeypatch.setattr(get_settings(), "external_search_deadline_seconds", 0.3)
+    started = time.monotonic()
+    assert photo_lookup.search_external_sites("Фенис") is None
+    assert time.monotonic() - started < 1.0
+
+    stats = client.get("/api/v1/photo/lookup/external/stats").json()
+    assert stats["afisha.ru"]["outcomes"]["hit"]["count"] >= 1
+    assert stats["yandex.afisha"]["calls"] >= 2
+
+
+def test_image_cascade_confirms_with_dhash_and_colorhash(client):
+    from io import BytesIO
+
+    from PIL import Image
+    from test_api_flows import db_session, make_poster_png, register_and_login
+
+    from models.event import Event
+    from models.user import User
+    from services.image_hashing import fingerprint_bytes
+    from services.phash import ImageFingerprint
+    from services.image_match import match_fingerprint
+
+    poster = Image.open(BytesIO(make_poster_png()))
+
+    def encoded(image, fmt="PNG", **options):
+        buffer = BytesIO()
+        image.save(buffer, fmt, **options)
+        return buffer.getvalue()
+
+    hue, saturation, value = poster.convert("HSV").split()
+    recolored = Image.merge("HSV", (hue.point(lambda x: (x + 100) % 256), saturation, value)).convert("RGB")
+    original = fingerprint_bytes(encoded(poster))
+    reencoded = fingerprint_bytes(encoded(poster, "JPEG", quality=60))
+    recolored = fingerprint_bytes(encoded(recolored))
+
+    register_and_login(client)
+    db = db_session(client)
+    owner_id = db.query(User.id).scalar()
+    event = Event(title="Афиша", owner_id=owner_id)
+    event.set_image_fingerprint(original)
+    db.add(event)
+    db.commit()
+
+    found = match_fingerprint(db, reencoded, top_k=1)
+    assert [m.event_id for m in found.matches] == [event.id] and found.confirmed == 1
+    # яркость та же, поэтому pHash близок, но другие цвета отсекает colorhash
+    assert original.distances(recolored)[0] <= 8
+    assert match_fingerprint(db, recolored).matches == []
+    # запрос только с pHash (как у photo_lookup) проходит по строгому порогу
+    phash_only = ImageFingerprint.from_phash(recolored.phash_hex)
+    assert [m.event_id for m in match_fingerprint(db, phash_only).matches] == [event.id]
+
+
+def test_image_match_honours_max_distance_for_unfingerprinted_events(client):
+    from test_api_flows import db_session, make_poster_png, register_and_login
+
+    from models.event import Event
+    from models.user import User
+    from services.image_hashing import fingerprint_bytes
+    from services.phash import ImageFingerprint
+    from services.image_match import ImageThresholds, match_fingerprint
+
+    query = fingerprint_bytes(make_poster_png())
+    register_and_login(client)
+    db = db_session(client)
+    owner_id = db.query(User.id).scalar()
+    confirmed = Event(title="Афиша", owner_id=owner_id)
+    confirmed.set_image_fingerprint(query)
+    # событие, проиндексированное до dHash/colorhash: только pHash на расстоянии 10
+    legacy = Event(title="Старая афиша", owner_id=owner_id)
+    legacy.set_image_fingerprint(ImageFingerprint.from_phash(query.phash ^ 0x3FF))
+    exact_legacy = Event(title="Старая копия", owner_id=owner_id)
+    exact_legacy.set_image_fingerprint(ImageFingerprint.from_phash(query.phash))
+    db.add_all([confirmed, legacy, exact_legacy])
+    db.commit()
+
+    default = match_fingerprint(db, query)
+    assert [m.event_id for m in default.matches] == [confirmed.id, exact_legacy.id]
+    # одна шкала: без подтверждения счёт не лучше, чем у подтверждённого совпадения с тем же pHash
+    assert default.matches[0].score < default.matches[1].score
+
+    widened = match_fingerprint(db, query, thresholds=ImageThresholds.from_settings(phash_loose=12))
+    assert [m.event_id for m in widened.matches] == [confirmed.id, exact_legacy.id, legacy.id]
+    db.close()
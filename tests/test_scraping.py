@@ -0,0 +1,651 @@
+from __future__ import annotations
+
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+@pytest.fixture()
+def etag_server():
+    hits: list[tuple[str, str | None]] = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append((self.path, self.headers.get("If-None-Match")))
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            payload = "<h1>Афиша недели</h1>".encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            if self.path.startswith("/listing"):
+                payload = gzip.compress(payload)
+                self.send_header("Content-Encoding", "gzip")
+                self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", hits
+    server.shutdown()
+    server.server_close()
+
+
+def test_scrape_client_replays_not_modified_from_disk_cache(tmp_path, etag_server):
+    from services.http_client import ConditionalCache, ScrapeClient
+
+    base_url, hits = etag_server
+    client = ScrapeClient(user_agent="test", cache=ConditionalCache(str(tmp_path / "http"), max_entry_bytes=1024))
+
+    first = client.get(f"{base_url}/listing", params={"page": 1})
+    assert first.status_code == 200 and not getattr(first, "from_cache", False)
+
+    # новый клиент — как после рестарта: кэш живёт на диске
+    restarted = ScrapeClient(user_agent="test", cache=ConditionalCache(str(tmp_path / "http"), max_entry_bytes=1024))
+    second = restarted.get(f"{base_url}/listing", params={"page": 1})
+    assert second.status_code == 200 and second.from_cache
+    assert second.text == first.text == "<h1>Афиша недели</h1>"
+    # на диске лежит уже распакованное тело — заголовок сжатия к нему не относится
+    assert "Content-Encoding" not in second.headers
+    assert hits[-1] == ("/listing?page=1", '"v1"')
+
+    # ответы без валидаторов не кэшируются
+    client.get(f"{base_url}/plain")
+    client.get(f"{base_url}/plain")
+    assert hits[-1] == ("/plain", None)
+    assert (client.stats()["stored"], restarted.stats()["revalidated"]) == (1, 1)
+
+
+def test_conditional_cache_evicts_least_recently_used_and_skips_no_store(tmp_path):
+    import json
+    import os
+
+    import requests
+
+    from services.http_client import ConditionalCache
+
+    def response(name: str, cache_control: str | None = None) -> requests.Response:
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.url = f"https://afisha.example/{name}"
+        resp.headers["ETag"] = f'"{name}"'
+        if cache_control:
+            resp.headers["Cache-Control"] = cache_control
+        resp._content = b"x" * 400
+        return resp
+
+    cache = ConditionalCache(str(tmp_path), max_entry_bytes=1024, max_bytes=2000, ttl_seconds=3600)
+    assert cache.store("a", response("a")) and cache.store("b", response("b"))
+    # a прочитана позже b, поэтому при переполнении уходит b
+    os.utime(tmp_path / "b.json", (1, 1))
+    assert cache.load("a") is not None
+    assert cache.store("c", response("c")) and cache.store("d", response("d"))
+    assert cache.load("b") is None and all(cache.load(key) is not None for key in "acd")
+    assert sum(path.stat().st_size for path in tmp_path.iterdir()) <= 2000
+
+    # no-store и private не пишутся, а прежняя копия удаляется
+    assert not cache.store("a", response("a", "no-store"))
+    assert not cache.store("e", response("e", "private, max-age=60"))
+    assert cache.load("a") is None and cache.load("e") is None
+
+    # просроченная запись не отдаётся
+    meta_path = tmp_path / "c.json"
+    meta_path.write_text(json.dumps({**json.loads(meta_path.read_text()), "stored_at": 0}))
+    assert cache.load("c") is None and not meta_path.exists()
+
+def test_scrape_pipeline_hashes_each_image_once_and_inserts_in_one_batch(client):
+    import json
+
+    from test_api_flows import auth_headers, make_poster_png, register_and_login
+
+    requested: list[str] = []
+    images = {"/a.png": make_poster_png(seed=1), "/b.png": make_poster_png(seed=2)}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requested.append(self.path)
+            if self.path in images:
+                payload, content_type = images[self.path], "image/png"
+            else:
+                items = [
+                    {"@type": "Event", "name": "Джазовый вечер", "startDate": "2031-05-01T19:00:00", "image": f"{base_url}/a.png"},
+                    {"@type": "Event", "name": "Лекция по астрономии", "image": f"{base_url}/a.png"},
+                    {"@type": "Event", "name": "Кинопоказ под открытым небом", "image": f"{base_url}/b.png"},
+                    {"@type": "Event", "name": "Старый спектакль"},
+                ]
+                scripts = "".join(f'<script type="application/ld+json">{json.dumps(it)}</script>' for it in items)
+                payload, content_type = f"<html><head>{scripts}</head></html>".encode("utf-8"), "text/html; charset=utf-8"
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    headers = auth_headers(register_and_login(client)["access_token"])
+    client.post("/api/v1/events/", headers=headers, json={"title": "Старый спектакль"})
+    try:
+        response = client.post("/api/v1/scrape/", headers=headers, json={"url": f"{base_url}/listing"})
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    # второе событие с той же картинкой — дубль внутри партии, старый спектакль — дубль по названию
+    assert [item["title"] for item in body["added"]] == ["Джазовый вечер", "Кинопоказ под открытым небом"]
+    assert {item["title"] for item in body["skipped"]} == {"Лекция по астрономии", "Старый спектакль"}
+    assert sorted(path for path in requested if path.endswith(".png")) == ["/a.png", "/b.png"]
+    assert set(body["timings_ms"]) == {"fetch", "extract", "images", "dedup", "insert", "total"}
+
+    assert client.post("/api/v1/scrape/", json={"url": base_url}).status_code == 401
+
+
+@pytest.fixture()
+def aggregator_site():
+    import json
+
+    requested: list[str] = []
+
+    def listing(links: list[str]) -> str:
+        return "".join(links)
+
+    pages = {
+        "/listing": listing(
+            [
+                '<li><a href="/events/1">Первое</a></li>',
+                '<li><a href="/events/2#tickets">Второе</a></li>',
+                '<a rel="next" href="/listing?utm_source=feed&page=2">›</a>',
+            ]
+        ),
+        "/listing?page=2": listing(
+            [
+                '<li><a href="/events/3">Третье</a></li>',
+                '<li><a href="/events/1">Первое</a></li>',
+                '<li><a href="/events/404">Удалённое</a></li>',
+                '<a href="https://other.example/events/9">Чужой сайт</a>',
+            ]
+        ),
+    }
+    for number, title in ((1, "Органный концерт"), (2, "Стендап вечер"), (3, "Фестиваль уличной еды")):
+        data = json.dumps({"@type": "Event", "name": title, "startDate": f"2031-0{number}-10T19:00:00"}, ensure_ascii=False)
+        pages[f"/events/{number}"] = f'<script type="application/ld+json">{data}</script>'
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requested.append(self.path)
+            body = pages.get(self.path)
+            if body is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            payload = f"<html><body>{body}</body></html>".encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", requested
+    server.shutdown()
+    server.server_close()
+
+
+def wait_for_crawl(client, job_id: str, headers: dict, timeout: float = 10.0) -> dict:
+    import time
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        state = client.get(f"/api/v1/crawl/jobs/{job_id}", headers=headers).json()
+        if state["status"] in ("done", "failed"):
+            return state
+        time.sleep(0.05)
+    raise AssertionError(f"crawl job {job_id} did not finish: {state}")
+
+
+def test_crawl_job_follows_pagination_and_event_links_once(client, aggregator_site):
+    from test_api_flows import auth_headers, register_and_login
+
+    from services.crawler import normalize_url
+
+    assert normalize_url("HTTP://Example.COM:80/a?b=2&utm_medium=x&a=1#frag") == "http://example.com/a?a=1&b=2"
+
+    base_url, requested = aggregator_site
+    headers = auth_headers(register_and_login(client)["access_token"])
+    response = client.post("/api/v1/crawl/jobs", headers=headers, json={"seed_url": f"{base_url}/listing", "max_depth": 1})
+    assert response.status_code == 202, response.text
+
+    state = wait_for_crawl(client, response.json()["job_id"], headers)
+    assert state["status"] == "done", state
+    # недоступная страница не считается скачанной
+    assert (state["pages_fetched"], state["pages_failed"], state["events_added"]) == (5, 1, 3)
+    # каждая страница запрошена ровно один раз, чужой хост не обходится
+    assert sorted(requested) == ["/events/1", "/events/2", "/events/3", "/events/404", "/listing", "/listing?page=2"]
+
+    titles = {item["title"] for item in client.get("/api/v1/events/", headers=headers).json()["items"]}
+    assert {"Органный концерт", "Стендап вечер", "Фестиваль уличной еды"} <= titles
+    assert client.post(f"/api/v1/crawl/jobs/{state['job_id']}/resume", headers=headers).status_code == 409
+
+
+def test_crawl_job_resumes_from_persisted_frontier(client, aggregator_site):
+    from sqlalchemy.orm import sessionmaker
+    from test_api_flows import db_session, register_and_login
+
+    from models.crawl_job import CrawlFrontierItem, CrawlJob
+    from models.user import User
+    from services.bloom import BloomFilter
+    from services.crawler import CrawlJobRunner, job_to_dict
+
+    base_url, requested = aggregator_site
+    register_and_login(client)
+    db = db_session(client)
+    owner_id = db.query(User.id).scalar()
+
+    # задача упала на середине: листинг обработан, страница события взята в работу
+    bloom = BloomFilter.for_capacity(1000)
+    for path in ("/listing", "/events/2"):
+        bloom.add(f"{base_url}{path}")
+    db.add(CrawlJob(id="crashed", status="running", seed_url=f"{base_url}/listing", max_depth=1, max_pages=10,
+                    pages_fetched=1, owner_id=owner_id, visited_bloom=bloom.to_bytes(), attempts=1))
+    db.add_all([
+        CrawlFrontierItem(job_id="crashed", url=f"{base_url}/listing", depth=0, status="done"),
+        CrawlFrontierItem(job_id="crashed", url=f"{base_url}/events/2", depth=1, status="in_progress"),
+    ])
+    db.commit()
+
+    runner = CrawlJobRunner(workers=1)
+    assert runner.resume_pending(sessionmaker(bind=db.get_bind())) == 1
+    runner._executor.shutdown(wait=True)
+
+    db.expire_all()
+    state = job_to_dict(db.get(CrawlJob, "crashed"))
+    db.close()
+    assert (state["status"], state["pages_fetched"], state["events_added"], state["attempts"]) == ("done", 2, 1, 2)
+    assert requested == ["/events/2"]
+
+
+def test_crawl_job_ingests_a_redirect_target_once(client):
+    import json
+
+    from test_api_flows import auth_headers, db_session, register_and_login
+
+    from models.crawl_job import CrawlFrontierItem
+    from models.scraped_page import ScrapedPage
+
+    event = json.dumps({"@type": "Event", "name": "Квартирник", "url": "/events/final"}, ensure_ascii=False)
+    links = "".join(f'<li><a href="/events/{slug}">{slug}</a></li>' for slug in ("a", "b", "away"))
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            port = self.server.server_address[1]
+            # две ссылки пачки ведут на одну страницу, третья — на другой хост
+            redirects = {
+                "/events/a": "/events/final",
+                "/events/b": "/events/final?utm_source=feed",
+                "/events/away": f"http://localhost:{port}/events/final",
+            }
+            if self.path in redirects:
+                self.send_response(301)
+                self.send_header("Location", redirects[self.path])
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = f"<ul>{links}</ul>" if self.path == "/listing" else f'<script type="application/ld+json">{event}</script>'
+            payload = f"<html><body>{body}</body></html>".encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    headers = auth_headers(register_and_login(client)["access_token"])
+    try:
+        response = client.post("/api/v1/crawl/jobs", headers=headers, json={"seed_url": f"{base_url}/listing", "max_depth": 1})
+        state = wait_for_crawl(client, response.json()["job_id"], headers)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert state["status"] == "done", state
+    assert state["events_added"] == 1
+    db = db_session(client)
+    statuses = {url.rsplit("/", 1)[-1]: status for url, status in db.query(CrawlFrontierItem.url, CrawlFrontierItem.status)}
+    assert db.query(ScrapedPage).filter(ScrapedPage.url == f"{base_url}/events/final").count() == 1
+    db.close()
+    assert statuses == {"listing": "done", "a": "done", "b": "skipped", "away": "skipped"}
+
+def test_crawl_job_fails_after_max_attempts(client, aggregator_site):
+    from sqlalchemy.orm import sessionmaker
+    from test_api_flows import db_session, register_and_login
+
+    from models.crawl_job import CrawlFrontierItem, CrawlJob
+    from models.user import User
+    from services.crawler import CrawlJobRunner, job_to_dict
+    from settings import get_settings
+
+    base_url, requested = aggregator_site
+    register_and_login(client)
+    db = db_session(client)
+    owner_id = db.query(User.id).scalar()
+    attempts = get_settings().max_job_attempts
+    db.add(CrawlJob(id="crashing", status="running", seed_url=f"{base_url}/listing", owner_id=owner_id, attempts=attempts))
+    db.add(CrawlFrontierItem(job_id="crashing", url=f"{base_url}/listing", depth=0, status="in_progress"))
+    db.commit()
+
+    runner = CrawlJobRunner(workers=1)
+    assert runner.resume_pending(sessionmaker(bind=db.get_bind())) == 1
+    runner._executor.shutdown(wait=True)
+
+    db.expire_all()
+    state = job_to_dict(db.get(CrawlJob, "crashing"))
+    db.close()
+    assert (state["status"], state["attempts"]) == ("failed", attempts)
+    assert requested == []
+
+
+def test_host_rate_limiter_spaces_one_host_and_honours_retry_after():
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    from services.http_client import HostRateLimiter, RateLimited, parse_retry_after
+
+    limiter = HostRateLimiter(rate_per_second=20, burst=1, overrides={"slow.example": (5, 1)})
+
+    def burst(host: str) -> float:
+        started = time.monotonic()
+        for _ in range(3):
+            limiter.acquire(host)
+        return time.monotonic() - started
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        slow, fast = pool.map(burst, ["slow.example", "fast.example"])
+    # 3 запроса при 5 rps — две паузы по 0.2 с; соседний хост идёт в своём темпе
+    assert 0.35 <= slow < 0.6
+    assert fast < 0.2
+
+    limiter.penalize("fast.example", 0.3)
+    with pytest.raises(RateLimited):
+        limiter.acquire("fast.example", max_wait=0.05)
+    assert limiter.acquire("fast.example") >= 0.2
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_scrape_client_waits_out_retry_after(tmp_path):
+    from services.http_client import HostRateLimiter, ScrapeClient
+
+    calls: list[float] = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            import time
+
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                self.send_response(429)
+                self.send_header("Retry-After", "1")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = ScrapeClient(user_agent="test", limiter=HostRateLimiter(rate_per_second=100, burst=10))
+        response = client.get(f"http://127.0.0.1:{server.server_address[1]}/")
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert (response.status_code, response.text) == (200, "ok")
+    assert calls[1] - calls[0] >= 0.9
+    assert client.stats()["rate_limit"]["penalties"] == 1
+
+
+def test_rescrape_skips_unchanged_page_and_updates_changed_candidates(client):
+    import json
+
+    from test_api_flows import auth_headers, db_session, register_and_login
+
+    from models.event import Event
+
+    items = [
+        {"@type": "Event", "name": "Вечер органной музыки", "url": "/events/organ", "description": "Бах"},
+        {"@type": "Event", "name": "Книжная ярмарка", "url": "/events/fair", "description": "Три дня"},
+    ]
+    requested: list[str] = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requested.append(self.path)
+            scripts = "".join(f'<script type="application/ld+json">{json.dumps(it)}</script>' for it in items)
+            payload = f"<html><head>{scripts}</head></html>".encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/afisha?utm_source=mail"
+    headers = auth_headers(register_and_login(client)["access_token"])
+    try:
+        first = client.post("/api/v1/scrape/", headers=headers, json={"url": url}).json()
+        second = client.post("/api/v1/scrape/", headers=headers, json={"url": url}).json()
+        items[1] = {**items[1], "description": "Перенесена на выходные"}
+        third = client.post("/api/v1/scrape/", headers=headers, json={"url": url}).json()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert len(first["added"]) == 2
+    assert (second["page_unchanged"], second["unchanged"], second["added"]) == (True, 2, [])
+    assert "images" not in second["timings_ms"]
+    assert (third["page_unchanged"], third["unchanged"], third["added"]) == (False, 1, [])
+    assert [item["title"] for item in third["updated"]] == ["Книжная ярмарка"]
+
+    db = db_session(client)
+    fair = db.query(Event).filter(Event.title == "Книжная ярмарка").one()
+    assert fair.description == "Перенесена на выходные"
+    assert fair.source_url == f"http://127.0.0.1:{server.server_address[1]}/events/fair"
+    assert db.query(Event).count() == 2
+    db.close()
+
+
+
+def test_ingest_page_keys_candidates_per_owner_and_by_normalized_url(client):
+    from test_api_flows import db_session
+
+    from endpoints.scrape import ingest_page
+    from models.user import User
+    from services.fingerprints import candidate_key
+
+    page_url = "https://afisha.example/list"
+    assert candidate_key(page_url, {"url": "https://afisha.example/events/7?utm_source=vk#buy"}) == candidate_key(
+        page_url, {"url": "https://AFISHA.example/events/7"}
+    )
+
+    db = db_session(client)
+    alice = User(email="alice@example.com", hashed_password="x")
+    bob = User(email="bob@example.com", hashed_password="x")
+    db.add_all([alice, bob])
+    db.commit()
+    candidate = {"title": "Ночь музеев", "url": "https://afisha.example/events/7", "description": "До полуночи"}
+
+    first = ingest_page(db, page_url, [candidate], alice.id)
+    db.add_all(first.added)
+    db.commit()
+    own = first.added[0]
+
+    # чужая страница не считается «неизменной», чужое событие не обновляется
+    other = ingest_page(db, page_url, [{**candidate, "description": "Отменено"}], bob.id)
+    assert (other.page_unchanged, other.unchanged, other.updated) == (False, 0, [])
+    db.rollback()
+    db.refresh(own)
+    assert own.description == "До полуночи"
+
+    # свой повтор с utm-хвостом находит то же событие
+    again = ingest_page(db, page_url, [{**candidate, "url": candidate["url"] + "?utm_medium=tg", "description": "До часу ночи"}], alice.id)
+    assert [ev.id for ev in again.updated] == [own.id]
+    db.close()
+
+
+def test_extract_candidates_builds_full_dom_only_for_heuristic_pages(monkeypatch):
+    from endpoints import scrape
+
+    full_parses = []
+    real_parse_full = scrape.parse_full
+    monkeypatch.setattr(scrape, "parse_full", lambda html: full_parses.append(html) or real_parse_full(html))
+
+    structured = (
+        '<html><head><meta property="og:image" content="/poster.jpg">'
+        '<script type="application/ld+json">{"@type": "Event", "name": "Джаз в саду", "url": "/events/7"}</script>'
+        '</head><body><div class="card"><h2>Реклама</h2></div></body></html>'
+    )
+    found = scrape.extract_candidates(structured, "https://afisha.example/list", 10)
+    assert [c["title"] for c in found] == ["Джаз в саду"]
+    assert found[0]["url"] == "https://afisha.example/events/7"
+    assert full_parses == []
+
+    listing = '<html><body><div class="event"><h2>Органный вечер</h2><time datetime="2026-05-01">1 мая</time></div></body></html>'
+    found = scrape.extract_candidates(listing, "https://afisha.example/list", 10)
+    assert [(c["title"], c["date"]) for c in found] == [("Органный вечер", "2026-05-01")]
+    assert len(full_parses) == 1
+
+
+def test_duplicate_detector_finds_titles_across_whole_catalog(client):
+    from test_api_flows import db_session, register_and_login
+
+    from models.event import Event
+    from models.user import User
+    from services.duplicates import DuplicateDetector
+
+    register_and_login(client)
+    db = db_session(client)
+    owner_id = db.query(User.id).scalar()
+    # the original is older than any "recent N" window
+    db.add(Event(title="Концерт группы «Кино» в Олимпийском", owner_id=owner_id))
+    db.add_all(Event(title=f"Лекция №{i} об искусстве {i * 7919 % 1000}", owner_id=owner_id) for i in range(300))
+    db.commit()
+
+    detector = DuplicateDetector(db)
+    duplicate = detector.find("концерт группы Кино, Олимпийский")
+    assert duplicate is not None and duplicate.reason == "title"
+    assert db.get(Event, duplicate.event_id).title.startswith("Концерт группы")
+    assert detector.check("Выставка Айвазовского") is None
+
+    detector.remember("Выставка Айвазовского")
+    assert detector.check("Выставка: Айвазовский") == "title"
+
+    renamed = db.get(Event, duplicate.event_id)
+    renamed.title = "Балет Щелкунчик"
+    db.commit()
+    assert DuplicateDetector(db).check("Концерт группы Кино в Олимпийском") is None
+    assert DuplicateDetector(db).check("Балет «Щелкунчик»") == "title"
+
+
+def test_duplicate_detector_ranks_title_candidates_by_shared_buckets(client):
+    from test_api_flows import db_session, register_and_login
+
+    from models.event import Event
+    from models.user import User
+    from services.duplicates import MAX_TITLE_CANDIDATES, DuplicateDetector
+
+    register_and_login(client)
+    db = db_session(client)
+    owner_id = db.query(User.id).scalar()
+    title = "Концерт симфонического оркестра — Бетховен. Девятая симфония"
+    # почти-совпадения делят с заголовком часть корзин, их больше лимита кандидатов, и они старше оригинала
+    db.add_all(Event(title=f"Концерт симфонического оркестра №{i}", owner_id=owner_id) for i in range(2 * MAX_TITLE_CANDIDATES))
+    db.commit()
+    original = Event(title=title, owner_id=owner_id)
+    db.add(original)
+    db.commit()
+
+    duplicate = DuplicateDetector(db).find_title(title)
+    assert duplicate is not None and (duplicate.event_id, duplicate.score) == (original.id, 1.0)
+    db.close()
+
+
+def test_image_hashing_streams_with_byte_cap_and_draft_decodes_jpeg():
+    from io import BytesIO
+
+    import imagehash
+    import numpy as np
+    from PIL import Image
+
+    from services import image_hashing
+
+    pixels = np.random.default_rng(7).integers(0, 255, (24, 32, 3), dtype=np.uint8)
+    buffer = BytesIO()
+    Image.fromarray(pixels).resize((2400, 1800), Image.BICUBIC).save(buffer, "JPEG")
+    jpeg = buffer.getvalue()
+
+    reduced = image_hashing.open_for_hashing(jpeg)
+    assert reduced.mode == "L" and max(reduced.size) < 400
+    full = imagehash.phash(Image.open(BytesIO(jpeg)).convert("RGB"))
+    assert full - imagehash.hex_to_hash(image_hashing.phash_bytes(jpeg)) <= 4
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            if self.path == "/declared.jpg":
+                self.send_header("Content-Length", str(len(jpeg)))
+            self.end_headers()
+            self.wfile.write(jpeg)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        assert image_hashing.download_image(f"{base}/declared.jpg", max_bytes=len(jpeg)) == jpeg
+        with pytest.raises(image_hashing.ImageTooLarge):
+            image_hashing.download_image(f"{base}/declared.jpg", max_bytes=1024)
+        with pytest.raises(image_hashing.ImageTooLarge):
+            image_hashing.download_image(f"{base}/chunked.jpg", max_bytes=1024)
+        assert image_hashing.phash_url(f"{base}/chunked.jpg", max_bytes=1024) is None
+    finally:
+        server.shutdown()
+        server.server_close()